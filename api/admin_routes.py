@@ -1,10 +1,15 @@
+import asyncio
 from fastapi import APIRouter, HTTPException, Depends, Request, Form, UploadFile, File
 from fastapi.responses import HTMLResponse, RedirectResponse
 from fastapi.templating import Jinja2Templates
 from sqlalchemy.orm import Session
+from db.catalog import catalog_version
 from db.database import get_database
+from db.services import MovieService, UsageService
 from db.models_v3 import User, ApiKey, Movie, UsageLog, AdminSession, generate_api_key
 from auth.security import verify_password, get_password_hash, create_access_token
+from middleware.key_cache import api_key_cache
+from middleware.key_filter import api_key_filter
 from datetime import datetime, timedelta
 import pandas as pd
 import io
@@ -115,10 +120,10 @@ async def admin_dashboard(request: Request, db: Session = Depends(get_database))
         stats = {
             'total_users': db.query(func.count(User.id)).filter(User.is_admin == False).scalar(),
             'active_api_keys': db.query(func.count(ApiKey.id)).filter(ApiKey.is_active == True).scalar(),
-            'total_movies': db.query(func.count(Movie.id)).scalar(),
-            'api_calls_today': db.query(func.count(UsageLog.id)).filter(
-                func.date(UsageLog.timestamp) == func.date(func.now())
-            ).scalar()
+            'total_movies': catalog_version.movie_count,
+            'api_calls_today': UsageService.request_count(
+                db, since=datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+            )
         }
 
         # Get recent API usage logs
@@ -179,6 +184,7 @@ async def upload_movies_csv(
         # Process each row
         added_count = 0
         updated_count = 0
+        changed_movies = []
 
         for _, row in df.iterrows():
             # Check for existing movie by title + year
@@ -195,6 +201,7 @@ async def upload_movies_csv(
                 existing_movie.plot = str(row['plot'])
                 existing_movie.poster_url = str(row['poster_url'])
                 existing_movie.updated_at = datetime.now()
+                changed_movies.append(existing_movie)
                 updated_count += 1
             else:
                 # Add new movie
@@ -208,9 +215,13 @@ async def upload_movies_csv(
                     poster_url=str(row['poster_url'])
                 )
                 db.add(movie)
+                changed_movies.append(movie)
                 added_count += 1
 
+        MovieService.link_movies(db, changed_movies)
         db.commit()
+        # Listeners rebuild the catalog snapshot; keep that off the event loop
+        await asyncio.to_thread(catalog_version.bump, db)
 
         return templates.TemplateResponse("admin/movies.html", {
             "request": request,
@@ -277,6 +288,7 @@ async def create_api_key(
         )
         db.add(api_key)
         db.commit()
+        api_key_filter.add(api_key.key)
 
         return RedirectResponse(url="/admin/api-keys?success=API key created successfully", status_code=302)
 
@@ -296,6 +308,7 @@ async def toggle_api_key(
 
     api_key.is_active = not api_key.is_active
     db.commit()
+    api_key_cache.invalidate(api_key.key)
 
     return RedirectResponse(url="/admin/api-keys", status_code=302)
 
@@ -313,5 +326,6 @@ async def reset_api_key_usage(
     api_key.usage_count = 0
     api_key.last_reset = datetime.now()
     db.commit()
+    api_key_cache.invalidate(api_key.key)
 
     return RedirectResponse(url="/admin/api-keys", status_code=302)
\ No newline at end of file
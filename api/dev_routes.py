@@ -5,7 +5,9 @@ from fastapi.templating import Jinja2Templates
 from sqlalchemy.orm import Session
 from db.database import get_database
 from db.models_v3 import User, ApiKey, EmailVerification, generate_api_key, generate_verification_token
+from db.services import UsageService
 from auth.security import verify_password, get_password_hash, is_valid_email_domain, is_disposable_email
+from middleware.key_filter import api_key_filter
 from datetime import datetime, timedelta
 import smtplib
 from email.mime.text import MIMEText
@@ -216,6 +218,7 @@ async def dev_verify(
         )
         db.add(api_key)
         db.commit()
+        api_key_filter.add(api_key.key)
         
         return templates.TemplateResponse("dev/verify.html", {
             "request": request,
@@ -282,14 +285,11 @@ async def dev_dashboard(request: Request, db: Session = Depends(get_database)):
         api_keys = db.query(ApiKey).filter(ApiKey.owner_id == user.id).all()
         
         # Get usage statistics
-        from sqlalchemy import func
         usage_stats = []
         for api_key in api_keys:
-            from db.models_v3 import UsageLog
-            total_requests = db.query(func.count(UsageLog.id)).filter(UsageLog.api_key_id == api_key.id).scalar()
             usage_stats.append({
                 'api_key': api_key,
-                'total_requests': total_requests or 0
+                'total_requests': UsageService.total_requests(db, api_key.id)
             })
         
         return templates.TemplateResponse("dev/dashboard.html", {
@@ -332,6 +332,7 @@ async def generate_new_api_key(request: Request, db: Session = Depends(get_datab
         )
         db.add(api_key)
         db.commit()
+        api_key_filter.add(api_key.key)
         
         return RedirectResponse(url="/dev/dashboard?success=New API key generated")
         
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Benchmark multi-field search: in-process catalog index vs the SQL path.
+
+Builds a synthetic catalog of each size in a temporary SQLite database,
+then times the same keyword/title/year/genre/actor queries through
+MovieSearchIndex.search_query and CatalogIndex.match.
+
+Then times misspelled fuzzy title queries through TrigramIndex.search
+against scoring every title, which is what a fuzzy search without a
+trigram index has to do.
+
+Usage: python benchmark_search.py [size ...]   (default: 10000 100000 1000000)
+"""
+
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import Session
+
+from catalog_index import CatalogIndex
+from db.models_v3 import Base, Genre, Movie, MovieCast, MovieGenre, Person
+from db.search import FUZZY_SIMILARITY, MovieSearchIndex, search_terms
+from trigram_index import TrigramIndex, strict_word_similarity, trigrams
+
+GENRES = [
+    "Action", "Adventure", "Animation", "Biography", "Comedy", "Crime", "Documentary", "Drama",
+    "Family", "Fantasy", "History", "Horror", "Music", "Musical", "Mystery", "Romance",
+    "Sci-Fi", "Sport", "Thriller", "War", "Western"
+]
+WORDS = [f"word{i}" for i in range(5000)]
+# Common words appear far more often in titles, as in real catalogs
+WORD_WEIGHTS = [1 / (rank + 1) for rank in range(len(WORDS))]
+PEOPLE = [f"Person {i}" for i in range(20000)]
+BATCH_SIZE = 10000
+REPEATS = 20
+# Full scans are slow at large sizes, so they run fewer times
+SCAN_REPEATS = 3
+
+# Pronounceable title words, so trigrams are spread as in real titles
+SYLLABLES = [
+    "ka", "lo", "mi", "ran", "dor", "the", "sa", "vel", "tor", "en", "bri", "gan", "ul", "mes",
+    "fa", "zen", "pa", "ro", "qui", "nel", "har", "os", "tri", "vin", "del", "mo", "ash", "cre"
+]
+
+QUERIES = [
+    ("title", {"title": "word1"}),
+    ("rare title", {"title": "word4321"}),
+    ("year + genre", {"year": 1994, "genre": "drama"}),
+    ("title + genre", {"title": "word3", "genre": "comedy"}),
+    ("title + year + genre", {"title": "word2", "year": 2001, "genre": "action"}),
+    ("actor + genre", {"actor": "person 42", "genre": "thriller"}),
+    ("q", {"q": "word7"}),
+    ("rare q", {"q": "word4321"}),
+    ("q two words", {"q": "person 42"}),
+    ("q + genre", {"q": "word12", "genre": "drama"}),
+    ("q + title + year", {"q": "person", "title": "word1", "year": 1994}),
+]
+
+def synthetic_movies(size: int, seed: int = 42):
+    """Yield movie rows with their genres, actors and director."""
+    rng = random.Random(seed)
+    seen = set()
+    movie_id = 0
+    while movie_id < size:
+        title = " ".join(rng.choices(WORDS, WORD_WEIGHTS, k=rng.randint(2, 4)))
+        year = rng.randint(1920, 2024)
+        if (title, year) in seen:
+            continue
+        seen.add((title, year))
+        movie_id += 1
+        yield {
+            "id": movie_id,
+            "title": title,
+            "year": year,
+            "genres": rng.sample(GENRES, rng.randint(1, 3)),
+            "actors": rng.sample(PEOPLE, 3),
+            "director": rng.choice(PEOPLE)
+        }
+
+def load_database(engine, movies) -> None:
+    """Bulk insert the movies and their normalized genre and cast rows."""
+    genre_ids = {name: i + 1 for i, name in enumerate(GENRES)}
+    person_ids = {name: i + 1 for i, name in enumerate(PEOPLE)}
+    with engine.begin() as conn:
+        conn.execute(insert(Genre), [{"id": i, "name": n, "name_key": n.lower()} for n, i in genre_ids.items()])
+        conn.execute(insert(Person), [{"id": i, "name": n, "name_key": n.lower()} for n, i in person_ids.items()])
+    for start in range(0, len(movies), BATCH_SIZE):
+        batch = movies[start:start + BATCH_SIZE]
+        with engine.begin() as conn:
+            conn.execute(insert(Movie), [{
+                "id": m["id"], "title": m["title"], "year": m["year"], "genre": "|".join(m["genres"]),
+                "director": m["director"], "actors": "|".join(m["actors"]), "plot": "", "poster_url": ""
+            } for m in batch])
+            conn.execute(insert(MovieGenre), [
+                {"movie_id": m["id"], "genre_id": genre_ids[g], "position": p}
+                for m in batch for p, g in enumerate(m["genres"])
+            ])
+            conn.execute(insert(MovieCast), [
+                {"movie_id": m["id"], "person_id": person_ids[name], "role": role, "position": p}
+                for m in batch
+                for role, names in (("actor", m["actors"]), ("director", [m["director"]]))
+                for p, name in enumerate(names)
+            ])
+
+def build_index(movies) -> CatalogIndex:
+    """Index the movies under the same keys the catalog snapshot uses."""
+    return CatalogIndex.build((m["id"], {
+        "title": tuple(set(m["title"].split())),
+        "text": tuple(set(search_terms(" ".join([m["title"], m["director"], *m["actors"], *m["genres"]])))),
+        "year": (m["year"],),
+        "genre": tuple(g.lower() for g in m["genres"]),
+        "actor": tuple(a.lower() for a in m["actors"]),
+        "director": (m["director"].lower(),)
+    }) for m in movies)
+
+def synthetic_titles(size: int, seed: int = 7):
+    """Yield ``(movie_id, title words)`` for titles of one to four pseudo-words."""
+    rng = random.Random(seed)
+    vocabulary = ["".join(rng.choices(SYLLABLES, k=rng.randint(2, 4))) for _ in range(50000)]
+    for movie_id in range(1, size + 1):
+        yield movie_id, tuple(rng.choices(vocabulary, k=rng.randint(1, 4)))
+
+def misspell(word: str, rng: random.Random) -> str:
+    """The word with one letter dropped, doubled or swapped with the next."""
+    position = rng.randrange(len(word) - 1)
+    typo = rng.choice(("drop", "double", "swap"))
+    if typo == "drop":
+        return word[:position] + word[position + 1:]
+    if typo == "double":
+        return word[:position] + word[position] + word[position:]
+    return word[:position] + word[position + 1] + word[position] + word[position + 2:]
+
+def timed(run, repeats: int = REPEATS) -> tuple:
+    """Median milliseconds over ``repeats`` runs, and the last result."""
+    times = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        result = run()
+        times.append((time.perf_counter() - started) * 1000)
+    return statistics.median(times), result
+
+def benchmark(size: int) -> None:
+    """Build a catalog of ``size`` movies and compare both search paths."""
+    movies = list(synthetic_movies(size))
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_engine(f"sqlite:///{os.path.join(directory, 'bench.db')}")
+        Base.metadata.create_all(bind=engine)
+
+        started = time.perf_counter()
+        load_database(engine, movies)
+        search_index = MovieSearchIndex(bind=engine)
+        search_index.setup()
+        print(f"\n{size:,} movies: database loaded in {time.perf_counter() - started:.1f} s")
+
+        started = time.perf_counter()
+        index = build_index(movies)
+        print(f"{size:,} movies: index built in {time.perf_counter() - started:.1f} s")
+
+        print(f"{'query':<22}{'results':>10}{'sql ms':>10}{'index ms':>10}{'speedup':>10}")
+        with Session(engine) as db:
+            for label, criteria in QUERIES:
+                sql_ms, rows = timed(lambda: search_index.search_query(db, **criteria).with_entities(Movie.id).all())
+                title_terms = criteria.get("title", "").split()
+                text_terms = search_terms(criteria.get("q", ""))
+                filters = {field: value for field, value in criteria.items() if field not in ("title", "q")}
+                index_ms, ids = timed(lambda: index.match(title_terms, text_terms, **filters))
+                if sorted(row.id for row in rows) != ids:
+                    raise AssertionError(f"{label}: index and SQL results differ")
+                print(f"{label:<22}{len(ids):>10,}{sql_ms:>10.2f}{index_ms:>10.2f}{sql_ms / max(index_ms, 1e-6):>9.1f}x")
+        engine.dispose()
+
+def benchmark_fuzzy(size: int, queries: int = 6) -> None:
+    """Time misspelled title queries through the trigram index and a full scan of ``size`` titles."""
+    titles = list(synthetic_titles(size))
+    started = time.perf_counter()
+    index = TrigramIndex.build(titles)
+    print(f"\n{size:,} titles: trigram index built in {time.perf_counter() - started:.1f} s")
+
+    rng = random.Random(size)
+    print(f"{'fuzzy query':<28}{'results':>10}{'scan ms':>10}{'index ms':>10}{'speedup':>10}")
+    for i, (_, words) in enumerate(rng.sample(titles, queries)):
+        # The longest word or two of a title, each with one typo
+        words = [misspell(word, rng) for word in sorted(words, key=len, reverse=True)[:1 + i % 2]]
+        query = trigrams(words)
+
+        def scan():
+            scored = ((movie_id, strict_word_similarity(query, title)) for movie_id, title in titles)
+            matches = [(movie_id, score) for movie_id, score in scored if score >= FUZZY_SIMILARITY]
+            return sorted(matches, key=lambda match: (-match[1], match[0]))
+
+        scan_ms, expected = timed(scan, SCAN_REPEATS)
+        index_ms, results = timed(lambda: index.search(words, FUZZY_SIMILARITY))
+        if results != expected:
+            raise AssertionError(f"{' '.join(words)}: index and scan results differ")
+        label = " ".join(words)[:26]
+        print(f"{label:<28}{len(results):>10,}{scan_ms:>10.2f}{index_ms:>10.2f}{scan_ms / max(index_ms, 1e-6):>9.1f}x")
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10000, 100000, 1000000]
+    for size in sizes:
+        benchmark(size)
+    for size in sizes:
+        benchmark_fuzzy(size)
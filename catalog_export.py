@@ -0,0 +1,87 @@
+import csv
+import io
+import os
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+from sqlalchemy import select
+
+from data_loader import CatalogSnapshot, MovieDataLoader
+from db.database import SessionLocal
+from db.models_v3 import Movie
+from serialization import MOVIE_FIELDS, encode_fields
+
+# Movies fetched from the database, and written to the client, per chunk
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+
+# Supported export formats and their media types
+EXPORT_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8"
+}
+
+class CatalogExport:
+    """Full-catalog export as NDJSON or CSV, produced in fixed-size chunks.
+
+    Exports read one catalog snapshot when it is enabled; otherwise they
+    stream the movies table through a server-side cursor (``yield_per``)
+    in their own session, since the response outlives the request's
+    session. Either way memory stays bounded by ``batch_size`` whatever the
+    catalog size. The generators are synchronous, so StreamingResponse runs
+    them in the thread pool.
+    """
+
+    def __init__(self, snapshot: Optional[CatalogSnapshot], fields: Sequence[str] = MOVIE_FIELDS, batch_size: int = EXPORT_BATCH_SIZE):
+        self.snapshot = snapshot
+        self.fields = fields
+        self.batch_size = batch_size
+
+    def _database_batches(self) -> Iterator[List[Movie]]:
+        """Movies in id order, ``batch_size`` rows per round trip."""
+        db = SessionLocal()
+        try:
+            statement = select(Movie).options(*MovieDataLoader.load_options(self.fields)).order_by(Movie.id)
+            for movies in db.scalars(statement.execution_options(yield_per=self.batch_size)).partitions():
+                # The session only holds weak references, so written rows are freed
+                yield movies
+        finally:
+            db.close()
+
+    def _value_batches(self) -> Iterator[List[Dict[str, Any]]]:
+        """Response values of every movie, in id order and in batches."""
+        if self.snapshot is not None:
+            entries = self.snapshot.entries
+            for start in range(0, len(entries), self.batch_size):
+                yield [vars(entry.response) for entry in entries[start:start + self.batch_size]]
+        else:
+            for movies in self._database_batches():
+                yield [MovieDataLoader.movie_values(movie, self.fields) for movie in movies]
+
+    def ndjson(self) -> Iterator[bytes]:
+        """One JSON movie per line, encoded exactly as /movies encodes it."""
+        if self.snapshot is not None:
+            entries = self.snapshot.entries
+            for start in range(0, len(entries), self.batch_size):
+                yield b"".join(entry.project(self.fields) + b"\n" for entry in entries[start:start + self.batch_size])
+            return
+        for batch in self._value_batches():
+            yield b"".join(encode_fields(values, self.fields) + b"\n" for values in batch)
+
+    def csv(self) -> Iterator[bytes]:
+        """A header row, then one row per movie; genres and actors are pipe-separated as in the source CSV."""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(self.fields)
+        for batch in self._value_batches():
+            writer.writerows(
+                ["|".join(value) if isinstance(value, list) else value for value in (values[name] for name in self.fields)]
+                for values in batch
+            )
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue().encode("utf-8")
+
+    def stream(self, export_format: str) -> Iterator[bytes]:
+        """Chunks of the export in ``export_format`` (a key of EXPORT_MEDIA_TYPES)."""
+        return self.ndjson() if export_format == "ndjson" else self.csv()
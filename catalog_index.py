@@ -0,0 +1,216 @@
+import bisect
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Below this ratio of postings to catalog size, intersect sorted id lists instead of bitmaps
+SPARSE_RATIO = 1 / 64
+
+class PostingList:
+    """Sorted movie ids for one index key, with a bitmap built on first use.
+
+    Lists are never modified once published; updates build a new list so
+    readers of an older index keep a consistent view.
+    """
+
+    __slots__ = ("ids", "_bitmap")
+
+    def __init__(self, ids: List[int]):
+        self.ids = ids
+        self._bitmap: Optional[int] = None
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def bitmap(self) -> int:
+        """The ids as bits of an integer (bit ``n`` set for movie ``n``)."""
+        if self._bitmap is None:
+            self._bitmap = ids_to_bitmap(self.ids)
+        return self._bitmap
+
+    def changed(self, removed: Iterable[int] = (), added: Iterable[int] = ()) -> Optional["PostingList"]:
+        """A new list with ``removed`` dropped and ``added`` inserted; None if it ends up empty."""
+        ids = list(self.ids)
+        for movie_id in removed:
+            position = bisect.bisect_left(ids, movie_id)
+            if position < len(ids) and ids[position] == movie_id:
+                del ids[position]
+        for movie_id in added:
+            position = bisect.bisect_left(ids, movie_id)
+            if position == len(ids) or ids[position] != movie_id:
+                ids.insert(position, movie_id)
+        return PostingList(ids) if ids else None
+
+def ids_to_bitmap(ids: List[int]) -> int:
+    """Pack sorted ids into an integer bitmap."""
+    if not ids:
+        return 0
+    bits = bytearray(ids[-1] // 8 + 1)
+    for movie_id in ids:
+        bits[movie_id >> 3] |= 1 << (movie_id & 7)
+    return int.from_bytes(bits, "little")
+
+def bitmap_to_ids(bitmap: int) -> List[int]:
+    """Ids of the set bits, ascending."""
+    ids = []
+    bits = bin(bitmap)[:1:-1]
+    position = bits.find("1")
+    while position != -1:
+        ids.append(position)
+        position = bits.find("1", position + 1)
+    return ids
+
+def intersect_sorted(smallest: List[int], others: List[List[int]]) -> List[int]:
+    """Ids of ``smallest`` found in every list of ``others``, using binary search."""
+    result = []
+    cursors = [0] * len(others)
+    for movie_id in smallest:
+        for i, ids in enumerate(others):
+            cursors[i] = bisect.bisect_left(ids, movie_id, cursors[i])
+            if cursors[i] == len(ids) or ids[cursors[i]] != movie_id:
+                break
+        else:
+            result.append(movie_id)
+    return result
+
+class CatalogIndex:
+    """Inverted index over the movie catalog for multi-field search.
+
+    Title words map to posting lists of movie ids; years, genres, actors
+    and directors map to the same structure, used as bitmaps when they are
+    dense. A query intersects one operand per criterion: when the smallest
+    operand is short its ids are looked up in the other sorted lists,
+    otherwise the bitmaps are ANDed. Title terms match word prefixes
+    through a sorted vocabulary, as do text terms, which are filed under
+    every word of the movie in any field.
+
+    Indexes are immutable. ``updated`` returns a new index that shares
+    every posting list the change did not touch, so catalog changes cost
+    time proportional to the movies that changed.
+    """
+
+    FIELDS = ("title", "text", "year", "genre", "actor", "director")
+    # Fields whose terms match word prefixes
+    PREFIX_FIELDS = ("title", "text")
+
+    def __init__(self):
+        self.postings: Dict[str, Dict[object, PostingList]] = {field: {} for field in self.FIELDS}
+        self.vocabularies: Dict[str, List[str]] = {field: [] for field in self.PREFIX_FIELDS}
+        self.keys: Dict[int, Dict[str, Tuple]] = {}
+
+    @classmethod
+    def build(cls, documents: Iterable[Tuple[int, Dict[str, Tuple]]]) -> "CatalogIndex":
+        """Index ``(movie_id, {field: keys})`` pairs from scratch."""
+        index = cls()
+        collected: Dict[str, Dict[object, List[int]]] = {field: {} for field in cls.FIELDS}
+        for movie_id, keys in sorted(documents, key=lambda document: document[0]):
+            index.keys[movie_id] = keys
+            for field, values in keys.items():
+                for value in values:
+                    collected[field].setdefault(value, []).append(movie_id)
+        for field, lists in collected.items():
+            index.postings[field] = {value: PostingList(ids) for value, ids in lists.items()}
+        index.vocabularies = {field: sorted(index.postings[field]) for field in cls.PREFIX_FIELDS}
+        return index
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def updated(
+        self,
+        changed: Iterable[Tuple[int, Dict[str, Tuple]]] = (),
+        removed: Iterable[int] = ()
+    ) -> "CatalogIndex":
+        """A new index with ``changed`` movies (re)indexed and ``removed`` ids dropped."""
+        deltas: Dict[str, Dict[object, Tuple[List[int], List[int]]]] = {field: {} for field in self.FIELDS}
+        keys = dict(self.keys)
+
+        def delta(field, value):
+            return deltas[field].setdefault(value, ([], []))
+
+        for movie_id in removed:
+            for field, values in keys.pop(movie_id, {}).items():
+                for value in values:
+                    delta(field, value)[0].append(movie_id)
+        for movie_id, new_keys in changed:
+            old_keys = keys.get(movie_id, {})
+            for field in self.FIELDS:
+                old_values, new_values = set(old_keys.get(field, ())), set(new_keys.get(field, ()))
+                for value in old_values - new_values:
+                    delta(field, value)[0].append(movie_id)
+                for value in new_values - old_values:
+                    delta(field, value)[1].append(movie_id)
+            keys[movie_id] = new_keys
+
+        index = CatalogIndex()
+        index.keys = keys
+        for field in self.FIELDS:
+            postings = self.postings[field]
+            if deltas[field]:
+                postings = dict(postings)
+                for value, (dropped, added) in deltas[field].items():
+                    current = postings.get(value, PostingList([]))
+                    posting = current.changed(sorted(dropped), sorted(added))
+                    if posting is None:
+                        postings.pop(value, None)
+                    else:
+                        postings[value] = posting
+            index.postings[field] = postings
+        for field in self.PREFIX_FIELDS:
+            if deltas[field]:
+                index.vocabularies[field] = sorted(index.postings[field])
+            else:
+                index.vocabularies[field] = self.vocabularies[field]
+        return index
+
+    def _prefix_postings(self, field: str, term: str) -> PostingList:
+        """Movies with a ``field`` word starting with ``term``."""
+        vocabulary = self.vocabularies[field]
+        start = bisect.bisect_left(vocabulary, term)
+        end = bisect.bisect_left(vocabulary, term + "\uffff", start)
+        postings = self.postings[field]
+        if end - start == 1:
+            return postings[vocabulary[start]]
+        ids = set()
+        for token in vocabulary[start:end]:
+            ids.update(postings[token].ids)
+        return PostingList(sorted(ids))
+
+    def match(
+        self,
+        title_terms: Iterable[str] = (),
+        text_terms: Iterable[str] = (),
+        **criteria
+    ) -> Optional[List[int]]:
+        """Sorted ids matching every criterion, or None when there are none to apply.
+
+        ``text_terms`` match a word of any field; ``criteria`` maps the other
+        fields (year, genre, actor, director) to a key.
+        """
+        operands = [self._prefix_postings("title", term) for term in title_terms]
+        operands += [self._prefix_postings("text", term) for term in text_terms]
+        for field, value in criteria.items():
+            if value is not None:
+                operands.append(self.postings[field].get(value, PostingList([])))
+        if not operands:
+            return None
+        operands.sort(key=len)
+        if len(operands[0]) == 0:
+            return []
+        if len(operands) == 1:
+            return list(operands[0].ids)
+
+        if len(operands[0]) <= len(self.keys) * SPARSE_RATIO:
+            return intersect_sorted(operands[0].ids, [operand.ids for operand in operands[1:]])
+        bitmap = operands[0].bitmap
+        for operand in operands[1:]:
+            bitmap &= operand.bitmap
+            if not bitmap:
+                return []
+        return bitmap_to_ids(bitmap)
+
+    def stats(self) -> dict:
+        """Index size for the admin metrics endpoint."""
+        return {
+            "movies": len(self.keys),
+            **{f"{field}_keys": len(self.postings[field]) for field in self.FIELDS}
+        }
@@ -0,0 +1,47 @@
+import itertools
+import os
+import tempfile
+from datetime import datetime
+
+import pytest
+
+# Unit tests run against a throwaway SQLite database (or TEST_DATABASE_URL), never DATABASE_URL
+os.environ["DATABASE_URL"] = os.getenv(
+    "TEST_DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='movie_api_tests_'), 'test.db')}"
+)
+
+# test_api.py exercises a running server and is run by hand
+collect_ignore = ["test_api.py"]
+
+_key_numbers = itertools.count(1)
+
+@pytest.fixture
+def db():
+    """A session on the test database with every table created."""
+    from db.database import SessionLocal, create_tables
+    create_tables()
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.rollback()
+        session.close()
+
+@pytest.fixture
+def make_api_key(db):
+    """Create a committed API key row; returns the model."""
+    from db.models_v3 import ApiKey, User
+
+    def make(usage_count: int = 0, monthly_limit: int = 1000, last_reset: datetime = None, **values):
+        number = next(_key_numbers)
+        user = User(name=f"user {number}", email=f"user{number}@example.com", hashed_password="x")
+        db.add(user)
+        db.flush()
+        api_key = ApiKey(
+            owner_id=user.id, key=f"mapi_test_{number}", usage_count=usage_count,
+            monthly_limit=monthly_limit, last_reset=last_reset or datetime.now(), **values
+        )
+        db.add(api_key)
+        db.commit()
+        return api_key
+    return make
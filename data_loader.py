@@ -1,87 +1,301 @@
-import pandas as pd
-from typing import List, Dict, Any
-from models import Movie, MovieResponse
+import asyncio
+import bisect
+import heapq
+import os
+import threading
+import time
+from typing import List, Dict, Any, Optional, Sequence, Tuple
+from sqlalchemy.orm import lazyload, load_only
+from models import MovieResponse
+from catalog_index import CatalogIndex
+from trigram_index import TrigramIndex
+from serialization import FIELD_POSITIONS, MOVIE_FIELDS, field_json
+from db import models_v3
+from db.catalog import catalog_version
+from db.database import SessionLocal
+from db.search import FUZZY_SIMILARITY, search_terms
+from db.services import split_names
+
+# Serve /movies, /movies/{id} and /search from the in-memory snapshot; "false" sends every read to SQL
+CATALOG_SNAPSHOT_ENABLED = os.getenv("CATALOG_SNAPSHOT", "true").lower() == "true"
+
+# Relevance weight of a match in each field, in line with the full-text index
+FIELD_WEIGHTS = {"title": 10.0, "director": 3.0, "actors": 3.0, "genre": 2.0, "plot": 1.0}
+
+class SnapshotEntry:
+    """A movie response, its encoded JSON (whole and per field) and the keys used to search it."""
+
+    __slots__ = ("response", "fields_json", "json", "tokens", "title_words", "keys")
+
+    def __init__(self, response: MovieResponse):
+        self.response = response
+        self.fields_json = tuple(field_json(name, getattr(response, name)) for name in MOVIE_FIELDS)
+        self.json = b"{" + b",".join(self.fields_json) + b"}"
+        fields = {
+            "title": response.title,
+            "director": response.director,
+            "actors": " ".join(response.actors),
+            "genre": " ".join(response.genre),
+            "plot": response.plot
+        }
+        # Each word with the weight of the best field it appears in
+        self.tokens: Dict[str, float] = {}
+        for field, value in fields.items():
+            for token in search_terms(value or ""):
+                self.tokens[token] = max(self.tokens.get(token, 0.0), FIELD_WEIGHTS[field])
+        # Title words in order, for the trigram index
+        self.title_words = tuple(search_terms(response.title))
+        # Keys under which the movie is filed in the catalog index
+        self.keys = {
+            "title": tuple(set(search_terms(response.title))),
+            "text": tuple(self.tokens),
+            "year": (response.year,),
+            "genre": tuple({name.lower() for name in response.genre}),
+            "actor": tuple({name.lower() for name in response.actors}),
+            "director": tuple({name.lower() for name in split_names(response.director)})
+        }
+
+    def project(self, fields: Sequence[str]) -> bytes:
+        """The movie's JSON limited to ``fields``."""
+        if len(fields) == len(MOVIE_FIELDS):
+            return self.json
+        return b"{" + b",".join(self.fields_json[FIELD_POSITIONS[name]] for name in fields) + b"}"
+
+    def prefix_weight(self, term: str) -> float:
+        """Best weight among words starting with ``term``; 0 if none does."""
+        return max((weight for token, weight in self.tokens.items() if token.startswith(term)), default=0.0)
+
+class CatalogSnapshot:
+    """Immutable view of the movie catalog at one catalog version.
+
+    Given the ``previous`` snapshot, unchanged movies keep their entries
+    and the indexes are updated only for the movies that changed.
+    """
+
+    def __init__(self, version: int, responses: List[MovieResponse], previous: Optional["CatalogSnapshot"] = None):
+        self.version = version
+        previous_entries = previous.entries_by_id if previous else {}
+        entries = []
+        changed = []
+        for response in sorted(responses, key=lambda response: response.id):
+            entry = previous_entries.get(response.id)
+            if entry is None or entry.response != response:
+                entry = SnapshotEntry(response)
+                changed.append((response.id, entry.keys))
+            entries.append(entry)
+        self.entries: Tuple[SnapshotEntry, ...] = tuple(entries)
+        self.entries_by_id: Dict[int, SnapshotEntry] = {entry.response.id: entry for entry in entries}
+        changed_titles = [(movie_id, self.entries_by_id[movie_id].title_words) for movie_id, _ in changed]
+        if previous is None:
+            self.index = CatalogIndex.build((movie_id, keys) for movie_id, keys in changed)
+            self.titles = TrigramIndex.build(changed_titles)
+        else:
+            removed = [movie_id for movie_id in previous_entries if movie_id not in self.entries_by_id]
+            self.index = previous.index.updated(changed, removed)
+            self.titles = previous.titles.updated(changed_titles, removed)
+        self.movies: Tuple[MovieResponse, ...] = tuple(entry.response for entry in self.entries)
+        self.ids: List[int] = [movie.id for movie in self.movies]
+        self.movies_dict: Dict[int, MovieResponse] = {movie.id: movie for movie in self.movies}
+
+    def __len__(self) -> int:
+        return len(self.movies)
+
+    def encoded(self, movies: List[MovieResponse], fields: Sequence[str] = MOVIE_FIELDS) -> List[bytes]:
+        """Encoded JSON of movies taken from this snapshot, limited to ``fields``."""
+        return [self.entries_by_id[movie.id].project(fields) for movie in movies]
+
+    def page(self, offset: int, limit: int) -> List[MovieResponse]:
+        """Movies by position in id order."""
+        return list(self.movies[offset:offset + limit])
+
+    def page_after(self, after_id: int, limit: int) -> List[MovieResponse]:
+        """Movies with an id greater than ``after_id``, in id order."""
+        start = bisect.bisect_right(self.ids, after_id)
+        return list(self.movies[start:start + limit])
+
+    def search(
+        self,
+        q: str = None,
+        title: str = None,
+        year: int = None,
+        genre: str = None,
+        actor: str = None,
+        director: str = None,
+        fuzzy: bool = False,
+        similarity: float = FUZZY_SIMILARITY,
+        window: Optional[int] = None
+    ) -> List[MovieResponse]:
+        """Same matching rules as the SQL search; keyword matches are ranked by field weight.
+
+        With ``fuzzy``, ``title`` matches by trigram similarity and the most
+        similar titles come first. With a ``window``, only the first
+        ``window`` matches are returned, without ordering the rest.
+        """
+        q_terms = search_terms(q) if q else []
+        title_terms = search_terms(title) if title else []
+        if (q and not q_terms) or (title and not title_terms):
+            return []
+        title_similarity: Dict[int, float] = {}
+        if fuzzy and title_terms:
+            title_similarity = dict(self.titles.search(title_terms, similarity))
+            if not title_similarity:
+                return []
+            title_terms = []
+        genre_key = genre.strip().lower() if genre else None
+        actor_key = actor.strip().lower() if actor else None
+        director_key = director.strip().lower() if director else None
+
+        # Keywords and filters resolve through the index; only the matches are scored
+        ids = self.index.match(
+            title_terms, q_terms, year=year or None, genre=genre_key, actor=actor_key, director=director_key
+        )
+        if title_similarity:
+            ids = sorted(title_similarity) if ids is None else [movie_id for movie_id in ids if movie_id in title_similarity]
+        if ids is None:
+            ids = self.ids
+
+        if not (q_terms or title_similarity):
+            # Unranked matches stay in id order, so the window is a slice
+            return [self.entries_by_id[movie_id].response for movie_id in ids[:window]]
+
+        def rank(movie_id: int) -> tuple:
+            # Title similarity ranks first when fuzzy; keyword scores break its ties
+            entry = self.entries_by_id[movie_id]
+            score = sum(entry.prefix_weight(term) for term in q_terms)
+            return -title_similarity.get(movie_id, 0.0), -score, movie_id
+
+        ranked = sorted(map(rank, ids)) if window is None else heapq.nsmallest(window, map(rank, ids))
+        return [self.entries_by_id[key[2]].response for key in ranked]
 
 class MovieDataLoader:
-    """Handles loading and managing movie data from CSV file."""
+    """In-memory movie catalog that serves reads without the database.
 
-    def __init__(self, csv_path: str = "data/movies.csv"):
-        self.csv_path = csv_path
-        self.movies: List[Movie] = []
-        self.movies_dict: Dict[int, Movie] = {}
+    Holds an immutable ``CatalogSnapshot``. ``refresh`` builds a new one
+    from the movies table and swaps it in with a single assignment, so a
+    request always sees one consistent catalog version. Once started, the
+    snapshot is rebuilt whenever ``catalog_version`` reports a change.
+    """
 
-    def load_data(self) -> None:
-        """Load movie data from CSV file into memory."""
-        try:
-            df = pd.read_csv(self.csv_path)
+    def __init__(self, enabled: bool = CATALOG_SNAPSHOT_ENABLED):
+        self.enabled = enabled
+        self.snapshot: Optional[CatalogSnapshot] = None
+        self._lock = threading.Lock()
+        self._subscribed = False
+        self.rebuilds = 0
+        self.last_build_ms = 0.0
 
-            for _, row in df.iterrows():
-                movie = Movie(
-                    id=int(row['id']),
-                    title=str(row['title']),
-                    year=int(row['year']),
-                    genre=str(row['genre']),
-                    director=str(row['director']),
-                    actors=str(row['actors']),
-                    plot=str(row['plot']),
-                    poster_url=str(row['poster_url'])
+    @property
+    def movies(self) -> List[MovieResponse]:
+        """Movies in the current snapshot."""
+        return list(self.snapshot.movies) if self.snapshot else []
+
+    @property
+    def movies_dict(self) -> Dict[int, MovieResponse]:
+        """Movies in the current snapshot by id."""
+        return self.snapshot.movies_dict if self.snapshot else {}
+
+    def current(self) -> Optional[CatalogSnapshot]:
+        """Snapshot to serve from, or None when reads should go to SQL."""
+        return self.snapshot if self.enabled else None
+
+    def refresh(self, version: Optional[int] = None) -> CatalogSnapshot:
+        """Build a snapshot of the movies table and swap it in, unless it is already current."""
+        with self._lock:
+            version = catalog_version.version if version is None else version
+            if self.snapshot is not None and self.snapshot.version >= version:
+                return self.snapshot
+
+            started = time.perf_counter()
+            db = SessionLocal()
+            try:
+                movies = db.query(models_v3.Movie).order_by(models_v3.Movie.id).all()
+                snapshot = CatalogSnapshot(
+                    version, [self.movie_to_response(movie) for movie in movies], previous=self.snapshot
                 )
-                self.movies.append(movie)
-                self.movies_dict[movie.id] = movie
+            finally:
+                db.close()
 
-            print(f"Loaded {len(self.movies)} movies from {self.csv_path}")
+            self.snapshot = snapshot
+            self.rebuilds += 1
+            self.last_build_ms = (time.perf_counter() - started) * 1000
+            print(f"Catalog snapshot v{version}: {len(snapshot)} movies in {self.last_build_ms:.0f} ms")
+            return snapshot
 
-        except FileNotFoundError:
-            print(f"Error: CSV file not found at {self.csv_path}")
-            raise
-        except Exception as e:
-            print(f"Error loading CSV data: {e}")
-            raise
+    async def start(self) -> None:
+        """Load the first snapshot and rebuild it on every catalog change."""
+        if not self.enabled:
+            return
+        await asyncio.to_thread(self.refresh)
+        if not self._subscribed:
+            catalog_version.subscribe(self.refresh)
+            self._subscribed = True
 
-    def get_all_movies(self) -> List[Movie]:
+    def get_all_movies(self) -> List[MovieResponse]:
         """Get all movies."""
         return self.movies
 
-    def get_movie_by_id(self, movie_id: int) -> Movie:
+    def get_movie_by_id(self, movie_id: int) -> Optional[MovieResponse]:
         """Get a specific movie by ID."""
         return self.movies_dict.get(movie_id)
 
-    def search_movies(self, title: str = None, year: int = None, genre: str = None) -> List[Movie]:
-        """Search movies by title, year, and/or genre."""
-        results = self.movies.copy()
-
-        if title:
-            title_lower = title.lower()
-            results = [movie for movie in results if title_lower in movie.title.lower()]
+    def search_movies(self, title: str = None, year: int = None, genre: str = None, **criteria) -> List[MovieResponse]:
+        """Search movies by title, year, genre and the other /search criteria."""
+        if self.snapshot is None:
+            return []
+        return self.snapshot.search(title=title, year=year, genre=genre, **criteria)
 
-        if year:
-            results = [movie for movie in results if movie.year == year]
+    def stats(self) -> dict:
+        """Snapshot state for the admin metrics endpoint."""
+        snapshot = self.snapshot
+        return {
+            "enabled": self.enabled,
+            "version": snapshot.version if snapshot else None,
+            "movies": len(snapshot) if snapshot else 0,
+            "rebuilds": self.rebuilds,
+            "last_build_ms": round(self.last_build_ms, 2),
+            "index": snapshot.index.stats() if snapshot else None,
+            "title_trigrams": snapshot.titles.stats() if snapshot else None
+        }
 
-        if genre:
-            genre_lower = genre.lower()
-            results = [movie for movie in results 
-                      if any(genre_lower in g.lower() for g in movie.genre.split('|'))]
+    @staticmethod
+    def movie_to_response(movie: "models_v3.Movie") -> MovieResponse:
+        """Build the API response for a database movie from its normalized genres and cast."""
+        return MovieResponse(**MovieDataLoader.movie_values(movie))
 
-        return results
+    @staticmethod
+    def movie_values(movie: "models_v3.Movie", fields: Sequence[str] = MOVIE_FIELDS) -> Dict[str, Any]:
+        """Response values of a database movie, only for ``fields``."""
+        values = {}
+        for name in fields:
+            if name == "genre":
+                values[name] = movie.genre_names
+            elif name == "actors":
+                values[name] = movie.actor_names
+            elif name == "poster_url":
+                values[name] = movie.poster_url or ""
+            else:
+                values[name] = getattr(movie, name)
+        return values
 
     @staticmethod
-    def movie_to_response(movie: Movie) -> MovieResponse:
-        """Convert Movie model to MovieResponse model."""
-        return MovieResponse(
-            id=movie.id,
-            title=movie.title,
-            year=movie.year,
-            genre=movie.genre.split('|'),
-            director=movie.director,
-            actors=movie.actors.split('|'),
-            plot=movie.plot,
-            poster_url=movie.poster_url
-        )
+    def load_options(fields: Sequence[str] = MOVIE_FIELDS) -> list:
+        """Query options loading only the columns and links that ``fields`` need."""
+        movie = models_v3.Movie
+        options = [load_only(*(getattr(movie, name) for name in fields if name not in ("genre", "actors")))]
+        if "genre" not in fields:
+            options.append(lazyload(movie.genre_links))
+        if "actors" not in fields:
+            options.append(lazyload(movie.cast_links))
+        return options
+
+# Shared in-memory catalog used by the movie endpoints
+movie_catalog = MovieDataLoader()
+
 import csv
-import os
 from sqlalchemy.orm import Session
-from db.database import SessionLocal, create_tables
+from db.database import create_tables
 from db.models_v3 import Movie
+from db.services import MovieService
 
 def load_movies_from_csv():
     """Load movies from CSV file into database."""
@@ -91,18 +305,24 @@ def load_movies_from_csv():
         existing_count = db.query(Movie).count()
         if existing_count > 0:
             print(f"Database already has {existing_count} movies. Skipping CSV import.")
+            # Movies loaded before the genre and cast tables existed
+            linked = MovieService.link_unlinked_movies(db)
+            if linked:
+                print(f"Linked genres and cast for {linked} movies.")
             return
 
         csv_file = "data/movies.csv"
         if not os.path.exists(csv_file):
             print(f"CSV file {csv_file} not found. Creating sample movies...")
             create_sample_movies(db)
+            catalog_version.bump(db)
             return
 
         print("Loading movies from CSV...")
         with open(csv_file, 'r', encoding='utf-8') as file:
             csv_reader = csv.DictReader(file)
             movies_added = 0
+            batch = []
 
             for row in csv_reader:
                 # Create movie object
@@ -117,13 +337,18 @@ def load_movies_from_csv():
                 )
 
                 db.add(movie)
+                batch.append(movie)
                 movies_added += 1
 
                 if movies_added % 100 == 0:
+                    MovieService.link_movies(db, batch)
+                    batch = []
                     db.commit()
                     print(f"Loaded {movies_added} movies...")
 
+            MovieService.link_movies(db, batch)
             db.commit()
+            catalog_version.bump(db)
             print(f"Successfully loaded {movies_added} movies from CSV!")
 
     except Exception as e:
@@ -182,9 +407,9 @@ def create_sample_movies(db: Session):
         }
     ]
 
-    for movie_data in sample_movies:
-        movie = Movie(**movie_data)
-        db.add(movie)
+    movies = [Movie(**movie_data) for movie_data in sample_movies]
+    db.add_all(movies)
+    MovieService.link_movies(db, movies)
 
     db.commit()
     print(f"Created {len(sample_movies)} sample movies!")
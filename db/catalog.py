@@ -0,0 +1,157 @@
+import asyncio
+import os
+from datetime import datetime
+from typing import Callable, List, Optional, Tuple
+
+from sqlalchemy import func, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from .database import SessionLocal
+from .models_v3 import CatalogState, Movie
+
+# Seconds between reads of the catalog_state row, to pick up changes made by other processes
+CATALOG_REFRESH_INTERVAL = float(os.getenv("CATALOG_REFRESH_INTERVAL", "5"))
+
+CATALOG_STATE_ID = 1
+
+class CatalogVersion:
+    """Movie catalog version and size held in memory.
+
+    The catalog only changes through CSV uploads, the startup loader and
+    the migration scripts. Each of them calls ``bump``, which counts the
+    movies once and increments the version in the ``catalog_state`` row.
+    Workers re-read that single row every ``refresh_interval`` seconds, so
+    request handlers never COUNT the movies table. Callbacks registered
+    with ``subscribe`` run whenever a new version is seen.
+    """
+
+    def __init__(self, refresh_interval: float = CATALOG_REFRESH_INTERVAL):
+        self.refresh_interval = refresh_interval
+        self._state: Optional[Tuple[int, int]] = None
+        self._updated_at: Optional[datetime] = None
+        self._listeners: List[Callable[[int], None]] = []
+        self._task: Optional[asyncio.Task] = None
+
+    def subscribe(self, callback: Callable[[int], None]) -> None:
+        """Call ``callback(version)`` whenever the catalog version changes."""
+        self._listeners.append(callback)
+
+    def _set_state(self, state: Tuple[int, int], updated_at: Optional[datetime]) -> None:
+        """Store a new state, notifying listeners first if the version moved.
+
+        Listeners finish before the new version is published, so nothing
+        keyed by the version (ETags, cached responses) pairs it with old data.
+        """
+        previous = self._state
+        if previous is not None and previous[0] != state[0]:
+            for callback in self._listeners:
+                try:
+                    callback(state[0])
+                except Exception as e:
+                    print(f"Catalog change listener failed: {e}")
+        self._updated_at = updated_at
+        self._state = state
+
+    def current(self) -> Tuple[int, int]:
+        """Current ``(version, movie_count)``, read from the database on first use."""
+        state = self._state
+        if state is None:
+            state = self.refresh()
+        return state
+
+    @property
+    def version(self) -> int:
+        """Catalog version; changes whenever movies are added or updated."""
+        return self.current()[0]
+
+    @property
+    def movie_count(self) -> int:
+        """Number of movies in the catalog."""
+        return self.current()[1]
+
+    @property
+    def updated_at(self) -> Optional[datetime]:
+        """When the catalog last changed, as recorded by ``bump``."""
+        self.current()
+        return self._updated_at
+
+    def refresh(self) -> Tuple[int, int]:
+        """Reload the state row, creating it from a full count if missing."""
+        db = SessionLocal()
+        try:
+            row = db.get(CatalogState, CATALOG_STATE_ID)
+            if row is None:
+                row = CatalogState(
+                    id=CATALOG_STATE_ID,
+                    version=1,
+                    movie_count=db.query(func.count(Movie.id)).scalar() or 0,
+                    updated_at=datetime.now()
+                )
+                try:
+                    db.add(row)
+                    db.commit()
+                except IntegrityError:
+                    # Another worker created the row first
+                    db.rollback()
+                    row = db.get(CatalogState, CATALOG_STATE_ID)
+            self._set_state((row.version, row.movie_count), row.updated_at)
+            return self._state
+        finally:
+            db.close()
+
+    def bump(self, db: Session) -> int:
+        """Record a catalog change after the movies were committed; return the new version.
+
+        Recounts the movies, increments the version and commits. Listeners
+        run in the calling thread, so async handlers call this through
+        ``asyncio.to_thread``.
+        """
+        movie_count = db.query(func.count(Movie.id)).scalar() or 0
+        now = datetime.now()
+        version = db.execute(
+            update(CatalogState).where(CatalogState.id == CATALOG_STATE_ID).values(
+                version=CatalogState.version + 1,
+                movie_count=movie_count,
+                updated_at=now
+            ).returning(CatalogState.version).execution_options(synchronize_session=False)
+        ).scalar()
+        if version is None:
+            version = 1
+            db.add(CatalogState(id=CATALOG_STATE_ID, version=version, movie_count=movie_count, updated_at=now))
+        db.commit()
+        self._set_state((version, movie_count), now)
+        return version
+
+    async def _run(self) -> None:
+        """Pick up catalog changes made by other workers and scripts."""
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                await asyncio.to_thread(self.refresh)
+            except Exception as e:
+                print(f"Failed to refresh catalog version: {e}")
+
+    async def start(self) -> None:
+        """Load the catalog state and start the refresh task."""
+        await asyncio.to_thread(self.refresh)
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the refresh task."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        """Catalog state for the admin metrics endpoint."""
+        version, movie_count = self._state or (0, 0)
+        return {"version": version, "movie_count": movie_count}
+
+# Shared catalog state used by the movie endpoints
+catalog_version = CatalogVersion()
@@ -3,6 +3,8 @@ from sqlalchemy.orm import Session
 from .database import SessionLocal, engine
 from .models_v3 import Base, Movie, ApiKey, User, EmailVerification, UsageLog, AdminSession
 from .models_v3 import generate_api_key
+from .catalog import catalog_version
+from .services import MovieService
 from auth.security import get_password_hash
 import os
 
@@ -42,6 +44,7 @@ def populate_initial_data():
             print(f"Loading movies from {csv_path}")
             df = pd.read_csv(csv_path)
             
+            movies = []
             for _, row in df.iterrows():
                 movie = Movie(
                     id=int(row['id']),
@@ -54,8 +57,11 @@ def populate_initial_data():
                     poster_url=str(row['poster_url'])
                 )
                 db.add(movie)
+                movies.append(movie)
             
+            MovieService.link_movies(db, movies)
             db.commit()
+            catalog_version.bump(db)
             print(f"Successfully loaded {len(df)} movies")
         
         # Create admin user
@@ -42,7 +42,9 @@ def get_database():
 
 def create_tables():
     """Create all database tables."""
-    Base.metadata.create_all(bind=engine)
+    # The models register on the declarative base in models_v3
+    from .models_v3 import Base as ModelsBase
+    ModelsBase.metadata.create_all(bind=engine)
 
 def drop_tables():
     """Drop all database tables."""
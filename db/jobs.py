@@ -0,0 +1,151 @@
+import asyncio
+import os
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+
+from .database import SessionLocal
+from .models_v3 import ScheduledJob
+from .partitions import usage_log_partitions
+from .services import ApiKeyService
+
+# Upper bound on how long the scheduler sleeps between checks (seconds)
+JOB_CHECK_INTERVAL = float(os.getenv("JOB_CHECK_INTERVAL", "3600"))
+
+def claim_period(db, name: str, period: str, now: datetime) -> Optional[str]:
+    """Claim a job's run for a period using its lock row.
+
+    Only one worker's conditional UPDATE can move ``last_period`` forward,
+    so only that worker runs the job. Returns the previously claimed period
+    ("" if the job never ran), or None if the period was already claimed.
+    The claim is part of the caller's transaction and is undone if the job
+    fails.
+    """
+    job = db.query(ScheduledJob).filter(ScheduledJob.name == name).first()
+    if job is None:
+        try:
+            db.add(ScheduledJob(name=name, last_period=""))
+            db.commit()
+        except IntegrityError:
+            # Another worker created the lock row first
+            db.rollback()
+        job = db.query(ScheduledJob).filter(ScheduledJob.name == name).first()
+    last_period = job.last_period or ""
+
+    claimed = db.execute(
+        update(ScheduledJob).where(
+            ScheduledJob.name == name,
+            ScheduledJob.last_period < period
+        ).values(last_period=period, last_run_at=now).execution_options(synchronize_session=False)
+    ).rowcount
+    return last_period if claimed == 1 else None
+
+class MonthlyJob:
+    """Job run once per month by exactly one worker.
+
+    Every worker runs the scheduler, but the ``scheduled_jobs`` lock row lets
+    only one of them claim each month. Subclasses implement ``run``.
+    """
+
+    name = ""
+
+    def __init__(self, check_interval: float = JOB_CHECK_INTERVAL):
+        self.check_interval = check_interval
+        self._task: Optional[asyncio.Task] = None
+
+    def run(self, db, now: datetime, last_period: str):
+        """Do the month's work inside the claiming transaction; return a summary."""
+        raise NotImplementedError
+
+    def run_once(self, now: Optional[datetime] = None):
+        """Run the job if this month has not been done yet; return its summary, or None if skipped."""
+        now = now or datetime.now()
+        db = SessionLocal()
+        try:
+            last_period = claim_period(db, self.name, now.strftime("%Y-%m"), now)
+            if last_period is None:
+                db.rollback()
+                return None
+            result = self.run(db, now, last_period)
+            db.commit()
+            return result
+        except Exception as e:
+            db.rollback()
+            print(f"Scheduled job {self.name} failed: {e}")
+            return None
+        finally:
+            db.close()
+
+    def seconds_until_next_run(self, now: Optional[datetime] = None) -> float:
+        """Seconds until the next month starts, capped at ``check_interval``."""
+        now = now or datetime.now()
+        if now.month == 12:
+            next_period = now.replace(year=now.year + 1, month=1, day=1, hour=0, minute=0, second=0, microsecond=0)
+        else:
+            next_period = now.replace(month=now.month + 1, day=1, hour=0, minute=0, second=0, microsecond=0)
+        return max(1.0, min(self.check_interval, (next_period - now).total_seconds()))
+
+    async def _run(self) -> None:
+        """Run the job now, then again at every period boundary."""
+        while True:
+            await asyncio.to_thread(self.run_once)
+            await asyncio.sleep(self.seconds_until_next_run())
+
+    async def start(self) -> None:
+        """Start the scheduler task."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the scheduler task."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+class MonthlyUsageResetJob(MonthlyJob):
+    """Zero API key usage once at the start of each month.
+
+    The reset only touches keys not yet reset this month, so a run is
+    always safe to repeat.
+    """
+
+    name = "monthly_usage_reset"
+
+    def run(self, db, now: datetime, last_period: str) -> int:
+        """Reset usage for the month; return the number of keys reset."""
+        reset_count = ApiKeyService.reset_monthly_usage(db, now)
+        print(f"Monthly usage reset: {reset_count} API keys reset")
+        return reset_count
+
+class UsageLogRetentionJob(MonthlyJob):
+    """Archive closed months of usage logs and drop the expired ones.
+
+    Without native PostgreSQL partitions each closed month is moved out of
+    ``usage_logs`` into its own table, so the live table only ever holds
+    the current month. Month tables older than ``USAGE_LOG_RETENTION_MONTHS``
+    are rolled up once more and then dropped whole; their counts live on
+    in ``usage_rollups``.
+    """
+
+    name = "usage_log_retention"
+
+    def run(self, db, now: datetime, last_period: str) -> dict:
+        """Archive finished months and drop expired ones; return what was done."""
+        usage_log_partitions.ensure_partitions(db, now)
+        archived = []
+        for month in usage_log_partitions.unclosed_months(db, now):
+            usage_log_partitions.archive_month(db, month)
+            archived.append(month.strftime("%Y-%m"))
+        dropped = usage_log_partitions.drop_expired(db, now)
+        print(f"Usage log retention: archived {archived or 'no months'}, dropped {dropped or 'no tables'}")
+        return {"archived": archived, "dropped": dropped}
+
+# Shared job instances started with the app
+monthly_usage_reset_job = MonthlyUsageResetJob()
+usage_log_retention_job = UsageLogRetentionJob()
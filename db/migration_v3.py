@@ -3,6 +3,8 @@ from sqlalchemy.orm import Session
 from .database import SessionLocal, create_tables, Base, engine
 from .models_v3 import Movie, ApiKey, User, EmailVerification, UsageLog, AdminSession
 from .models_v3 import generate_api_key, generate_verification_token
+from .catalog import catalog_version
+from .services import MovieService
 from auth.security import get_password_hash
 import os
 
@@ -43,6 +45,7 @@ def migrate_to_v3_schema():
             if os.path.exists(csv_path):
                 print(f"Loading movies from {csv_path}")
                 df = pd.read_csv(csv_path)
+                movies = []
                 
                 for _, row in df.iterrows():
                     # Check for duplicates by title + year
@@ -66,8 +69,11 @@ def migrate_to_v3_schema():
                         poster_url=str(row['poster_url'])
                     )
                     db.add(movie)
+                    movies.append(movie)
                 
+                MovieService.link_movies(db, movies)
                 db.commit()
+                catalog_version.bump(db)
                 print(f"Successfully loaded {len(df)} movies")
         
         # Create admin user if doesn't exist
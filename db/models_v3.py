@@ -89,12 +89,71 @@ class Movie(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     
+    # Normalized genres and cast, in their original order
+    genre_links = relationship("MovieGenre", order_by="MovieGenre.position", lazy="selectin")
+    cast_links = relationship("MovieCast", order_by="MovieCast.position", lazy="selectin")
+    
     # Create compound index for unique title+year constraint
     __table_args__ = (
         Index('idx_title_year_unique', 'title', 'year', unique=True),
         Index('idx_genre_search', 'genre'),
         Index('idx_title_search', 'title'),
     )
+    
+    @property
+    def genre_names(self):
+        """Genre names from the normalized tables."""
+        return [link.genre.name for link in self.genre_links]
+    
+    @property
+    def actor_names(self):
+        """Actor names from the normalized tables."""
+        return [link.person.name for link in self.cast_links if link.role == "actor"]
+
+class Genre(Base):
+    """Genre lookup table."""
+    __tablename__ = "genres"
+    
+    id = Column(Integer, primary_key=True)
+    name = Column(String(100), nullable=False)
+    name_key = Column(String(100), nullable=False, unique=True, index=True)
+
+class Person(Base):
+    """Actor or director lookup table."""
+    __tablename__ = "people"
+    
+    id = Column(Integer, primary_key=True)
+    name = Column(String(255), nullable=False)
+    name_key = Column(String(255), nullable=False, unique=True, index=True)
+
+class MovieGenre(Base):
+    """Link between a movie and one of its genres."""
+    __tablename__ = "movie_genres"
+    
+    movie_id = Column(Integer, ForeignKey("movies.id", ondelete="CASCADE"), primary_key=True)
+    genre_id = Column(Integer, ForeignKey("genres.id"), primary_key=True)
+    position = Column(Integer, nullable=False, default=0)
+    
+    genre = relationship("Genre", lazy="joined")
+    
+    __table_args__ = (
+        Index('idx_movie_genres_genre', 'genre_id', 'movie_id'),
+    )
+
+class MovieCast(Base):
+    """Link between a movie and a person, as actor or director."""
+    __tablename__ = "movie_cast"
+    
+    movie_id = Column(Integer, ForeignKey("movies.id", ondelete="CASCADE"), primary_key=True)
+    person_id = Column(Integer, ForeignKey("people.id"), primary_key=True)
+    role = Column(String(20), primary_key=True)  # actor or director
+    position = Column(Integer, nullable=False, default=0)
+    
+    person = relationship("Person", lazy="joined")
+    
+    __table_args__ = (
+        Index('idx_movie_cast_person', 'person_id', 'role', 'movie_id'),
+    )
 
 class UsageLog(Base):
     """Usage logging database model."""
@@ -118,6 +177,19 @@ class UsageLog(Base):
         Index('idx_endpoint_timestamp', 'endpoint', 'timestamp'),
     )
 
+class UsageRollup(Base):
+    """Hourly request counts per API key and endpoint."""
+    __tablename__ = "usage_rollups"
+    
+    api_key_id = Column(Integer, ForeignKey("api_keys.id"), primary_key=True)
+    endpoint = Column(String(255), primary_key=True)
+    bucket_start = Column(DateTime(timezone=True), primary_key=True)
+    request_count = Column(Integer, nullable=False, default=0)
+    
+    __table_args__ = (
+        Index('idx_rollup_bucket', 'bucket_start'),
+    )
+
 class AdminSession(Base):
     """Admin session management."""
     __tablename__ = "admin_sessions"
@@ -133,6 +205,23 @@ class AdminSession(Base):
     # Relationship
     user = relationship("User", back_populates="admin_sessions")
 
+class ScheduledJob(Base):
+    """Lock row for periodic maintenance jobs shared by all workers."""
+    __tablename__ = "scheduled_jobs"
+    
+    name = Column(String(100), primary_key=True)
+    last_period = Column(String(20), nullable=False, default="")
+    last_run_at = Column(DateTime(timezone=True))
+
+class CatalogState(Base):
+    """Single row recording the movie catalog version and size."""
+    __tablename__ = "catalog_state"
+    
+    id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False, default=1)
+    movie_count = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True))
+
 def generate_api_key():
     """Generate a new UUID v4 API key."""
     return str(uuid.uuid4())
@@ -0,0 +1,231 @@
+import os
+import re
+import sys
+from datetime import datetime
+from typing import List, Optional
+
+from sqlalchemy import delete, func, select, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.sql import column, table
+
+from .database import SessionLocal, engine
+from .models_v3 import UsageLog, UsageRollup
+
+# Months of raw usage logs kept, counting the current one; older months only survive as rollups
+USAGE_LOG_RETENTION_MONTHS = int(os.getenv("USAGE_LOG_RETENTION_MONTHS", "3"))
+
+PARTITION_PATTERN = re.compile(r"^usage_logs_(\d{4})_(\d{2})$")
+
+def month_start(moment: datetime) -> datetime:
+    """First instant of the month containing ``moment``."""
+    return moment.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+def add_months(month: datetime, count: int) -> datetime:
+    """Start of the month ``count`` months after ``month``."""
+    index = month.year * 12 + month.month - 1 + count
+    return month.replace(year=index // 12, month=index % 12 + 1, day=1)
+
+def partition_name(month: datetime) -> str:
+    """Table holding a month of usage logs."""
+    return f"usage_logs_{month:%Y_%m}"
+
+def partition_month(name: str) -> Optional[datetime]:
+    """Month held by a partition table, or None for other tables."""
+    match = PARTITION_PATTERN.match(name)
+    if not match:
+        return None
+    return datetime(int(match.group(1)), int(match.group(2)), 1)
+
+def hour_bucket(dialect: str, timestamp):
+    """SQL expression truncating a timestamp to the hour."""
+    if dialect == "postgresql":
+        return func.date_trunc("hour", timestamp)
+    # Same text format SQLAlchemy uses for DateTime values on SQLite
+    return func.strftime("%Y-%m-%d %H:00:00.000000", timestamp)
+
+class UsageLogPartitions:
+    """Month-by-month storage for ``usage_logs``.
+
+    On PostgreSQL, after ``partition_usage_logs`` has run, ``usage_logs`` is
+    natively range-partitioned by month, so queries on recent rows only
+    touch recent partitions. Elsewhere ``usage_logs`` only holds the current
+    month, and closed months are moved to ``usage_logs_YYYY_MM`` tables.
+    Stats come from ``usage_rollups``, which the usage log pipeline keeps up
+    to date. Before an expired month is dropped, as a whole table and never
+    by a large DELETE, its rows are folded into the rollups once more, so
+    months logged before the rollups existed keep their counts.
+    """
+
+    def __init__(self, bind=engine):
+        self.dialect = bind.dialect.name
+
+    def is_native(self, db) -> bool:
+        """Whether ``usage_logs`` is a partitioned PostgreSQL table."""
+        if self.dialect != "postgresql":
+            return False
+        return db.execute(text(
+            "SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid "
+            "WHERE c.relname = 'usage_logs'"
+        )).first() is not None
+
+    def months(self, db) -> List[datetime]:
+        """Months with their own partition or archive table, oldest first."""
+        if self.dialect == "postgresql":
+            names = db.execute(text("SELECT tablename FROM pg_tables WHERE tablename LIKE 'usage_logs_%'"))
+        else:
+            names = db.execute(text("SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE 'usage_logs_%'"))
+        return sorted(month for month in map(partition_month, names.scalars()) if month)
+
+    def ensure_partitions(self, db, now: datetime) -> None:
+        """Create native partitions for this month and the next (PostgreSQL only)."""
+        if not self.is_native(db):
+            return
+        for month in (month_start(now), add_months(month_start(now), 1)):
+            db.execute(text(
+                f"CREATE TABLE IF NOT EXISTS {partition_name(month)} PARTITION OF usage_logs "
+                f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{add_months(month, 1):%Y-%m-%d}')"
+            ))
+
+    def unclosed_months(self, db, now: datetime) -> List[datetime]:
+        """Months before the current one that still have rows in the live ``usage_logs`` table."""
+        if self.is_native(db):
+            return []
+        current = month_start(now)
+        # Also picks up late rows written after their month was archived
+        oldest = db.execute(select(func.min(UsageLog.timestamp)).where(UsageLog.timestamp < current)).scalar()
+        if oldest is None:
+            return []
+
+        months = []
+        month = month_start(oldest)
+        while month < current:
+            months.append(month)
+            month = add_months(month, 1)
+        return months
+
+    def archive_month(self, db, month: datetime) -> int:
+        """Roll up a closed month and move it out of ``usage_logs`` into its own table; return rows moved.
+
+        The caller commits.
+        """
+        in_month = (UsageLog.timestamp >= month, UsageLog.timestamp < add_months(month, 1))
+        self.rebuild_rollups(db, month, add_months(month, 1))
+        name = partition_name(month)
+        db.execute(text(f"CREATE TABLE IF NOT EXISTS {name} AS SELECT * FROM usage_logs WHERE 1 = 0"))
+        columns = [c.name for c in UsageLog.__table__.columns]
+        archive = table(name, *(column(c) for c in columns))
+        db.execute(archive.insert().from_select(columns, select(UsageLog.__table__).where(*in_month)))
+        return db.execute(delete(UsageLog).where(*in_month).execution_options(synchronize_session=False)).rowcount
+
+    def rebuild_rollups(self, db, start: datetime, end: datetime, source: str = "usage_logs") -> int:
+        """Bring ``usage_rollups`` for ``[start, end)`` up to the raw rows in ``source``.
+
+        ``source`` is ``usage_logs`` or a month table. One upsert keeps the
+        larger of the stored and the recounted value per bucket, so buckets
+        the pipeline never saw are filled in while increments it commits
+        concurrently are never overwritten. Returns the number of buckets
+        written. The caller commits.
+        """
+        logs = table(source, *(column(c.name, c.type) for c in UsageLog.__table__.columns))
+        bucket = hour_bucket(self.dialect, logs.c.timestamp)
+        rows = select(logs.c.api_key_id, logs.c.endpoint, bucket, func.count()).where(
+            logs.c.timestamp >= start, logs.c.timestamp < end
+        ).group_by(logs.c.api_key_id, logs.c.endpoint, bucket)
+
+        insert = pg_insert if self.dialect == "postgresql" else sqlite_insert
+        greatest = func.greatest if self.dialect == "postgresql" else func.max
+        statement = insert(UsageRollup).from_select(["api_key_id", "endpoint", "bucket_start", "request_count"], rows)
+        statement = statement.on_conflict_do_update(
+            index_elements=["api_key_id", "endpoint", "bucket_start"],
+            set_={"request_count": greatest(UsageRollup.request_count, statement.excluded.request_count)}
+        )
+        return db.execute(statement).rowcount
+
+    def drop_expired(self, db, now: datetime, retention_months: int = USAGE_LOG_RETENTION_MONTHS) -> List[str]:
+        """Drop month tables older than the retention window; return their names."""
+        cutoff = add_months(month_start(now), -(max(1, retention_months) - 1))
+        dropped = []
+        for month in self.months(db):
+            if month < cutoff:
+                # Months from before the rollups existed are only counted here
+                self.rebuild_rollups(db, month, add_months(month, 1), partition_name(month))
+                db.execute(text(f"DROP TABLE IF EXISTS {partition_name(month)}"))
+                dropped.append(partition_name(month))
+        if self.is_native(db):
+            self.rebuild_rollups(db, datetime.min, cutoff, "usage_logs_default")
+            db.execute(text("DELETE FROM usage_logs_default WHERE timestamp < :cutoff"), {"cutoff": cutoff})
+        return dropped
+
+def partition_usage_logs(bind=engine, now: Optional[datetime] = None) -> None:
+    """Convert a plain PostgreSQL ``usage_logs`` table into monthly partitions.
+
+    Rows are copied into the new table in one transaction. Run once with the
+    app stopped.
+    """
+    now = now or datetime.now()
+    partitions = UsageLogPartitions(bind)
+    if partitions.dialect != "postgresql":
+        print("Native partitioning needs PostgreSQL; SQLite uses monthly archive tables instead")
+        return
+
+    with bind.begin() as conn:
+        if partitions.is_native(conn):
+            print("usage_logs is already partitioned")
+            return
+
+        oldest = conn.execute(select(func.min(UsageLog.timestamp))).scalar()
+        conn.execute(text("ALTER TABLE usage_logs RENAME TO usage_logs_legacy"))
+        conn.execute(text(
+            "CREATE TABLE usage_logs (LIKE usage_logs_legacy INCLUDING DEFAULTS) PARTITION BY RANGE (timestamp)"
+        ))
+        conn.execute(text("ALTER TABLE usage_logs ADD PRIMARY KEY (id, timestamp)"))
+        conn.execute(text("ALTER TABLE usage_logs ADD FOREIGN KEY (api_key_id) REFERENCES api_keys (id)"))
+        conn.execute(text("ALTER SEQUENCE usage_logs_id_seq OWNED BY usage_logs.id"))
+        conn.execute(text("CREATE TABLE usage_logs_default PARTITION OF usage_logs DEFAULT"))
+
+        month = month_start(oldest or now)
+        while month <= add_months(month_start(now), 1):
+            conn.execute(text(
+                f"CREATE TABLE {partition_name(month)} PARTITION OF usage_logs "
+                f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{add_months(month, 1):%Y-%m-%d}')"
+            ))
+            month = add_months(month, 1)
+
+        # The partition key cannot be NULL, so old rows without a timestamp get the copy time
+        columns = [c.name for c in UsageLog.__table__.columns]
+        values = ["COALESCE(timestamp, now())" if c == "timestamp" else c for c in columns]
+        conn.execute(text(
+            f"INSERT INTO usage_logs ({', '.join(columns)}) SELECT {', '.join(values)} FROM usage_logs_legacy"
+        ))
+        conn.execute(text("DROP TABLE usage_logs_legacy"))
+        for index in UsageLog.__table__.indexes:
+            index.create(conn)
+    print("usage_logs converted to monthly partitions")
+
+# Shared partition manager used by the retention job
+usage_log_partitions = UsageLogPartitions()
+
+def backfill_rollups(now: Optional[datetime] = None) -> None:
+    """Fill in rollups from every raw usage log still kept, live or archived."""
+    now = now or datetime.now()
+    end = add_months(month_start(now), 1)
+    db = SessionLocal()
+    try:
+        # Native partitions are read through usage_logs; archive tables are read one by one
+        buckets = usage_log_partitions.rebuild_rollups(db, datetime.min, end)
+        if not usage_log_partitions.is_native(db):
+            for month in usage_log_partitions.months(db):
+                buckets += usage_log_partitions.rebuild_rollups(
+                    db, month, add_months(month, 1), partition_name(month)
+                )
+        db.commit()
+        print(f"Rebuilt {buckets} usage rollup buckets")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ["backfill"]:
+        backfill_rollups()
+    else:
+        partition_usage_logs()
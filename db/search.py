@@ -0,0 +1,323 @@
+import os
+import re
+import threading
+import unicodedata
+from typing import List, Optional, Tuple
+
+from sqlalchemy import case, false, func, literal, literal_column, select, text
+from sqlalchemy.exc import NotSupportedError, OperationalError, ProgrammingError
+from sqlalchemy.orm import Query, Session
+from sqlalchemy.sql import column, table
+
+from trigram_index import TrigramIndex
+from .catalog import catalog_version
+from .database import engine
+from .models_v3 import Genre, Movie, MovieCast, MovieGenre, Person
+
+# Most search results a client can page through; totals above it are reported as capped
+SEARCH_RESULT_WINDOW = int(os.getenv("SEARCH_RESULT_WINDOW", "1000"))
+
+# What a database without the needed extension, feature or permission raises during setup
+SETUP_ERRORS = (OperationalError, ProgrammingError, NotSupportedError)
+
+# Default similarity a fuzzy title match needs, as pg_trgm's strict_word_similarity_threshold
+FUZZY_SIMILARITY = float(os.getenv("FUZZY_SIMILARITY", "0.5"))
+
+# Fuzzy title candidates checked against the other search filters per query
+FUZZY_CANDIDATE_CHUNK = 500
+
+# Columns covered by the SQLite index and their bm25 weights (higher counts more)
+FTS_COLUMNS = ["title", "plot", "director", "actors", "genre"]
+FTS_WEIGHTS = [10.0, 1.0, 3.0, 3.0, 2.0]
+
+SQLITE_TRIGGERS = {
+    "movies_fts_ai": (
+        "AFTER INSERT ON movies BEGIN "
+        "INSERT INTO movies_fts(rowid, title, plot, director, actors, genre) "
+        "VALUES (new.id, new.title, new.plot, new.director, new.actors, new.genre); END"
+    ),
+    "movies_fts_ad": (
+        "AFTER DELETE ON movies BEGIN "
+        "INSERT INTO movies_fts(movies_fts, rowid, title, plot, director, actors, genre) "
+        "VALUES ('delete', old.id, old.title, old.plot, old.director, old.actors, old.genre); END"
+    ),
+    "movies_fts_au": (
+        "AFTER UPDATE ON movies BEGIN "
+        "INSERT INTO movies_fts(movies_fts, rowid, title, plot, director, actors, genre) "
+        "VALUES ('delete', old.id, old.title, old.plot, old.director, old.actors, old.genre); "
+        "INSERT INTO movies_fts(rowid, title, plot, director, actors, genre) "
+        "VALUES (new.id, new.title, new.plot, new.director, new.actors, new.genre); END"
+    ),
+}
+
+# Title, people, plot and genre weighted A to D; the title filter targets A
+POSTGRES_SEARCH_VECTOR = (
+    "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(director, '') || ' ' || replace(coalesce(actors, ''), '|', ' ')), 'B') || "
+    "setweight(to_tsvector('english', coalesce(plot, '')), 'C') || "
+    "setweight(to_tsvector('simple', replace(coalesce(genre, ''), '|', ' ')), 'D')"
+)
+
+def search_terms(value: str) -> List[str]:
+    """Lowercase words without diacritics, tokenized like the FTS5 index does."""
+    folded = "".join(c for c in unicodedata.normalize("NFKD", value.lower()) if not unicodedata.combining(c))
+    return re.findall(r"\w+", folded)
+
+def capped_count(query: Query, cap: int = SEARCH_RESULT_WINDOW) -> Tuple[int, bool]:
+    """Count matches, stopping after ``cap``; return ``(count, exact)``.
+
+    Above the cap the count is ``cap`` and ``exact`` is False, so broad
+    searches never count the whole catalog.
+    """
+    matches = query.with_entities(Movie.id).order_by(None).limit(cap + 1).subquery()
+    count = query.session.query(func.count()).select_from(matches).scalar() or 0
+    return (count, True) if count <= cap else (cap, False)
+
+def genre_criterion(name: str):
+    """Movies tagged with a genre (exact, case-insensitive), found through the genre tables."""
+    return Movie.id.in_(
+        select(MovieGenre.movie_id).join(Genre, Genre.id == MovieGenre.genre_id).where(
+            Genre.name_key == name.strip().lower()
+        )
+    )
+
+def person_criterion(name: str, role: str):
+    """Movies with a person in a role (exact, case-insensitive), found through the cast tables."""
+    return Movie.id.in_(
+        select(MovieCast.movie_id).join(Person, Person.id == MovieCast.person_id).where(
+            Person.name_key == name.strip().lower(),
+            MovieCast.role == role
+        )
+    )
+
+class MovieSearchIndex:
+    """Full-text index over the movies table.
+
+    SQLite uses an FTS5 table kept in sync by triggers and ranked with
+    bm25; PostgreSQL uses a generated ``tsvector`` column with a GIN index
+    ranked with ``ts_rank``. The title filter matches word prefixes through
+    the index; genre, actor and director filters are exact lookups in the
+    normalized genre and cast tables. If the index cannot be created
+    (SQLite without FTS5, for instance) text searches fall back to ILIKE
+    scans.
+
+    Fuzzy title searches rank titles by trigram similarity: through a
+    ``pg_trgm`` GIN index on PostgreSQL, otherwise through an in-process
+    ``TrigramIndex`` over the titles, refreshed when the catalog changes.
+    """
+
+    def __init__(self, bind=engine):
+        self.bind = bind
+        self.dialect = bind.dialect.name
+        self.available = False
+        self.trigrams_available = False
+        self._titles: Optional[TrigramIndex] = None
+        self._titles_version: Optional[int] = None
+        self._titles_lock = threading.Lock()
+
+    def setup(self) -> None:
+        """Create the index if missing and fill it when its triggers were not in place."""
+        if self.dialect == "postgresql":
+            self.setup_trigrams()
+        try:
+            with self.bind.begin() as conn:
+                if self.dialect == "postgresql":
+                    conn.execute(text(
+                        f"ALTER TABLE movies ADD COLUMN IF NOT EXISTS search_vector tsvector "
+                        f"GENERATED ALWAYS AS ({POSTGRES_SEARCH_VECTOR}) STORED"
+                    ))
+                    conn.execute(text("CREATE INDEX IF NOT EXISTS idx_movies_search ON movies USING GIN (search_vector)"))
+                elif self.dialect == "sqlite":
+                    conn.execute(text(
+                        f"CREATE VIRTUAL TABLE IF NOT EXISTS movies_fts USING fts5("
+                        f"{', '.join(FTS_COLUMNS)}, content='movies', content_rowid='id', "
+                        f"tokenize='unicode61 remove_diacritics 2')"
+                    ))
+                    existing = set(conn.execute(text(
+                        "SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'movies'"
+                    )).scalars())
+                    for name, body in SQLITE_TRIGGERS.items():
+                        conn.execute(text(f"CREATE TRIGGER IF NOT EXISTS {name} {body}"))
+                    # Rows written while the triggers were missing are not indexed yet
+                    if not set(SQLITE_TRIGGERS) <= existing:
+                        self.rebuild(conn)
+                else:
+                    return
+            self.available = True
+        except SETUP_ERRORS as e:
+            print(f"Full-text search unavailable, falling back to ILIKE: {e}")
+            self.available = False
+
+    def setup_trigrams(self) -> None:
+        """Enable pg_trgm and index titles with it (PostgreSQL only)."""
+        try:
+            with self.bind.begin() as conn:
+                conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+                conn.execute(text("CREATE INDEX IF NOT EXISTS idx_movies_title_trgm ON movies USING GIN (title gin_trgm_ops)"))
+            self.trigrams_available = True
+        except SETUP_ERRORS as e:
+            print(f"pg_trgm unavailable, fuzzy title search uses the in-process index: {e}")
+            self.trigrams_available = False
+
+    def title_trigrams(self, db: Session) -> TrigramIndex:
+        """In-process trigram index over titles, brought up to date with the catalog version."""
+        version = catalog_version.version
+        with self._titles_lock:
+            if self._titles is None or self._titles_version != version:
+                titles = {
+                    movie_id: tuple(search_terms(title or ""))
+                    for movie_id, title in db.query(Movie.id, Movie.title)
+                }
+                if self._titles is None:
+                    self._titles = TrigramIndex.build(titles.items())
+                else:
+                    # Only titles that changed since the last version are re-indexed
+                    changed = [(movie_id, words) for movie_id, words in titles.items() if self._titles.words.get(movie_id) != words]
+                    removed = [movie_id for movie_id in self._titles.words if movie_id not in titles]
+                    self._titles = self._titles.updated(changed, removed)
+                self._titles_version = version
+            return self._titles
+
+    def rebuild(self, conn) -> None:
+        """Re-index every movie (SQLite only; PostgreSQL keeps its column current)."""
+        if self.dialect == "sqlite":
+            conn.execute(text("INSERT INTO movies_fts(movies_fts) VALUES ('rebuild')"))
+
+    def search_query(
+        self,
+        db: Session,
+        q: Optional[str] = None,
+        title: Optional[str] = None,
+        year: Optional[int] = None,
+        genre: Optional[str] = None,
+        actor: Optional[str] = None,
+        director: Optional[str] = None,
+        fuzzy: bool = False,
+        similarity: float = FUZZY_SIMILARITY
+    ) -> Query:
+        """Movies matching the given criteria, best matches first.
+
+        With ``fuzzy``, ``title`` matches titles at least ``similarity``
+        similar by trigrams, most similar first, instead of word prefixes.
+        """
+        fuzzy_title = title if fuzzy else None
+        if fuzzy_title:
+            title = None
+        query = db.query(Movie)
+        if year:
+            query = query.filter(Movie.year == year)
+        if genre:
+            query = query.filter(genre_criterion(genre))
+        if actor:
+            query = query.filter(person_criterion(actor, "actor"))
+        if director:
+            query = query.filter(person_criterion(director, "director"))
+
+        if not (q or title or fuzzy_title):
+            return query.order_by(Movie.id)
+        if q or title:
+            if not self.available:
+                query = self._scan_query(query, q, title)
+            elif self.dialect == "postgresql":
+                query = self._postgres_query(query, q, title)
+            else:
+                query = self._sqlite_query(query, q, title)
+        if fuzzy_title:
+            filtered = bool(q or year or genre or actor or director)
+            query = self._fuzzy_query(query, fuzzy_title, similarity, filtered)
+        return query
+
+    def _sqlite_query(self, query: Query, q: Optional[str], title: Optional[str]) -> Query:
+        """FTS5 MATCH joined back to movies, ordered by bm25."""
+        clauses = []
+        for column_name, value in (("", q), ("title", title)):
+            if not value:
+                continue
+            terms = search_terms(value)
+            if not terms:
+                # Nothing indexable in the input, so nothing can match
+                return query.filter(false())
+            expression = " AND ".join(f'"{term}"*' for term in terms)
+            clauses.append(f"{column_name} : ({expression})" if column_name else f"({expression})")
+
+        fts = table("movies_fts", column("rowid"))
+        weights = ", ".join(str(weight) for weight in FTS_WEIGHTS)
+        return query.join(fts, fts.c.rowid == Movie.id).filter(
+            text("movies_fts MATCH :match").bindparams(match=" AND ".join(clauses))
+        ).order_by(text(f"bm25(movies_fts, {weights})"), Movie.id)
+
+    def _postgres_query(self, query: Query, q: Optional[str], title: Optional[str]) -> Query:
+        """``@@`` against the GIN-indexed vector, ordered by ts_rank."""
+        vector = literal_column("movies.search_vector")
+        ranked = None
+        for value, weight in ((q, ""), (title, "A")):
+            if not value:
+                continue
+            terms = search_terms(value)
+            if not terms:
+                return query.filter(false())
+            if weight:
+                tsquery = func.to_tsquery("english", " & ".join(f"{term}:*{weight}" for term in terms))
+            else:
+                tsquery = func.websearch_to_tsquery("english", value)
+            query = query.filter(vector.op("@@")(tsquery))
+            ranked = tsquery if ranked is None else ranked
+        return query.order_by(func.ts_rank(vector, ranked).desc(), Movie.id)
+
+    def _scan_query(self, query: Query, q: Optional[str], title: Optional[str]) -> Query:
+        """Substring matching without an index."""
+        if q:
+            for term in search_terms(q) or [q]:
+                pattern = f"%{term}%"
+                query = query.filter(
+                    Movie.title.ilike(pattern) | Movie.plot.ilike(pattern)
+                    | Movie.director.ilike(pattern) | Movie.actors.ilike(pattern)
+                )
+        if title:
+            query = query.filter(Movie.title.ilike(f"%{title}%"))
+        return query.order_by(Movie.id)
+
+    def _fuzzy_query(self, query: Query, title: str, similarity: float, filtered: bool) -> Query:
+        """Titles at least ``similarity`` similar to ``title``, most similar first."""
+        query = query.order_by(None)
+        if self.dialect == "postgresql" and self.trigrams_available:
+            # The <<% operator uses the GIN index with the transaction's threshold
+            query.session.execute(
+                text("SELECT set_config('pg_trgm.strict_word_similarity_threshold', :threshold, true)"),
+                {"threshold": str(similarity)}
+            )
+            return query.filter(literal(title).op("<<%")(Movie.title)).order_by(
+                func.strict_word_similarity(title, Movie.title).desc(), Movie.id
+            )
+
+        terms = search_terms(title)
+        ranked = self.title_trigrams(query.session).search(terms, similarity) if terms else []
+        ids = [movie_id for movie_id, _ in ranked]
+        if filtered:
+            ids = self._filter_candidates(query, ids)
+        # Only the result window can be paged through; one more keeps capped_count's overflow check
+        ids = ids[:SEARCH_RESULT_WINDOW + 1]
+        if not ids:
+            return query.filter(false())
+        order = case({movie_id: position for position, movie_id in enumerate(ids)}, value=Movie.id)
+        return query.filter(Movie.id.in_(ids)).order_by(order, Movie.id)
+
+    @staticmethod
+    def _filter_candidates(query: Query, ids: List[int]) -> List[int]:
+        """The ``ids`` the other filters of ``query`` keep, in order, up to one past the result window.
+
+        Candidates go to the database a chunk at a time, best first, so a
+        broad filter never loads every movie it matches.
+        """
+        query = query.with_entities(Movie.id).order_by(None)
+        kept: List[int] = []
+        for start in range(0, len(ids), FUZZY_CANDIDATE_CHUNK):
+            chunk = ids[start:start + FUZZY_CANDIDATE_CHUNK]
+            allowed = {row[0] for row in query.filter(Movie.id.in_(chunk))}
+            kept.extend(movie_id for movie_id in chunk if movie_id in allowed)
+            if len(kept) > SEARCH_RESULT_WINDOW:
+                break
+        return kept
+
+# Shared search index used by /search
+movie_search_index = MovieSearchIndex()
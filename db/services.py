@@ -1,8 +1,31 @@
 
+from sqlalchemy import case, delete, exists, func, insert, or_, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import Connection
 from sqlalchemy.orm import Session
-from db.models_v3 import ApiKey, User, generate_api_key
+from db.models_v3 import ApiKey, Genre, Movie, MovieCast, MovieGenre, Person, UsageRollup, User, generate_api_key
+from middleware.key_cache import api_key_cache
+from middleware.key_filter import api_key_filter
 from datetime import datetime
-from typing import List, Optional
+from typing import Dict, List, Optional
+
+# Largest number of values bound into one IN list
+IN_CHUNK_SIZE = 500
+
+def split_names(value: Optional[str]) -> List[str]:
+    """Names from a pipe-delimited field, in order, without blanks or repeats."""
+    names, seen = [], set()
+    for name in (value or "").split("|"):
+        name = name.strip()
+        if name and name.lower() not in seen:
+            seen.add(name.lower())
+            names.append(name)
+    return names
+
+def chunked(values: list, size: int = IN_CHUNK_SIZE):
+    """Split a list into slices of at most ``size`` items."""
+    return (values[start:start + size] for start in range(0, len(values), size))
 
 class ApiKeyService:
     """Service class for API key operations."""
@@ -45,6 +68,7 @@ class ApiKeyService:
         db.add(api_key)
         db.commit()
         db.refresh(api_key)
+        api_key_filter.add(api_key.key)
         
         return api_key
     
@@ -58,6 +82,7 @@ class ApiKeyService:
         db_api_key.usage_count = 0
         db_api_key.last_reset = datetime.now()
         db.commit()
+        api_key_cache.invalidate(db_api_key.key)
         return True
     
     @staticmethod
@@ -69,6 +94,7 @@ class ApiKeyService:
         
         db_api_key.is_active = False
         db.commit()
+        api_key_cache.invalidate(db_api_key.key)
         return True
     
     @staticmethod
@@ -80,4 +106,221 @@ class ApiKeyService:
         
         db_api_key.is_active = True
         db.commit()
+        api_key_cache.invalidate(db_api_key.key)
         return True
+    
+    @staticmethod
+    def consume_quota(
+        db: Session,
+        api_key_id: int,
+        amount: int = 1,
+        now: Optional[datetime] = None,
+        enforce_limit: bool = True
+    ) -> Optional[int]:
+        """Add usage to an API key in a single conditional UPDATE.
+        
+        With ``enforce_limit`` the update only applies to an active key that
+        stays within its monthly limit. Returns the new usage count, or None
+        if nothing was updated. Monthly resets are done by
+        ``reset_monthly_usage``. The caller commits.
+        """
+        current_usage = func.coalesce(ApiKey.usage_count, 0)
+        statement = update(ApiKey).where(ApiKey.id == api_key_id).values(
+            usage_count=current_usage + amount,
+            last_used=now or datetime.now(),
+            # Usage is not a change cached key records need to see
+            updated_at=ApiKey.updated_at
+        ).returning(ApiKey.usage_count)
+        if enforce_limit:
+            statement = statement.where(
+                ApiKey.is_active == True,
+                current_usage + amount <= ApiKey.monthly_limit
+            )
+        
+        return db.execute(statement.execution_options(synchronize_session=False)).scalar()
+    
+    @staticmethod
+    def reset_monthly_usage(db: Session, now: Optional[datetime] = None) -> int:
+        """Zero usage for every key not yet reset this month in one bulk UPDATE.
+        
+        Running it again in the same month changes nothing. Returns the
+        number of keys reset. The caller commits.
+        """
+        now = now or datetime.now()
+        period_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        statement = update(ApiKey).where(
+            or_(ApiKey.last_reset.is_(None), ApiKey.last_reset < period_start)
+        ).values(usage_count=0, last_reset=now, updated_at=ApiKey.updated_at)
+        return db.execute(statement.execution_options(synchronize_session=False)).rowcount
+    
+    @staticmethod
+    def release_quota(db: Session, api_key_id: int, amount: int, granted_at: datetime) -> None:
+        """Give back unused usage taken by ``consume_quota``.
+        
+        Skipped if the key has been reset since ``granted_at``, so quota from
+        an old period is never subtracted from a new one. The caller commits.
+        """
+        statement = update(ApiKey).where(
+            ApiKey.id == api_key_id,
+            ApiKey.last_reset <= granted_at
+        ).values(
+            usage_count=case(
+                (ApiKey.usage_count > amount, ApiKey.usage_count - amount),
+                else_=0
+            ),
+            updated_at=ApiKey.updated_at
+        )
+        db.execute(statement.execution_options(synchronize_session=False))
+
+class UsageService:
+    """Service class for usage analytics.
+    
+    Reads come from ``usage_rollups``, which the usage log pipeline keeps
+    up to date, so a query costs one row per key, endpoint and hour rather
+    than one per request.
+    """
+    
+    @staticmethod
+    def add_rollups(conn: Connection, events: List[dict]) -> int:
+        """Add a batch of usage log events to the hourly rollups in one upsert.
+        
+        Returns the number of buckets touched. The caller commits.
+        """
+        counts: Dict[tuple, int] = {}
+        for event in events:
+            bucket = (event.get("timestamp") or datetime.now()).replace(minute=0, second=0, microsecond=0)
+            key = (event["api_key_id"], event["endpoint"], bucket)
+            counts[key] = counts.get(key, 0) + 1
+        if not counts:
+            return 0
+        
+        # Sorted so concurrent workers lock rows in the same order
+        rows = [
+            {"api_key_id": key_id, "endpoint": endpoint, "bucket_start": bucket, "request_count": count}
+            for (key_id, endpoint, bucket), count in sorted(counts.items())
+        ]
+        insert = pg_insert if conn.dialect.name == "postgresql" else sqlite_insert
+        statement = insert(UsageRollup).values(rows)
+        statement = statement.on_conflict_do_update(
+            index_elements=["api_key_id", "endpoint", "bucket_start"],
+            set_={"request_count": UsageRollup.request_count + statement.excluded.request_count}
+        )
+        conn.execute(statement)
+        return len(rows)
+    
+    @staticmethod
+    def _rollups(db: Session, columns, api_key_id: Optional[int], since: Optional[datetime]):
+        """Rollup query filtered by key and by the hour containing ``since``."""
+        query = db.query(*columns)
+        if api_key_id is not None:
+            query = query.filter(UsageRollup.api_key_id == api_key_id)
+        if since:
+            query = query.filter(UsageRollup.bucket_start >= since.replace(minute=0, second=0, microsecond=0))
+        return query
+    
+    @staticmethod
+    def endpoint_counts(
+        db: Session,
+        api_key_id: Optional[int] = None,
+        since: Optional[datetime] = None,
+        limit: Optional[int] = None
+    ) -> Dict[str, int]:
+        """Requests per endpoint, optionally for one key and since a time, busiest first."""
+        total = func.sum(UsageRollup.request_count)
+        query = UsageService._rollups(db, (UsageRollup.endpoint, total), api_key_id, since)
+        query = query.group_by(UsageRollup.endpoint).order_by(total.desc())
+        if limit:
+            query = query.limit(limit)
+        return {endpoint: int(count) for endpoint, count in query.all()}
+    
+    @staticmethod
+    def request_count(db: Session, api_key_id: Optional[int] = None, since: Optional[datetime] = None) -> int:
+        """Total requests, optionally for one key and since a time."""
+        total = func.sum(UsageRollup.request_count)
+        return int(UsageService._rollups(db, (total,), api_key_id, since).scalar() or 0)
+    
+    @staticmethod
+    def total_requests(db: Session, api_key_id: int) -> int:
+        """All requests ever logged for an API key."""
+        return UsageService.request_count(db, api_key_id)
+
+class MovieService:
+    """Service class for movie catalog operations."""
+    
+    @staticmethod
+    def _lookup_ids(db: Session, model, names: Dict[str, str]) -> Dict[str, int]:
+        """Ids of Genre or Person rows by lowercase name, creating missing ones."""
+        keys = list(names)
+        ids: Dict[str, int] = {}
+        for chunk in chunked(keys):
+            ids.update(db.query(model.name_key, model.id).filter(model.name_key.in_(chunk)).all())
+        
+        missing = [key for key in keys if key not in ids]
+        if missing:
+            db.execute(insert(model), [{"name": names[key], "name_key": key} for key in missing])
+            for chunk in chunked(missing):
+                ids.update(db.query(model.name_key, model.id).filter(model.name_key.in_(chunk)).all())
+        return ids
+    
+    @staticmethod
+    def link_movies(db: Session, movies: List[Movie]) -> None:
+        """Store the genres, actors and directors of movies in the normalized tables.
+        
+        Replaces any existing links of these movies. Flushes so new movies
+        get ids; the caller commits.
+        """
+        if not movies:
+            return
+        db.flush()
+        
+        genres = {name.lower(): name for movie in movies for name in split_names(movie.genre)}
+        people = {
+            name.lower(): name
+            for movie in movies
+            for name in split_names(movie.actors) + split_names(movie.director)
+        }
+        genre_ids = MovieService._lookup_ids(db, Genre, genres)
+        person_ids = MovieService._lookup_ids(db, Person, people)
+        
+        for chunk in chunked([movie.id for movie in movies]):
+            db.execute(delete(MovieGenre).where(MovieGenre.movie_id.in_(chunk)))
+            db.execute(delete(MovieCast).where(MovieCast.movie_id.in_(chunk)))
+        
+        genre_rows, cast_rows = [], []
+        for movie in movies:
+            for position, name in enumerate(split_names(movie.genre)):
+                genre_rows.append({"movie_id": movie.id, "genre_id": genre_ids[name.lower()], "position": position})
+            for role, field in (("director", movie.director), ("actor", movie.actors)):
+                for position, name in enumerate(split_names(field)):
+                    cast_rows.append({
+                        "movie_id": movie.id,
+                        "person_id": person_ids[name.lower()],
+                        "role": role,
+                        "position": position
+                    })
+        if genre_rows:
+            db.execute(insert(MovieGenre), genre_rows)
+        if cast_rows:
+            db.execute(insert(MovieCast), cast_rows)
+        
+        # Loaded link collections no longer match the rows
+        for movie in movies:
+            db.expire(movie, ["genre_links", "cast_links"])
+    
+    @staticmethod
+    def link_unlinked_movies(db: Session, batch_size: int = 1000) -> int:
+        """Link movies that have no normalized rows yet; commits per batch and returns how many were linked."""
+        linked = 0
+        last_id = 0
+        while True:
+            movies = db.query(Movie).filter(
+                Movie.id > last_id,
+                ~exists().where(MovieGenre.movie_id == Movie.id),
+                ~exists().where(MovieCast.movie_id == Movie.id)
+            ).order_by(Movie.id).limit(batch_size).all()
+            if not movies:
+                return linked
+            MovieService.link_movies(db, movies)
+            db.commit()
+            linked += len(movies)
+            last_id = movies[-1].id
@@ -0,0 +1,56 @@
+from datetime import datetime
+
+from db.jobs import UsageLogRetentionJob
+from db.models_v3 import UsageLog, UsageRollup
+from db.partitions import add_months, month_start, partition_name, usage_log_partitions
+from db.services import UsageService
+
+def log_requests(db, api_key_id: int, timestamp: datetime, count: int, endpoint: str = "/movies") -> None:
+    """Add raw usage log rows without touching the rollups, as before the rollups existed."""
+    db.add_all(
+        UsageLog(api_key_id=api_key_id, endpoint=endpoint, method="GET", timestamp=timestamp)
+        for _ in range(count)
+    )
+    db.commit()
+
+def test_months_logged_before_rollups_are_rolled_up_before_they_are_dropped(db, make_api_key):
+    api_key = make_api_key()
+    now = datetime.now()
+    expired = add_months(month_start(now), -6).replace(day=3, hour=10)
+    kept = add_months(month_start(now), -1).replace(day=5, hour=8)
+    log_requests(db, api_key.id, expired, 4)
+    log_requests(db, api_key.id, kept, 2)
+
+    result = UsageLogRetentionJob().run(db, now, "")
+    db.commit()
+
+    assert partition_name(month_start(expired)) in result["dropped"]
+    assert partition_name(month_start(expired)) not in [partition_name(m) for m in usage_log_partitions.months(db)]
+    # Both months are counted in the rollups, including the one whose raw rows are gone
+    rows = db.query(UsageRollup).filter(UsageRollup.api_key_id == api_key.id).order_by(UsageRollup.bucket_start).all()
+    assert [(row.bucket_start.replace(tzinfo=None), row.request_count) for row in rows] == [
+        (expired.replace(minute=0), 4), (kept.replace(minute=0), 2)
+    ]
+
+def test_rebuild_never_lowers_counts_added_by_the_pipeline(db, make_api_key):
+    api_key = make_api_key()
+    hour = datetime.now().replace(minute=0, second=0, microsecond=0)
+    log_requests(db, api_key.id, hour, 3)
+    # The pipeline has already counted these three and two more still being written
+    UsageService.add_rollups(db.connection(), [{"api_key_id": api_key.id, "endpoint": "/movies", "timestamp": hour}] * 5)
+    db.commit()
+
+    usage_log_partitions.rebuild_rollups(db, hour, add_months(month_start(hour), 1))
+    db.commit()
+    assert UsageService.request_count(db, api_key.id) == 5
+
+def test_rebuild_fills_in_buckets_the_pipeline_never_saw(db, make_api_key):
+    api_key = make_api_key()
+    hour = datetime.now().replace(minute=0, second=0, microsecond=0)
+    log_requests(db, api_key.id, hour, 3, endpoint="/search")
+    UsageService.add_rollups(db.connection(), [{"api_key_id": api_key.id, "endpoint": "/search", "timestamp": hour}])
+    db.commit()
+
+    assert usage_log_partitions.rebuild_rollups(db, month_start(hour), add_months(month_start(hour), 1)) >= 1
+    db.commit()
+    assert UsageService.request_count(db, api_key.id) == 3
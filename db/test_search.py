@@ -0,0 +1,86 @@
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.exc import NotSupportedError, OperationalError, ProgrammingError
+from sqlalchemy.orm import Session
+
+from db.models_v3 import Base, Movie
+from db.search import MovieSearchIndex
+
+class FailingBind:
+    """A PostgreSQL bind whose statements all fail with ``error``."""
+
+    class dialect:
+        name = "postgresql"
+
+    def __init__(self, error: Exception):
+        self.error = error
+
+    @contextmanager
+    def begin(self):
+        raise self.error
+        yield
+
+@pytest.mark.parametrize("error_type", [OperationalError, ProgrammingError, NotSupportedError])
+def test_setup_falls_back_to_ilike_when_the_index_cannot_be_created(error_type):
+    index = MovieSearchIndex(bind=FailingBind(error_type("CREATE INDEX", {}, Exception("permission denied"))))
+    index.setup()
+    assert index.available is False
+    assert index.trigrams_available is False
+
+def _movie(title: str, plot: str = "", director: str = "Someone", actors: str = "Nobody", genre: str = "Drama") -> Movie:
+    return Movie(title=title, year=2000, genre=genre, director=director, actors=actors, plot=plot, poster_url="")
+
+@pytest.fixture
+def indexed(tmp_path):
+    """A session on a fresh SQLite database with the FTS5 index set up."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'search.db'}")
+    Base.metadata.create_all(bind=engine)
+    with Session(engine) as db:
+        # Written before setup, so they are indexed by its rebuild
+        db.add_all([
+            _movie("The Shawshank Redemption", "Two men bond in prison over a number of years."),
+            _movie("Prison Break", "A man plans a redemption for his brother."),
+            _movie("The Godfather", "The aging patriarch of a crime dynasty.", director="Francis Ford Coppola")
+        ])
+        db.commit()
+        index = MovieSearchIndex(bind=engine)
+        index.setup()
+        assert index.available
+        yield db, index
+    engine.dispose()
+
+def _titles(db, index, **criteria) -> list:
+    return [movie.title for movie in index.search_query(db, **criteria)]
+
+def test_title_matches_rank_above_plot_matches(indexed):
+    db, index = indexed
+    assert _titles(db, index, q="redemption") == ["The Shawshank Redemption", "Prison Break"]
+    assert _titles(db, index, q="prison") == ["Prison Break", "The Shawshank Redemption"]
+
+def test_q_and_title_match_word_prefixes(indexed):
+    db, index = indexed
+    assert _titles(db, index, q="godf") == ["The Godfather"]
+    assert _titles(db, index, q="coppola patri") == ["The Godfather"]
+    assert _titles(db, index, title="shaw red") == ["The Shawshank Redemption"]
+    # The title filter ignores words that are only in the plot
+    assert _titles(db, index, title="redemption") == ["The Shawshank Redemption"]
+    assert _titles(db, index, q="!!!") == []
+
+def test_triggers_keep_the_index_in_sync(indexed):
+    db, index = indexed
+    movie = _movie("Heat", "A group of professional bank robbers.")
+    db.add(movie)
+    db.commit()
+    assert _titles(db, index, q="robbers") == ["Heat"]
+
+    movie.title = "Heat Wave"
+    movie.plot = "A city swelters."
+    db.commit()
+    assert _titles(db, index, q="robbers") == []
+    assert _titles(db, index, title="wave") == ["Heat Wave"]
+
+    db.delete(movie)
+    db.commit()
+    assert _titles(db, index, title="heat") == []
@@ -1,5 +1,5 @@
 from fastapi import FastAPI, HTTPException, Query, Depends, Request, Security
-from fastapi.responses import JSONResponse, HTMLResponse
+from fastapi.responses import JSONResponse, HTMLResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import APIKeyHeader
 from fastapi.templating import Jinja2Templates
@@ -7,24 +7,40 @@ from fastapi.staticfiles import StaticFiles
 
 from sqlalchemy.orm import Session
 from typing import Optional, List
+import hashlib
 import math
 import os
 from datetime import datetime, timedelta
 
 # Database imports
+from db.catalog import catalog_version
 from db.database import get_database, create_tables
-from db.models_v3 import ApiKey, Movie, User, UsageLog  # Use v3 models
+from db.search import FUZZY_SIMILARITY, SEARCH_RESULT_WINDOW, capped_count, movie_search_index
+from db.jobs import monthly_usage_reset_job, usage_log_retention_job
+from db.models_v3 import ApiKey, Movie, User  # Use v3 models
 from middleware.auth import require_api_key, get_optional_api_key
+from middleware.compression import CompressionMiddleware, compression_stats
+from middleware.conditional import ConditionalGet, conditional_get
+from middleware.key_cache import ApiKeyRecord, api_key_cache
+from middleware.key_filter import api_key_filter
+from middleware.rate_limit import rate_limiter
+from middleware.response_cache import response_cache
+from middleware.usage import usage_counter
+from middleware.usage_logs import usage_log_pipeline
 from models import (
-    MovieResponse, PaginatedMoviesResponse, SearchResponse,
+    MovieResponse, PaginatedMoviesResponse, SearchResponse, BatchMoviesResponse,
     ApiKeyResponse, UsageStatsResponse, AdminStatsResponse,
     CreateApiKeyRequest, ResetUsageRequest
 )
+from pagination import decode_cursor, encode_cursor
+from serialization import encode_fields, movie_json, parse_fields, splice_movies
+from data_loader import MovieDataLoader, movie_catalog
+from catalog_export import EXPORT_MEDIA_TYPES, CatalogExport
 
 # Import route modules
 from api.admin_routes import router as admin_router
 from api.dev_routes import router as dev_router
-from db.services import ApiKeyService
+from db.services import ApiKeyService, UsageService
 
 # Import for email configuration
 import smtplib
@@ -56,6 +72,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress responses the client accepts compressed, reusing compressed variants of repeated bodies
+app.add_middleware(CompressionMiddleware)
+
 # Include routers
 app.include_router(admin_router, tags=["admin"])
 app.include_router(dev_router, tags=["developer"])
@@ -67,6 +86,9 @@ async def startup_event():
         create_tables()
         print("Database tables created successfully!")
 
+        # Full-text index over the movies table, kept in sync by the database
+        movie_search_index.setup()
+
         # Load sample data if no movies exist
         from data_loader import load_movies_from_csv
         load_movies_from_csv()
@@ -75,22 +97,72 @@ async def startup_event():
         from create_admin import create_admin_user
         create_admin_user()
 
+        # Keep the catalog size and version in memory
+        await catalog_version.start()
+
+        # Serve movie reads from an in-memory snapshot of the catalog
+        await movie_catalog.start()
+
+        # Load valid API keys so unknown ones are rejected without a query
+        await api_key_filter.start()
+        # Drop cached keys that other workers suspend or change
+        await api_key_cache.start()
+
+        # Start usage accounting and log ingestion
+        await usage_counter.start()
+        await usage_log_pipeline.start()
+
+        # Reset monthly usage and roll up old usage logs at each month boundary
+        await monthly_usage_reset_job.start()
+        await usage_log_retention_job.start()
+
     except Exception as e:
         print(f"Failed to create database tables: {e}")
         raise
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Flush buffered usage before the worker exits."""
+    await monthly_usage_reset_job.stop()
+    await usage_log_retention_job.stop()
+    await catalog_version.stop()
+    await api_key_filter.stop()
+    await api_key_cache.stop()
+    await usage_counter.stop()
+    await usage_log_pipeline.stop()
+
 # Mount static files for React app (only if dist directory exists)
 import os
 if os.path.exists("dist"):
     app.mount("/assets", StaticFiles(directory="dist/assets"), name="assets")
     app.mount("/static", StaticFiles(directory="dist"), name="static")
 
+# dist/index.html and its ETag, read again only when the file changes
+_homepage_cache: dict = {}
+
+def homepage_content() -> Optional[tuple]:
+    """``(content, etag)`` of the built React page, or None before it is built."""
+    try:
+        modified = os.stat("dist/index.html").st_mtime_ns
+    except FileNotFoundError:
+        return None
+    if _homepage_cache.get("modified") != modified:
+        with open("dist/index.html", "rb") as f:
+            content = f.read()
+        etag = '"' + hashlib.blake2b(content, digest_size=12).hexdigest() + '"'
+        _homepage_cache.update(modified=modified, page=(content, etag))
+    return _homepage_cache["page"]
+
 @app.get("/", response_class=HTMLResponse)
-async def homepage():
+async def homepage(request: Request):
     """Serve React app or fallback message."""
-    if os.path.exists("dist/index.html"):
-        with open("dist/index.html", "r") as f:
-            return HTMLResponse(content=f.read(), status_code=200)
+    page = homepage_content()
+    if page:
+        content, etag = page
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match is not None and ConditionalGet.etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers={"ETag": etag})
+        return HTMLResponse(content=content, status_code=200, headers={"ETag": etag})
     else:
         return HTMLResponse(
             content="""
@@ -111,19 +183,38 @@ async def homepage():
 async def get_movies(
     page: int = Query(1, ge=1, description="Page number (starts from 1)"),
     per_page: int = Query(10, ge=1, le=50, description="Number of movies per page"),
-    current_user: ApiKey = Depends(require_api_key),
+    cursor: Optional[str] = Query(None, description="Cursor from a previous page's next_cursor"),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return, e.g. id,title,year (id is always included)"),
+    current_user: ApiKeyRecord = Depends(require_api_key),
+    validators: dict = Depends(conditional_get),
     db: Session = Depends(get_database)
 ):
     """
     Get all movies with pagination.
 
     Requires API key authentication via X-API-KEY header.
+    Send the returned ETag in If-None-Match to get 304 Not Modified while the catalog is unchanged.
 
     - **page**: Page number (default: 1)
     - **per_page**: Number of movies per page (default: 10, max: 50)
+    - **cursor**: Continue after the previous page; every page costs the same at any depth
+    - **fields**: Only return these movie fields (default: all)
     """
     try:
-        total_movies = db.query(Movie).count()
+        try:
+            selected = parse_fields(fields)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        # Popular pages come from the response cache; cursor walks would only evict them
+        cache_key = None if cursor else response_cache.key("/movies", page=page, per_page=per_page, fields=selected)
+        body = response_cache.get(cache_key) if cache_key else None
+        if body is not None:
+            return Response(content=body, media_type="application/json", headers=validators)
+
+        # Served from the in-memory snapshot unless it is disabled
+        snapshot = movie_catalog.current()
+        total_movies = len(snapshot) if snapshot else catalog_version.movie_count
 
         if total_movies == 0:
             return PaginatedMoviesResponse(
@@ -136,41 +227,55 @@ async def get_movies(
 
         total_pages = math.ceil(total_movies / per_page)
 
-        # Validate page number
-        if page > total_pages:
-            raise HTTPException(
-                status_code=404,
-                detail=f"Page {page} not found. Total pages: {total_pages}"
-            )
-
-        # Calculate skip value for pagination
-        skip = (page - 1) * per_page
-
-        # Get movies for current page
-        movies = db.query(Movie).offset(skip).limit(per_page).all()
-
-        # Convert to response format
-        def movie_to_response(movie: Movie) -> MovieResponse:
-            return MovieResponse(
-                id=movie.id,
-                title=movie.title,
-                year=movie.year,
-                genre=movie.genre.split('|') if movie.genre else [],
-                director=movie.director,
-                actors=movie.actors.split('|') if movie.actors else [],
-                plot=movie.plot,
-                poster_url=movie.poster_url or ""
-            )
-
-        movie_responses = [movie_to_response(movie) for movie in movies]
-
-        return PaginatedMoviesResponse(
-            movies=movie_responses,
+        if cursor:
+            # Seek past the last movie of the previous page instead of counting rows
+            try:
+                after_id, page = decode_cursor(cursor)
+            except ValueError:
+                raise HTTPException(status_code=400, detail="Invalid cursor")
+            if snapshot:
+                movies = snapshot.page_after(after_id, per_page + 1)
+            else:
+                query = db.query(Movie).options(*MovieDataLoader.load_options(selected)).filter(
+                    Movie.id > after_id
+                ).order_by(Movie.id)
+        else:
+            # Validate page number
+            if page > total_pages:
+                raise HTTPException(
+                    status_code=404,
+                    detail=f"Page {page} not found. Total pages: {total_pages}"
+                )
+
+            # Calculate skip value for pagination
+            skip = (page - 1) * per_page
+            if snapshot:
+                movies = snapshot.page(skip, per_page + 1)
+            else:
+                query = db.query(Movie).options(*MovieDataLoader.load_options(selected)).order_by(Movie.id).offset(skip)
+
+        # Get movies for current page, plus one to tell whether another page follows
+        if not snapshot:
+            movies = query.limit(per_page + 1).all()
+        next_cursor = encode_cursor(movies[per_page - 1].id, page + 1) if len(movies) > per_page else None
+        movies = movies[:per_page]
+
+        # Snapshot movies are already encoded; only the page envelope is serialized here
+        if snapshot:
+            movie_bytes = snapshot.encoded(movies, selected)
+        else:
+            movie_bytes = [encode_fields(MovieDataLoader.movie_values(movie, selected), selected) for movie in movies]
+        body = splice_movies(PaginatedMoviesResponse(
+            movies=[],
             page=page,
             per_page=per_page,
             total_movies=total_movies,
-            total_pages=total_pages
-        )
+            total_pages=total_pages,
+            next_cursor=next_cursor
+        ), movie_bytes)
+        if cache_key:
+            response_cache.put(cache_key, body)
+        return Response(content=body, media_type="application/json", headers=validators)
 
     except HTTPException:
         raise
@@ -179,74 +284,211 @@ async def get_movies(
 
 @app.get("/search", response_model=SearchResponse)
 async def search_movies(
+    q: Optional[str] = Query(None, description="Full-text search over title, plot, director and actors"),
     title: Optional[str] = Query(None, description="Search by movie title"),
     year: Optional[int] = Query(None, description="Search by release year"),
     genre: Optional[str] = Query(None, description="Search by genre"),
-    current_user: ApiKey = Depends(require_api_key),
+    actor: Optional[str] = Query(None, description="Search by actor name"),
+    director: Optional[str] = Query(None, description="Search by director name"),
+    fuzzy: bool = Query(False, description="Match the title by trigram similarity, tolerating typos"),
+    similarity: float = Query(FUZZY_SIMILARITY, gt=0, le=1, description="Lowest title similarity a fuzzy match needs (0 to 1)"),
+    page: int = Query(1, ge=1, description="Page number (starts from 1)"),
+    per_page: int = Query(10, ge=1, le=50, description="Number of results per page"),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return, e.g. id,title,year (id is always included)"),
+    current_user: ApiKeyRecord = Depends(require_api_key),
+    validators: dict = Depends(conditional_get),
     db: Session = Depends(get_database)
 ):
     """
-    Search movies by title, year, and/or genre.
+    Search movies by keywords, title, year, and/or genre.
 
     Requires API key authentication via X-API-KEY header.
+    Send the returned ETag in If-None-Match to get 304 Not Modified while the catalog is unchanged.
 
-    - **title**: Search in movie titles (case-insensitive, partial match)
+    - **q**: Full-text search over title, plot, director and actors, best matches first
+    - **title**: Search in movie titles (case-insensitive, matches word prefixes)
     - **year**: Search by exact release year
-    - **genre**: Search in genres (case-insensitive, partial match)
+    - **genre**: Search by exact genre name (case-insensitive)
+    - **actor**: Search by exact actor name (case-insensitive)
+    - **director**: Search by exact director name (case-insensitive)
+    - **fuzzy**: Match the title by trigram similarity instead, most similar first ("godfathr" finds "The Godfather")
+    - **similarity**: Lowest similarity a fuzzy title match needs (default: 0.5)
+    - **page**: Page number (default: 1)
+    - **per_page**: Number of results per page (default: 10, max: 50)
+    - **fields**: Only return these movie fields (default: all)
 
-    You can combine multiple search parameters.
+    You can combine multiple search parameters. Only the first SEARCH_RESULT_WINDOW
+    matches can be paged through; above that, total_results is capped and
+    total_exact is false.
     """
     try:
         # Validate that at least one search parameter is provided
-        if not any([title, year, genre]):
+        if not any([q, title, year, genre, actor, director]):
             raise HTTPException(
                 status_code=400,
-                detail="At least one search parameter (title, year, or genre) must be provided"
+                detail="At least one search parameter (q, title, year, genre, actor, or director) must be provided"
             )
-
-        # Perform search
-        query = db.query(Movie)
-
-        if title:
-            query = query.filter(Movie.title.ilike(f"%{title}%"))
-
-        if year:
-            query = query.filter(Movie.year == year)
-
-        if genre:
-            query = query.filter(Movie.genre.ilike(f"%{genre}%"))
-
-        search_results = query.all()
-
-        # Convert to response format
-        def movie_to_response(movie: Movie) -> MovieResponse:
-            return MovieResponse(
-                id=movie.id,
-                title=movie.title,
-                year=movie.year,
-                genre=movie.genre.split('|') if movie.genre else [],
-                director=movie.director,
-                actors=movie.actors.split('|') if movie.actors else [],
-                plot=movie.plot,
-                poster_url=movie.poster_url or ""
+        try:
+            selected = parse_fields(fields)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        # Similarity only matters to fuzzy title searches
+        fuzzy = fuzzy and bool(title)
+        if not fuzzy:
+            similarity = FUZZY_SIMILARITY
+
+        cache_key = response_cache.key(
+            "/search", q=q, title=title, year=year, genre=genre, actor=actor, director=director,
+            fuzzy=fuzzy, similarity=similarity, page=page, per_page=per_page, fields=selected
+        )
+        body = response_cache.get(cache_key)
+        if body is not None:
+            return Response(content=body, media_type="application/json", headers=validators)
+
+        snapshot = movie_catalog.current()
+        if snapshot:
+            # One more than the window keeps the overflow check of capped_count
+            matches = snapshot.search(
+                q=q, title=title, year=year, genre=genre, actor=actor, director=director,
+                fuzzy=fuzzy, similarity=similarity, window=SEARCH_RESULT_WINDOW + 1
+            )
+            total_results, total_exact = min(len(matches), SEARCH_RESULT_WINDOW), len(matches) <= SEARCH_RESULT_WINDOW
+        else:
+            # Perform search through the full-text index and the genre and cast tables
+            query = movie_search_index.search_query(
+                db, q=q, title=title, year=year, genre=genre, actor=actor, director=director,
+                fuzzy=fuzzy, similarity=similarity
+            ).options(*MovieDataLoader.load_options(selected))
+            total_results, total_exact = capped_count(query)
+
+        total_pages = math.ceil(total_results / per_page)
+        if page > max(total_pages, 1):
+            raise HTTPException(
+                status_code=404,
+                detail=f"Page {page} not found. Total pages: {total_pages}"
             )
 
-        movie_responses = [movie_to_response(movie) for movie in search_results]
+        # Never page past the result window
+        skip = (page - 1) * per_page
+        limit = min(per_page, total_results - skip)
+        if snapshot:
+            movies = matches[skip:skip + limit]
+        else:
+            movies = query.offset(skip).limit(limit).all() if limit > 0 else []
 
         # Prepare query information for response
         query_info = {}
+        if q:
+            query_info["q"] = q
         if title:
             query_info["title"] = title
+        if fuzzy:
+            query_info["fuzzy"] = True
+            query_info["similarity"] = similarity
         if year:
             query_info["year"] = year
         if genre:
             query_info["genre"] = genre
+        if actor:
+            query_info["actor"] = actor
+        if director:
+            query_info["director"] = director
 
-        return SearchResponse(
-            movies=movie_responses,
+        if snapshot:
+            movie_bytes = snapshot.encoded(movies, selected)
+        else:
+            movie_bytes = [encode_fields(MovieDataLoader.movie_values(movie, selected), selected) for movie in movies]
+        body = splice_movies(SearchResponse(
+            movies=[],
             query=query_info,
-            total_results=len(movie_responses)
-        )
+            total_results=total_results,
+            page=page,
+            per_page=per_page,
+            total_pages=total_pages,
+            total_exact=total_exact
+        ), movie_bytes)
+        response_cache.put(cache_key, body)
+        return Response(content=body, media_type="application/json", headers=validators)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+@app.get("/movies/export")
+async def export_movies(
+    export_format: str = Query("ndjson", alias="format", pattern="^(ndjson|csv)$", description="ndjson or csv"),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to export, e.g. id,title,year (id is always included)"),
+    current_user: ApiKeyRecord = Depends(require_api_key),
+    validators: dict = Depends(conditional_get)
+):
+    """
+    Download the whole catalog in one streamed response.
+
+    Requires API key authentication via X-API-KEY header. Counts as a single request.
+    Send the returned ETag in If-None-Match to get 304 Not Modified while the catalog is unchanged.
+
+    - **format**: ndjson (one movie per line, as /movies returns them) or csv (default: ndjson)
+    - **fields**: Only export these movie fields (default: all)
+    """
+    try:
+        selected = parse_fields(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    export = CatalogExport(movie_catalog.current(), selected)
+    headers = {**validators, "Content-Disposition": f'attachment; filename="movies.{export_format}"'}
+    return StreamingResponse(export.stream(export_format), media_type=EXPORT_MEDIA_TYPES[export_format], headers=headers)
+
+# Most ids one /movies/batch request may ask for
+MOVIE_BATCH_MAX_IDS = int(os.getenv("MOVIE_BATCH_MAX_IDS", "100"))
+
+@app.get("/movies/batch", response_model=BatchMoviesResponse)
+async def get_movies_batch(
+    ids: str = Query(..., description="Comma-separated movie IDs"),
+    current_user: ApiKeyRecord = Depends(require_api_key),
+    validators: dict = Depends(conditional_get),
+    db: Session = Depends(get_database)
+):
+    """
+    Get several movies by ID in one request.
+
+    Requires API key authentication via X-API-KEY header. Counts as a single request.
+    Send the returned ETag in If-None-Match to get 304 Not Modified while the catalog is unchanged.
+
+    - **ids**: Up to MOVIE_BATCH_MAX_IDS comma-separated movie IDs
+
+    Movies come back in the requested order; IDs that do not exist are null
+    in **movies** and listed in **not_found**.
+    """
+    try:
+        try:
+            movie_ids = [int(value) for value in ids.split(",") if value.strip()]
+        except ValueError:
+            raise HTTPException(status_code=400, detail="ids must be comma-separated integers")
+        if not movie_ids:
+            raise HTTPException(status_code=400, detail="At least one movie ID must be provided")
+        if len(movie_ids) > MOVIE_BATCH_MAX_IDS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"At most {MOVIE_BATCH_MAX_IDS} movie IDs can be requested at once"
+            )
+
+        snapshot = movie_catalog.current()
+        if snapshot:
+            entries = snapshot.entries_by_id
+            found = {movie_id: entries[movie_id].json for movie_id in movie_ids if movie_id in entries}
+        else:
+            # One IN query for the whole batch
+            movies = db.query(Movie).filter(Movie.id.in_(set(movie_ids))).all()
+            found = {movie.id: movie_json(MovieDataLoader.movie_to_response(movie)) for movie in movies}
+
+        body = splice_movies(BatchMoviesResponse(
+            movies=[],
+            not_found=list(dict.fromkeys(movie_id for movie_id in movie_ids if movie_id not in found))
+        ), (found.get(movie_id, b"null") for movie_id in movie_ids))
+        return Response(content=body, media_type="application/json", headers=validators)
 
     except HTTPException:
         raise
@@ -256,18 +498,24 @@ async def search_movies(
 @app.get("/movies/{movie_id}", response_model=MovieResponse)
 async def get_movie_by_id(
     movie_id: int,
-    current_user: ApiKey = Depends(require_api_key),
+    current_user: ApiKeyRecord = Depends(require_api_key),
+    validators: dict = Depends(conditional_get),
     db: Session = Depends(get_database)
 ):
     """
     Get full movie details by ID.
 
     Requires API key authentication via X-API-KEY header.
+    Send the returned ETag in If-None-Match to get 304 Not Modified while the catalog is unchanged.
 
     - **movie_id**: The unique identifier of the movie
     """
     try:
-        movie = db.query(Movie).filter(Movie.id == movie_id).first()
+        snapshot = movie_catalog.current()
+        if snapshot:
+            movie = snapshot.entries_by_id.get(movie_id)
+        else:
+            movie = db.query(Movie).filter(Movie.id == movie_id).first()
 
         if not movie:
             raise HTTPException(
@@ -275,19 +523,8 @@ async def get_movie_by_id(
                 detail=f"Movie with ID {movie_id} not found"
             )
 
-        def movie_to_response(movie: Movie) -> MovieResponse:
-            return MovieResponse(
-                id=movie.id,
-                title=movie.title,
-                year=movie.year,
-                genre=movie.genre.split('|') if movie.genre else [],
-                director=movie.director,
-                actors=movie.actors.split('|') if movie.actors else [],
-                plot=movie.plot,
-                poster_url=movie.poster_url or ""
-            )
-
-        return movie_to_response(movie)
+        body = movie.json if snapshot else movie_json(MovieDataLoader.movie_to_response(movie))
+        return Response(content=body, media_type="application/json", headers=validators)
 
     except HTTPException:
         raise
@@ -297,7 +534,7 @@ async def get_movie_by_id(
 # API Key Management Endpoints
 @app.get("/api-key/stats", response_model=UsageStatsResponse)
 async def get_api_key_stats(
-    current_user: ApiKey = Depends(require_api_key),
+    current_user: ApiKeyRecord = Depends(require_api_key),
     db: Session = Depends(get_database)
 ):
     """
@@ -310,25 +547,18 @@ async def get_api_key_stats(
         from datetime import datetime, timedelta
         start_date = datetime.now() - timedelta(days=30)
 
-        usage_logs = db.query(UsageLog).filter(
-            UsageLog.api_key_id == current_user.id,
-            UsageLog.timestamp >= start_date
-        ).all()
-
-        # Group by endpoint
-        endpoint_stats = {}
-        for log in usage_logs:
-            if log.endpoint not in endpoint_stats:
-                endpoint_stats[log.endpoint] = 0
-            endpoint_stats[log.endpoint] += 1
+        endpoint_stats = UsageService.endpoint_counts(db, current_user.id, since=start_date)
 
-        usage_percentage = (current_user.usage_count / current_user.monthly_limit) * 100
+        # Include requests that are still buffered in memory
+        usage_count = usage_counter.usage(current_user.id)
+        usage_percentage = (usage_count / current_user.monthly_limit) * 100
+        owner = db.query(User).filter(User.id == current_user.owner_id).first()
 
         return UsageStatsResponse(
             api_key=current_user.key,
-            owner_name=current_user.owner.name if current_user.owner else "Unknown",
+            owner_name=owner.name if owner else "Unknown",
             plan=current_user.plan,
-            usage_count=current_user.usage_count,
+            usage_count=usage_count,
             monthly_limit=current_user.monthly_limit,
             usage_percentage=round(usage_percentage, 2),
             endpoint_breakdown=endpoint_stats,
@@ -344,31 +574,20 @@ async def get_admin_stats(db: Session = Depends(get_database)):
     Get admin statistics (no authentication required for demo).
     """
     try:
-        from sqlalchemy import func
-
         # Get API key statistics
         total_api_keys = db.query(ApiKey).count()
         active_api_keys = db.query(ApiKey).filter(ApiKey.is_active == "active").count()
         suspended_api_keys = db.query(ApiKey).filter(ApiKey.is_active == "suspended").count()
 
         # Get movie count
-        total_movies = db.query(Movie).count()
+        total_movies = catalog_version.movie_count
 
         # Get today's requests
-        today = datetime.now().date()
-        total_requests_today = db.query(UsageLog).filter(
-            func.date(UsageLog.timestamp) == today
-        ).count()
+        today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        total_requests_today = UsageService.request_count(db, since=today)
 
         # Get top endpoints
-        endpoint_counts = db.query(
-            UsageLog.endpoint,
-            func.count(UsageLog.endpoint).label('count')
-        ).group_by(UsageLog.endpoint).order_by(
-            func.count(UsageLog.endpoint).desc()
-        ).limit(5).all()
-
-        top_endpoints = {endpoint: count for endpoint, count in endpoint_counts}
+        top_endpoints = UsageService.endpoint_counts(db, limit=5)
 
         return AdminStatsResponse(
             total_api_keys=total_api_keys,
@@ -381,6 +600,23 @@ async def get_admin_stats(db: Session = Depends(get_database)):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
+@app.get("/admin/metrics")
+async def get_admin_metrics():
+    """
+    Get in-process performance metrics for this worker (no authentication required for demo).
+    """
+    return {
+        "api_key_cache": api_key_cache.stats(),
+        "catalog": catalog_version.stats(),
+        "catalog_snapshot": movie_catalog.stats(),
+        "compression": compression_stats.stats(),
+        "api_key_filter": api_key_filter.stats(),
+        "rate_limiter": rate_limiter.stats(),
+        "response_cache": response_cache.stats(),
+        "usage_counter": usage_counter.stats(),
+        "usage_logs": usage_log_pipeline.stats()
+    }
+
 @app.get("/admin/api-keys", response_model=List[ApiKeyResponse])
 async def get_all_api_keys(db: Session = Depends(get_database)):
     """
@@ -1,11 +1,16 @@
 from fastapi import HTTPException, Request, Depends, Security
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials, APIKeyHeader
+from fastapi.security import HTTPBearer, APIKeyHeader
 from sqlalchemy.orm import Session
 from db.database import get_database
-from db.models_v3 import ApiKey, UsageLog
-from datetime import datetime, timedelta
+from db.models_v3 import ApiKey
+from middleware.key_cache import ApiKeyRecord, api_key_cache
+from middleware.key_filter import api_key_filter
+from middleware.rate_limit import rate_limiter
+from middleware.usage import usage_counter
+from middleware.usage_logs import usage_log_pipeline
+from datetime import datetime
 from typing import Optional
-import calendar
+import math
 
 security = HTTPBearer(auto_error=False)
 
@@ -29,16 +34,31 @@ class APIKeyAuth:
         db: Session,
         endpoint: str,
         request: Request
-    ) -> ApiKey:
+    ) -> ApiKeyRecord:
         """Validate API key and check rate limits."""
         
-        # Find API key in database
-        db_api_key = db.query(ApiKey).filter(ApiKey.key == api_key).first()
-        if not db_api_key:
-            raise HTTPException(
-                status_code=401,
-                detail="Invalid API key."
-            )
+        # Find API key, going to the database only on a cache miss
+        db_api_key = api_key_cache.get(api_key)
+        if db_api_key is None:
+            # Unknown keys are rejected without a query, but for a few misses per refresh
+            passed_filter = api_key_filter.might_contain(api_key)
+            if api_key_filter.known_invalid(api_key) or not (passed_filter or api_key_filter.confirm_miss()):
+                raise HTTPException(
+                    status_code=401,
+                    detail="Invalid API key."
+                )
+            row = db.query(ApiKey).filter(ApiKey.key == api_key).first()
+            if not row:
+                api_key_filter.record_invalid(api_key, passed_filter)
+                raise HTTPException(
+                    status_code=401,
+                    detail="Invalid API key."
+                )
+            if not passed_filter:
+                api_key_filter.record_missed(api_key)
+            db_api_key = ApiKeyRecord.from_model(row)
+            usage_counter.observe(row.id, row.usage_count)
+            api_key_cache.put(db_api_key)
         
         # Check if API key is active
         if not db_api_key.is_active:
@@ -47,46 +67,34 @@ class APIKeyAuth:
                 detail="API key is suspended."
             )
         
-        # Check rate limit
-        current_time = datetime.now()
-        
-        # Reset monthly usage if it's a new month
-        if APIKeyAuth._should_reset_monthly_usage(db_api_key.last_reset, current_time):
-            db_api_key.usage_count = 0
-            db_api_key.last_reset = current_time
-            db.commit()
+        # Short-window throttle, decided without touching the database
+        retry_after = rate_limiter.check(db_api_key.id, db_api_key.plan)
+        if retry_after:
+            raise HTTPException(
+                status_code=429,
+                detail=f"Rate limit exceeded for the {db_api_key.plan} plan. Retry in {math.ceil(retry_after)} seconds.",
+                headers={"Retry-After": str(math.ceil(retry_after))}
+            )
         
-        # Check if usage limit exceeded
-        if db_api_key.usage_count >= db_api_key.monthly_limit:
+        # Check monthly limit and count the request
+        current_time = datetime.now()
+        if not usage_counter.record(db, db_api_key.id, db_api_key.monthly_limit):
             raise HTTPException(
                 status_code=429,
                 detail=f"Monthly usage limit ({db_api_key.monthly_limit}) exceeded. Please upgrade your plan."
             )
         
-        # Log the usage
-        usage_log = UsageLog(
-            api_key_id=db_api_key.id,
-            endpoint=endpoint,
-            method=request.method,
-            ip_address=request.client.host if request.client else None,
-            user_agent=request.headers.get("user-agent")
-        )
-        db.add(usage_log)
-        
-        # Increment usage count
-        db_api_key.usage_count += 1
-        db.commit()
+        # Log the usage without waiting for the write
+        usage_log_pipeline.submit({
+            "api_key_id": db_api_key.id,
+            "endpoint": endpoint,
+            "method": request.method,
+            "timestamp": current_time,
+            "ip_address": request.client.host if request.client else None,
+            "user_agent": request.headers.get("user-agent")
+        })
         
         return db_api_key
-    
-    @staticmethod
-    def _should_reset_monthly_usage(last_reset: datetime, current_time: datetime) -> bool:
-        """Check if monthly usage should be reset."""
-        if last_reset is None:
-            return True
-        if last_reset.month != current_time.month or last_reset.year != current_time.year:
-            return True
-        return False
 
 # API Key header for Swagger UI integration
 api_key_header_auth = APIKeyHeader(name="X-API-KEY", auto_error=False)
@@ -95,7 +103,7 @@ def require_api_key(
     request: Request,
     api_key: str = Security(api_key_header_auth),
     db: Session = Depends(get_database)
-) -> ApiKey:
+) -> ApiKeyRecord:
     """Dependency to require and validate API key for protected endpoints."""
     if not api_key:
         raise HTTPException(
@@ -108,7 +116,7 @@ def require_api_key(
 def get_optional_api_key(
     request: Request,
     db: Session = Depends(get_database)
-) -> Optional[ApiKey]:
+) -> Optional[ApiKeyRecord]:
     """Dependency to optionally validate API key (for admin endpoints)."""
     try:
         api_key = request.headers.get("X-API-KEY")
@@ -0,0 +1,253 @@
+import gzip
+import hashlib
+import os
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # optional: pip install brotli
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # optional: pip install zstandard
+    zstandard = None
+
+# Compression settings
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+COMPRESSION_CACHE_MAX_BYTES = int(os.getenv("COMPRESSION_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "5"))
+ZSTD_LEVEL = int(os.getenv("ZSTD_LEVEL", "3"))
+
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "application/javascript", "image/svg+xml", "text/")
+
+def _gzip_stream() -> Tuple[Callable[[bytes], bytes], Callable[[], bytes]]:
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return compressor.compress, compressor.flush
+
+# Available codecs, most preferred first: name -> (one-shot compress, streaming compressor factory)
+CODECS: "OrderedDict[str, Tuple[Callable[[bytes], bytes], Callable]]" = OrderedDict()
+if zstandard is not None:
+    def _zstd_stream():
+        compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+        return compressor.compress, compressor.flush
+    CODECS["zstd"] = (lambda body: zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(body), _zstd_stream)
+if brotli is not None:
+    def _brotli_stream():
+        compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        return compressor.process, compressor.finish
+    CODECS["br"] = (lambda body: brotli.compress(body, quality=BROTLI_QUALITY), _brotli_stream)
+CODECS["gzip"] = (lambda body: gzip.compress(body, GZIP_LEVEL, mtime=0), _gzip_stream)
+
+def negotiate(accept_encoding: str) -> Optional[str]:
+    """Best available codec for an Accept-Encoding header, or None for identity."""
+    weights: Dict[str, float] = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                continue
+        if name:
+            weights[name.strip()] = quality
+    best, best_quality = None, 0.0
+    for name in CODECS:
+        quality = weights.get(name, weights.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = name, quality
+    return best
+
+class CompressedVariantCache:
+    """Bounded LRU cache of compressed bodies, keyed by body digest and codec.
+
+    Identical bodies (a cached /movies page, a movie detail, the SPA index)
+    are compressed once per codec and then served from memory.
+    """
+
+    def __init__(self, max_bytes: int = COMPRESSION_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Tuple[bytes, str], bytes]" = OrderedDict()
+        self.size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def compress(self, body: bytes, encoding: str) -> bytes:
+        """Compressed ``body``, from the cache when the same bytes were compressed before."""
+        key = (hashlib.blake2b(body, digest_size=16).digest(), encoding)
+        with self._lock:
+            compressed = self._entries.get(key)
+            if compressed is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return compressed
+            self.misses += 1
+        compressed = CODECS[encoding][0](body)
+        if len(compressed) > self.max_bytes:
+            return compressed
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = compressed
+                self.size_bytes += len(compressed)
+            while self.size_bytes > self.max_bytes:
+                _, old = self._entries.popitem(last=False)
+                self.size_bytes -= len(old)
+                self.evictions += 1
+        return compressed
+
+    def stats(self) -> dict:
+        """Hit ratio and memory use."""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "size_bytes": self.size_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions
+        }
+
+class CompressionMiddleware:
+    """Compress responses with the best codec the client accepts.
+
+    Bodies under ``minimum_size`` and content that is not text-like go out
+    unchanged. Responses with an ETag are treated as cacheable and their
+    compressed variants are kept in a ``CompressedVariantCache``; streamed
+    responses are compressed chunk by chunk. As nginx does, the ETag of a
+    compressed response is made weak, so it still matches If-None-Match
+    (which compares weakly) but no longer claims byte equality with the
+    identity body.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = COMPRESSION_MIN_SIZE, cache: "CompressedVariantCache" = None):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.cache = cache if cache is not None else compressed_variant_cache
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        await _CompressionResponder(self, encoding, send)(scope, receive)
+
+class _CompressionResponder:
+    """Per-request state: holds the response start until the first body chunk decides."""
+
+    def __init__(self, middleware: CompressionMiddleware, encoding: str, send: Send):
+        self.middleware = middleware
+        self.encoding = encoding
+        self.send = send
+        self.start: Optional[Message] = None
+        self.stream: Optional[Tuple[Callable[[bytes], bytes], Callable[[], bytes]]] = None
+        self.passthrough = False
+
+    async def __call__(self, scope: Scope, receive: Receive) -> None:
+        await self.middleware.app(scope, receive, self.send_wrapper)
+
+    def _compressible(self, headers: MutableHeaders) -> bool:
+        content_type = headers.get("content-type", "")
+        return (
+            "content-encoding" not in headers
+            and self.start["status"] == 200
+            and content_type.startswith(COMPRESSIBLE_TYPES)
+        )
+
+    def _mark_encoded(self, headers: MutableHeaders) -> None:
+        headers["Content-Encoding"] = self.encoding
+        headers.add_vary_header("Accept-Encoding")
+        etag = headers.get("etag")
+        if etag and not etag.startswith("W/"):
+            headers["ETag"] = "W/" + etag
+
+    async def send_wrapper(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            self.start = message
+            return
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.stream is not None:
+            compress, flush = self.stream
+            chunk = compress(body) + (b"" if more_body else flush())
+            compression_stats.record_bytes(len(body), len(chunk))
+            await self.send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+            return
+
+        headers = MutableHeaders(raw=self.start["headers"])
+        if not self._compressible(headers) or (not more_body and len(body) < self.middleware.minimum_size):
+            if self._compressible(headers):
+                headers.add_vary_header("Accept-Encoding")
+            self.passthrough = True
+            await self.send(self.start)
+            await self.send(message)
+            return
+
+        compression_stats.record(self.encoding)
+        self._mark_encoded(headers)
+        if not more_body:
+            # Whole body in hand: compressed once per distinct body when cacheable
+            if "etag" in headers:
+                compressed = self.middleware.cache.compress(body, self.encoding)
+            else:
+                compressed = CODECS[self.encoding][0](body)
+            compression_stats.record_bytes(len(body), len(compressed))
+            headers["Content-Length"] = str(len(compressed))
+            await self.send(self.start)
+            await self.send({"type": "http.response.body", "body": compressed})
+            return
+
+        # Streamed body: compress chunk by chunk without buffering
+        del headers["Content-Length"]
+        self.stream = CODECS[self.encoding][1]()
+        chunk = self.stream[0](body)
+        compression_stats.record_bytes(len(body), len(chunk))
+        await self.send(self.start)
+        await self.send({"type": "http.response.body", "body": chunk, "more_body": True})
+
+class CompressionStats:
+    """Counters for the admin metrics endpoint."""
+
+    def __init__(self):
+        self.responses: Dict[str, int] = {}
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def record(self, encoding: str) -> None:
+        self.responses[encoding] = self.responses.get(encoding, 0) + 1
+
+    def record_bytes(self, bytes_in: int, bytes_out: int) -> None:
+        self.bytes_in += bytes_in
+        self.bytes_out += bytes_out
+
+    def stats(self) -> dict:
+        return {
+            "codecs": list(CODECS),
+            "minimum_size": COMPRESSION_MIN_SIZE,
+            "responses": dict(self.responses),
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "ratio": round(self.bytes_out / self.bytes_in, 4) if self.bytes_in else 0.0,
+            "variant_cache": compressed_variant_cache.stats()
+        }
+
+# Shared compressed-body cache and counters used by the compression middleware
+compressed_variant_cache = CompressedVariantCache()
+compression_stats = CompressionStats()
@@ -0,0 +1,92 @@
+from fastapi import Depends, HTTPException, Request, Response
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Dict, Optional
+import hashlib
+
+from db.catalog import catalog_version
+from middleware.auth import require_api_key
+from middleware.key_cache import ApiKeyRecord
+
+# Clients may keep movie responses but must revalidate them before reuse
+MOVIE_CACHE_CONTROL = "private, no-cache"
+
+class ConditionalGet:
+    """Validators for movie responses, derived from the catalog version.
+
+    Every movie response is a function of the request URL and the catalog
+    contents, and the catalog version changes whenever any movie does. The
+    ETag hashes the two together, so checking it needs no database access
+    and no serialization.
+    """
+
+    @staticmethod
+    def etag(request: Request, version: int) -> str:
+        """Strong ETag for this URL at a catalog version; parameter order does not matter."""
+        query = "&".join(f"{key}={value}" for key, value in sorted(request.query_params.multi_items()))
+        digest = hashlib.blake2b(f"{version}:{request.url.path}?{query}".encode("utf-8"), digest_size=12)
+        return f'"{digest.hexdigest()}"'
+
+    @staticmethod
+    def last_modified(updated_at: Optional[datetime]) -> Optional[datetime]:
+        """Catalog change time in UTC, whole seconds as HTTP dates carry."""
+        if updated_at is None:
+            return None
+        if updated_at.tzinfo is None:
+            updated_at = updated_at.astimezone()
+        return updated_at.astimezone(timezone.utc).replace(microsecond=0)
+
+    @staticmethod
+    def etag_matches(header: str, etag: str) -> bool:
+        """Whether an If-None-Match header lists ``etag`` (weak comparison, as RFC 9110 requires)."""
+        if header.strip() == "*":
+            return True
+        candidates = (candidate.strip() for candidate in header.split(","))
+        return any(candidate.removeprefix("W/") == etag for candidate in candidates)
+
+    @staticmethod
+    def not_modified_since(header: str, last_modified: Optional[datetime]) -> bool:
+        """Whether an If-Modified-Since date is at or after ``last_modified``."""
+        if last_modified is None:
+            return False
+        try:
+            since = parsedate_to_datetime(header)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        return last_modified <= since
+
+def conditional_get(
+    request: Request,
+    response: Response,
+    current_user: ApiKeyRecord = Depends(require_api_key)
+) -> Dict[str, str]:
+    """Dependency answering 304 for unchanged movie responses, after the API key is checked.
+
+    Otherwise sets ETag, Last-Modified and Cache-Control on the response and
+    returns them, for endpoints that build their own Response.
+    """
+    version = catalog_version.version
+    last_modified = ConditionalGet.last_modified(catalog_version.updated_at)
+    headers: Dict[str, str] = {
+        "ETag": ConditionalGet.etag(request, version),
+        "Cache-Control": MOVIE_CACHE_CONTROL
+    }
+    if last_modified is not None:
+        headers["Last-Modified"] = format_datetime(last_modified, usegmt=True)
+
+    # If-None-Match takes precedence; If-Modified-Since only applies without it
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        not_modified = ConditionalGet.etag_matches(if_none_match, headers["ETag"])
+    else:
+        if_modified_since = request.headers.get("if-modified-since")
+        not_modified = if_modified_since is not None and ConditionalGet.not_modified_since(
+            if_modified_since, last_modified
+        )
+    if not_modified:
+        raise HTTPException(status_code=304, headers=headers)
+
+    response.headers.update(headers)
+    return headers
@@ -0,0 +1,191 @@
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+
+from sqlalchemy import func
+
+from db.database import SessionLocal
+from db.models_v3 import ApiKey
+
+# Cache settings
+API_KEY_CACHE_SIZE = int(os.getenv("API_KEY_CACHE_SIZE", "10000"))
+API_KEY_CACHE_TTL = float(os.getenv("API_KEY_CACHE_TTL", "60"))
+# Seconds between checks for keys changed by other workers, the most a change can go unseen
+API_KEY_CACHE_REFRESH_INTERVAL = float(os.getenv("API_KEY_CACHE_REFRESH_INTERVAL", "5"))
+# Checks re-read keys changed this many seconds before the newest change seen, for late commits
+API_KEY_CACHE_REFRESH_OVERLAP = float(os.getenv("API_KEY_CACHE_REFRESH_OVERLAP", "30"))
+
+class ApiKeyRecord:
+    """Detached snapshot of the API key fields needed to authorize a request."""
+
+    __slots__ = ("id", "key", "owner_id", "plan", "monthly_limit", "is_active")
+
+    def __init__(
+        self,
+        id: int,
+        key: str,
+        owner_id: int,
+        plan: str,
+        monthly_limit: int,
+        is_active: bool
+    ):
+        self.id = id
+        self.key = key
+        self.owner_id = owner_id
+        self.plan = plan
+        self.monthly_limit = monthly_limit
+        self.is_active = is_active
+
+    @classmethod
+    def from_model(cls, api_key: ApiKey) -> "ApiKeyRecord":
+        """Build a record from an ApiKey row."""
+        return cls(
+            id=api_key.id,
+            key=api_key.key,
+            owner_id=api_key.owner_id,
+            plan=api_key.plan,
+            monthly_limit=api_key.monthly_limit,
+            is_active=api_key.is_active
+        )
+
+class ApiKeyCache:
+    """Bounded LRU cache of API key records with a per-entry TTL.
+
+    Entries expire ``ttl`` seconds after they are loaded. Code that changes
+    a key must call ``invalidate`` so the next request in this worker
+    reloads it from the database. Other workers find the change through
+    ``api_keys.updated_at`` every ``refresh_interval`` seconds, so a
+    suspended key is served at most that long after the change commits.
+    """
+
+    def __init__(
+        self,
+        max_size: int = API_KEY_CACHE_SIZE,
+        ttl: float = API_KEY_CACHE_TTL,
+        refresh_interval: float = API_KEY_CACHE_REFRESH_INTERVAL,
+        refresh_overlap: float = API_KEY_CACHE_REFRESH_OVERLAP
+    ):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.refresh_interval = refresh_interval
+        self.refresh_overlap = timedelta(seconds=refresh_overlap)
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[float, ApiKeyRecord]]" = OrderedDict()
+        self._newest_updated_at: Optional[datetime] = None
+        self._task: Optional[asyncio.Task] = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.refreshes = 0
+
+    def get(self, key: str) -> Optional[ApiKeyRecord]:
+        """Return the cached record for a key string, or None on a miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, record = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return record
+
+    def put(self, record: ApiKeyRecord) -> None:
+        """Cache a record, evicting the least recently used one if full."""
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[record.key] = (time.monotonic() + self.ttl, record)
+            self._entries.move_to_end(record.key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key: str) -> None:
+        """Drop a key from the cache after it has been changed."""
+        with self._lock:
+            if self._entries.pop(key, None) is not None:
+                self.invalidations += 1
+
+    def clear(self) -> None:
+        """Drop every cached record."""
+        with self._lock:
+            self._entries.clear()
+
+    def refresh(self) -> int:
+        """Drop cached keys changed in the database since the last check; return how many."""
+        db = SessionLocal()
+        try:
+            if self._newest_updated_at is None:
+                # Nothing loaded before now can be stale yet
+                self._newest_updated_at = db.query(func.max(ApiKey.updated_at)).scalar()
+                return 0
+            rows = db.query(ApiKey.key, ApiKey.updated_at).filter(
+                ApiKey.updated_at >= self._newest_updated_at - self.refresh_overlap
+            ).all()
+        finally:
+            db.close()
+
+        dropped = 0
+        with self._lock:
+            for key, updated_at in rows:
+                if self._entries.pop(key, None) is not None:
+                    self.invalidations += 1
+                    dropped += 1
+                if updated_at is not None and updated_at > self._newest_updated_at:
+                    self._newest_updated_at = updated_at
+            self.refreshes += 1
+        return dropped
+
+    async def _run(self) -> None:
+        """Pick up keys changed by other workers."""
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                await asyncio.to_thread(self.refresh)
+            except Exception as e:
+                print(f"Failed to refresh API key cache: {e}")
+
+    async def start(self) -> None:
+        """Record the newest key change and start the refresh task."""
+        await asyncio.to_thread(self.refresh)
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the refresh task."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        """Hit/miss counters for the admin metrics endpoint."""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl,
+            "refresh_interval_seconds": self.refresh_interval,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "refreshes": self.refreshes
+        }
+
+# Shared cache used by the API key middleware
+api_key_cache = ApiKeyCache()
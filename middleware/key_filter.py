@@ -0,0 +1,262 @@
+import asyncio
+import hashlib
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Optional
+
+from db.database import SessionLocal
+from db.models_v3 import ApiKey
+
+# Filter settings
+API_KEY_FILTER_FP_RATE = float(os.getenv("API_KEY_FILTER_FP_RATE", "0.001"))
+API_KEY_FILTER_MIN_CAPACITY = int(os.getenv("API_KEY_FILTER_MIN_CAPACITY", "1000"))
+API_KEY_FILTER_REFRESH_INTERVAL = float(os.getenv("API_KEY_FILTER_REFRESH_INTERVAL", "5"))
+# Refreshes re-read keys created this many seconds before the newest one seen, for late commits
+API_KEY_FILTER_REFRESH_OVERLAP = float(os.getenv("API_KEY_FILTER_REFRESH_OVERLAP", "300"))
+API_KEY_FILTER_REBUILD_INTERVAL = float(os.getenv("API_KEY_FILTER_REBUILD_INTERVAL", "3600"))
+# Filter misses checked against the database between refreshes, for keys other workers just created
+API_KEY_FILTER_CONFIRM_BUDGET = int(os.getenv("API_KEY_FILTER_CONFIRM_BUDGET", "10"))
+# Keys confirmed missing from the database are rejected without a query for a while
+API_KEY_FILTER_NEGATIVE_TTL = float(os.getenv("API_KEY_FILTER_NEGATIVE_TTL", "60"))
+API_KEY_FILTER_NEGATIVE_SIZE = int(os.getenv("API_KEY_FILTER_NEGATIVE_SIZE", "10000"))
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings."""
+
+    def __init__(self, capacity: int, fp_rate: float):
+        self.capacity = max(1, capacity)
+        self.fp_rate = fp_rate
+        self.size = max(8, int(-self.capacity * math.log(fp_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, round(self.size / self.capacity * math.log(2)))
+        self.count = 0
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, value: str):
+        """Bit positions for a value using double hashing."""
+        digest = hashlib.blake2b(value.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hash_count))
+
+    def add(self, value: str) -> None:
+        """Add a value to the filter."""
+        for position in self._positions(value):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, value: str) -> bool:
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(value))
+
+    def expected_fp_rate(self) -> float:
+        """False-positive probability for the current number of entries."""
+        return (1 - math.exp(-self.hash_count * self.count / self.size)) ** self.hash_count
+
+class ApiKeyFilter:
+    """Bloom filter of every valid API key string.
+
+    Keys created in this worker are added right away; keys created by
+    other workers are picked up by a refresh every ``refresh_interval``
+    seconds. Refreshes go by ``created_at`` and re-read an overlap window,
+    since ids can commit out of order, and the filter is rebuilt from
+    scratch every ``rebuild_interval`` seconds and when it outgrows its
+    capacity. A key the filter misses is rejected without a query, except
+    that up to ``confirm_budget`` misses between two refreshes are checked
+    against the database, so a key another worker just created works
+    before the next refresh while a flood of unknown keys costs at most
+    that many queries. Keys confirmed missing, including false positives,
+    go into a small negative cache so repeats are answered without a
+    query. Until the first build every key is let through.
+    """
+
+    def __init__(
+        self,
+        fp_rate: float = API_KEY_FILTER_FP_RATE,
+        min_capacity: int = API_KEY_FILTER_MIN_CAPACITY,
+        refresh_interval: float = API_KEY_FILTER_REFRESH_INTERVAL,
+        refresh_overlap: float = API_KEY_FILTER_REFRESH_OVERLAP,
+        rebuild_interval: float = API_KEY_FILTER_REBUILD_INTERVAL,
+        confirm_budget: int = API_KEY_FILTER_CONFIRM_BUDGET,
+        negative_ttl: float = API_KEY_FILTER_NEGATIVE_TTL,
+        negative_size: int = API_KEY_FILTER_NEGATIVE_SIZE
+    ):
+        self.fp_rate = fp_rate
+        self.min_capacity = min_capacity
+        self.refresh_interval = refresh_interval
+        self.refresh_overlap = timedelta(seconds=refresh_overlap)
+        self.rebuild_interval = rebuild_interval
+        self.confirm_budget = confirm_budget
+        self.negative_ttl = negative_ttl
+        self.negative_size = negative_size
+        self._lock = threading.Lock()
+        self._filter: Optional[BloomFilter] = None
+        self._newest_created_at: Optional[datetime] = None
+        self._built_at = 0.0
+        self._invalid: "OrderedDict[str, float]" = OrderedDict()
+        self._confirmations_left = confirm_budget
+        self._task: Optional[asyncio.Task] = None
+        self.checks = 0
+        self.rejections = 0
+        self.false_positives = 0
+        self.missed_valid = 0
+        self.confirmations = 0
+        self.rebuilds = 0
+
+    def might_contain(self, key: str) -> bool:
+        """False means the key was not known at the last build or refresh."""
+        bloom = self._filter
+        if bloom is None:
+            return True
+        self.checks += 1
+        if key in bloom:
+            return True
+        self.rejections += 1
+        return False
+
+    def known_invalid(self, key: str) -> bool:
+        """Whether the key was recently confirmed missing from the database."""
+        with self._lock:
+            expires_at = self._invalid.get(key)
+            if expires_at is None:
+                return False
+            if expires_at <= time.monotonic():
+                del self._invalid[key]
+                return False
+            return True
+
+    def confirm_miss(self) -> bool:
+        """Whether a filter miss may still be checked against the database before the next refresh."""
+        with self._lock:
+            if self._confirmations_left <= 0:
+                return False
+            self._confirmations_left -= 1
+            self.confirmations += 1
+            return True
+
+    def record_invalid(self, key: str, passed_filter: bool) -> None:
+        """Remember a key the database does not have; count it if the filter let it through."""
+        with self._lock:
+            if passed_filter:
+                self.false_positives += 1
+            self._invalid[key] = time.monotonic() + self.negative_ttl
+            self._invalid.move_to_end(key)
+            while len(self._invalid) > self.negative_size:
+                self._invalid.popitem(last=False)
+
+    def record_missed(self, key: str) -> None:
+        """Add a valid key the filter did not know yet (created since the last refresh)."""
+        self.missed_valid += 1
+        self.add(key)
+
+    def add(self, key: str) -> None:
+        """Add a newly created key."""
+        with self._lock:
+            self._invalid.pop(key, None)
+            if self._filter is None:
+                return
+            if self._filter.count >= self._filter.capacity:
+                self._rebuild_locked()
+            self._filter.add(key)
+
+    def rebuild(self) -> None:
+        """Build a fresh filter from every key in the database."""
+        with self._lock:
+            self._rebuild_locked()
+
+    def _rebuild_locked(self) -> None:
+        """Rebuild the filter; caller must hold the lock."""
+        db = SessionLocal()
+        try:
+            rows = db.query(ApiKey.key, ApiKey.created_at).all()
+        finally:
+            db.close()
+
+        bloom = BloomFilter(max(self.min_capacity, len(rows) * 2), self.fp_rate)
+        for key, _ in rows:
+            bloom.add(key)
+        self._newest_created_at = max((created_at for _, created_at in rows if created_at is not None), default=None)
+        self._filter = bloom
+        self._built_at = time.monotonic()
+        self._confirmations_left = self.confirm_budget
+        self.rebuilds += 1
+
+    def refresh(self) -> int:
+        """Add keys created since the last build or refresh; return how many were added."""
+        if self._filter is None:
+            return 0
+        db = SessionLocal()
+        try:
+            query = db.query(ApiKey.key, ApiKey.created_at)
+            if self._newest_created_at is not None:
+                # Keys committed late can carry an older created_at than ones already seen
+                query = query.filter(ApiKey.created_at >= self._newest_created_at - self.refresh_overlap)
+            rows = query.all()
+        finally:
+            db.close()
+
+        added = 0
+        for key, created_at in rows:
+            # Keys created in this worker, or seen in the overlap before, are already in the filter
+            if key not in self._filter:
+                self.add(key)
+                added += 1
+            if created_at is not None and (self._newest_created_at is None or created_at > self._newest_created_at):
+                self._newest_created_at = created_at
+        with self._lock:
+            self._confirmations_left = self.confirm_budget
+        return added
+
+    async def _run(self) -> None:
+        """Pick up keys created by other workers, with a full rebuild now and then."""
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                if time.monotonic() - self._built_at >= self.rebuild_interval:
+                    await asyncio.to_thread(self.rebuild)
+                else:
+                    await asyncio.to_thread(self.refresh)
+            except Exception as e:
+                print(f"Failed to refresh API key filter: {e}")
+
+    async def start(self) -> None:
+        """Build the filter and start the refresh task."""
+        await asyncio.to_thread(self.rebuild)
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the refresh task."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        """Rejection and rebuild stats for the admin metrics endpoint."""
+        bloom = self._filter
+        invalid = self.rejections + self.false_positives
+        return {
+            "ready": bloom is not None,
+            "keys": bloom.count if bloom else 0,
+            "capacity": bloom.capacity if bloom else 0,
+            "size_bytes": len(bloom._bits) if bloom else 0,
+            "hash_count": bloom.hash_count if bloom else 0,
+            "expected_fp_rate": round(bloom.expected_fp_rate(), 6) if bloom else 0.0,
+            "checks": self.checks,
+            "rejections": self.rejections,
+            "false_positives": self.false_positives,
+            "observed_fp_rate": round(self.false_positives / invalid, 6) if invalid else 0.0,
+            "missed_valid": self.missed_valid,
+            "confirmations": self.confirmations,
+            "negative_cache": len(self._invalid),
+            "rebuilds": self.rebuilds
+        }
+
+# Shared filter used by the API key middleware
+api_key_filter = ApiKeyFilter()
@@ -0,0 +1,202 @@
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+# Requests allowed per second and per minute for each ApiKey.plan.
+# Override with RATE_LIMITS="free=5/100,premium=50/1000"; 0 disables a window.
+DEFAULT_RATE_LIMITS = {
+    "free": (5, 100),
+    "premium": (50, 1000),
+}
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")
+RATE_LIMIT_SQLITE_PATH = os.getenv("RATE_LIMIT_SQLITE_PATH", "./rate_limits.db")
+
+# (bucket suffix, window length in seconds)
+WINDOWS = [("second", 1.0), ("minute", 60.0)]
+
+# Seconds between sweeps for idle in-memory buckets
+RATE_LIMIT_SWEEP_INTERVAL = float(os.getenv("RATE_LIMIT_SWEEP_INTERVAL", "60"))
+
+def parse_rate_limits(value: Optional[str]) -> Dict[str, Tuple[int, int]]:
+    """Parse a RATE_LIMITS string on top of the default plan limits."""
+    limits = dict(DEFAULT_RATE_LIMITS)
+    if not value:
+        return limits
+    for item in value.split(","):
+        if not item.strip():
+            continue
+        plan, _, rates = item.partition("=")
+        per_second, _, per_minute = rates.partition("/")
+        limits[plan.strip()] = (int(per_second or 0), int(per_minute or 0))
+    return limits
+
+def refill(tokens: float, updated: float, capacity: float, window: float, now: float) -> float:
+    """Tokens in a bucket after refilling at ``capacity`` per ``window`` seconds."""
+    return min(capacity, tokens + (now - updated) * capacity / window)
+
+def take(buckets: List[Tuple[str, float, float, float, float]], now: float) -> Tuple[float, List[Tuple[str, float]]]:
+    """Try to take one token from every bucket.
+
+    ``buckets`` holds ``(bucket, tokens, updated, capacity, window)`` tuples.
+    Returns the seconds to wait (0 if allowed) and the new token counts,
+    which are only meant to be stored when the request is allowed.
+    """
+    retry_after = 0.0
+    remaining = []
+    for bucket, tokens, updated, capacity, window in buckets:
+        available = refill(tokens, updated, capacity, window, now)
+        if available < 1:
+            retry_after = max(retry_after, (1 - available) * window / capacity)
+        remaining.append((bucket, available - 1))
+    return retry_after, remaining
+
+class MemoryRateLimitBackend:
+    """Token buckets held in this worker's memory.
+
+    A bucket left alone for its whole window has refilled, which is the
+    same as having no bucket, so sweeps every ``sweep_interval`` seconds
+    drop those and memory follows the keys that are currently active.
+    """
+
+    def __init__(self, sweep_interval: float = RATE_LIMIT_SWEEP_INTERVAL):
+        self.sweep_interval = sweep_interval
+        self._lock = threading.Lock()
+        self._buckets: Dict[str, Tuple[float, float, float]] = {}
+        self._swept_at: Optional[float] = None
+        self.evictions = 0
+
+    def consume(self, limits: List[Tuple[str, float, float]], now: float) -> float:
+        """Take a token from each ``(bucket, capacity, window)``; return the wait in seconds."""
+        with self._lock:
+            if self._swept_at is None or now - self._swept_at >= self.sweep_interval:
+                self._sweep(now)
+            buckets = [
+                (bucket, *self._buckets.get(bucket, (capacity, now, window))[:2], capacity, window)
+                for bucket, capacity, window in limits
+            ]
+            retry_after, remaining = take(buckets, now)
+            if not retry_after:
+                for (bucket, tokens), (_, _, window) in zip(remaining, limits):
+                    self._buckets[bucket] = (tokens, now, window)
+            return retry_after
+
+    def _sweep(self, now: float) -> None:
+        """Drop buckets idle for longer than their window; caller must hold the lock."""
+        idle = [bucket for bucket, (_, updated, window) in self._buckets.items() if now - updated >= window]
+        for bucket in idle:
+            del self._buckets[bucket]
+        self.evictions += len(idle)
+        self._swept_at = now
+
+    def stats(self) -> dict:
+        """Bucket counts for the admin metrics endpoint."""
+        return {"buckets": len(self._buckets), "evictions": self.evictions}
+
+class SQLiteRateLimitBackend:
+    """Token buckets in a local SQLite file shared by every worker on the host."""
+
+    def __init__(self, path: str = RATE_LIMIT_SQLITE_PATH):
+        self.path = path
+        self._local = threading.local()
+        connection = self._connection()
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS rate_limit_buckets ("
+            "bucket TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+        )
+
+    def _connection(self) -> sqlite3.Connection:
+        """One autocommit connection per thread."""
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=OFF")
+            self._local.connection = connection
+        return connection
+
+    def consume(self, limits: List[Tuple[str, float, float]], now: float) -> float:
+        """Take a token from each ``(bucket, capacity, window)``; return the wait in seconds."""
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            names = [bucket for bucket, _, _ in limits]
+            rows = connection.execute(
+                f"SELECT bucket, tokens, updated FROM rate_limit_buckets "
+                f"WHERE bucket IN ({', '.join('?' for _ in names)})",
+                names
+            )
+            stored = {bucket: (tokens, updated) for bucket, tokens, updated in rows}
+            buckets = [
+                (bucket, *stored.get(bucket, (capacity, now)), capacity, window)
+                for bucket, capacity, window in limits
+            ]
+            retry_after, remaining = take(buckets, now)
+            if not retry_after:
+                connection.executemany(
+                    "INSERT OR REPLACE INTO rate_limit_buckets (bucket, tokens, updated) VALUES (?, ?, ?)",
+                    [(bucket, tokens, now) for bucket, tokens in remaining]
+                )
+            connection.execute("COMMIT")
+            return retry_after
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+
+class RateLimiter:
+    """Per-key short-window throttle backed by token buckets.
+
+    Every key gets a per-second and a per-minute bucket sized by its plan.
+    A decision touches a fixed number of buckets and never queries the main
+    database.
+    """
+
+    def __init__(self, limits: Dict[str, Tuple[int, int]], backend=None):
+        self.limits = limits
+        self.backend = backend or MemoryRateLimitBackend()
+        self._lock = threading.Lock()
+        self.allowed = 0
+        self.throttled = 0
+
+    def check(self, api_key_id: int, plan: str) -> float:
+        """Consume one request for a key; return 0 if allowed, else seconds until retry."""
+        plan_limits = self.limits.get(plan) or self.limits.get("free")
+        buckets = [
+            (f"{api_key_id}:{name}", float(capacity), window)
+            for (name, window), capacity in zip(WINDOWS, plan_limits)
+            if capacity
+        ]
+        if not buckets:
+            return 0.0
+
+        retry_after = self.backend.consume(buckets, time.time())
+        with self._lock:
+            if retry_after:
+                self.throttled += 1
+            else:
+                self.allowed += 1
+        return retry_after
+
+    def stats(self) -> dict:
+        """Decision counters for the admin metrics endpoint."""
+        stats = {
+            "backend": type(self.backend).__name__,
+            "limits": {plan: {"per_second": s, "per_minute": m} for plan, (s, m) in self.limits.items()},
+            "allowed": self.allowed,
+            "throttled": self.throttled
+        }
+        if isinstance(self.backend, MemoryRateLimitBackend):
+            stats.update(self.backend.stats())
+        return stats
+
+def create_rate_limiter() -> RateLimiter:
+    """Build the rate limiter from environment settings."""
+    if RATE_LIMIT_BACKEND == "sqlite":
+        backend = SQLiteRateLimitBackend(RATE_LIMIT_SQLITE_PATH)
+    else:
+        backend = MemoryRateLimitBackend()
+    return RateLimiter(parse_rate_limits(os.getenv("RATE_LIMITS")), backend)
+
+# Shared rate limiter used by the API key middleware
+rate_limiter = create_rate_limiter()
@@ -0,0 +1,99 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Hashable, Optional, Tuple
+
+from db.catalog import catalog_version
+
+# Cache settings
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+RESPONSE_CACHE_MAX_ENTRY_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRY_BYTES", str(1024 * 1024)))
+
+# Rough per-entry cost of the key, the dict slot and the bytes object header
+ENTRY_OVERHEAD_BYTES = 256
+
+class ResponseCache:
+    """Bounded LRU cache of encoded JSON bodies for movie list endpoints.
+
+    Keys hold the catalog version, the path and the endpoint's parameters
+    after validation, so equivalent URLs share an entry and a new catalog
+    version never reads an old body. The cache evicts by total size rather
+    than entry count and is emptied whenever the catalog changes. Only the
+    body is cached: API key checks and usage accounting run on every hit.
+    """
+
+    def __init__(self, max_bytes: int = RESPONSE_CACHE_MAX_BYTES, max_entry_bytes: int = RESPONSE_CACHE_MAX_ENTRY_BYTES):
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Tuple, bytes]" = OrderedDict()
+        self.size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.skipped = 0
+
+    @staticmethod
+    def key(path: str, **params: Hashable) -> Tuple:
+        """Cache key for ``path`` with the given parameters at the current catalog version."""
+        return (catalog_version.version, path, tuple(sorted(params.items())))
+
+    @staticmethod
+    def _cost(body: bytes) -> int:
+        """Memory charged for one cached body."""
+        return len(body) + ENTRY_OVERHEAD_BYTES
+
+    def get(self, key: Tuple) -> Optional[bytes]:
+        """Return the cached body, or None on a miss."""
+        with self._lock:
+            body = self._entries.get(key)
+            if body is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return body
+
+    def put(self, key: Tuple, body: bytes) -> None:
+        """Cache a body, evicting least recently used ones until the cache fits."""
+        cost = self._cost(body)
+        if cost > self.max_entry_bytes or cost > self.max_bytes:
+            self.skipped += 1
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.size_bytes -= self._cost(previous)
+            self._entries[key] = body
+            self.size_bytes += cost
+            while self.size_bytes > self.max_bytes:
+                _, old_body = self._entries.popitem(last=False)
+                self.size_bytes -= self._cost(old_body)
+                self.evictions += 1
+
+    def invalidate(self, version: Optional[int] = None) -> None:
+        """Drop every cached body; called with the new version on catalog changes."""
+        with self._lock:
+            self._entries.clear()
+            self.size_bytes = 0
+            self.invalidations += 1
+
+    def stats(self) -> dict:
+        """Hit ratio and memory use for the admin metrics endpoint."""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "size_bytes": self.size_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "skipped_too_large": self.skipped
+        }
+
+# Shared cache used by /movies and /search, emptied on every catalog change
+response_cache = ResponseCache()
+catalog_version.subscribe(response_cache.invalidate)
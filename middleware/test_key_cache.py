@@ -0,0 +1,28 @@
+from datetime import datetime, timedelta
+
+from db.services import ApiKeyService
+from middleware.key_cache import ApiKeyCache, ApiKeyRecord
+
+def _cached(api_key) -> ApiKeyCache:
+    """A cache, as in another worker, holding ``api_key`` and past its first check."""
+    # SQLite keeps CURRENT_TIMESTAMP to the second, so look back at least one
+    cache = ApiKeyCache(refresh_overlap=1)
+    cache.refresh()
+    cache.put(ApiKeyRecord.from_model(api_key))
+    return cache
+
+def test_key_changed_by_another_worker_is_dropped_on_refresh(db, make_api_key):
+    api_key = make_api_key(updated_at=datetime.utcnow() - timedelta(hours=1))
+    cache = _cached(api_key)
+    # Suspended through the service, which only invalidates the shared cache
+    ApiKeyService.suspend_api_key(db, api_key.id)
+    assert cache.refresh() >= 1
+    assert cache.get(api_key.key) is None
+
+def test_usage_does_not_drop_cached_keys(db, make_api_key):
+    api_key = make_api_key(updated_at=datetime.utcnow() - timedelta(hours=1))
+    cache = _cached(api_key)
+    ApiKeyService.consume_quota(db, api_key.id)
+    db.commit()
+    cache.refresh()
+    assert cache.get(api_key.key) is not None
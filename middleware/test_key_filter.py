@@ -0,0 +1,98 @@
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+
+from middleware import auth
+from middleware.key_filter import ApiKeyFilter, BloomFilter
+
+def _request() -> Request:
+    """A minimal GET request for the auth helpers."""
+    return Request({"type": "http", "method": "GET", "path": "/movies", "headers": [], "client": ("127.0.0.1", 1)})
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(capacity=5000, fp_rate=0.01)
+    keys = [f"mapi_{i:08d}" for i in range(5000)]
+    for key in keys:
+        bloom.add(key)
+    assert all(key in bloom for key in keys)
+
+def test_bloom_filter_false_positive_rate_is_near_target():
+    bloom = BloomFilter(capacity=5000, fp_rate=0.01)
+    for i in range(5000):
+        bloom.add(f"mapi_{i:08d}")
+    false_positives = sum(f"other_{i}" in bloom for i in range(20000))
+    assert false_positives / 20000 < 0.03
+
+def test_filter_keeps_every_key_when_it_outgrows_its_capacity(db, make_api_key):
+    make_api_key()
+    key_filter = ApiKeyFilter(min_capacity=4)
+    key_filter.rebuild()
+    keys = [make_api_key().key for _ in range(20)]
+    for key in keys:
+        key_filter.add(key)
+    assert key_filter.rebuilds > 1
+    assert all(key_filter.might_contain(key) for key in keys)
+
+def test_refresh_picks_up_keys_that_commit_out_of_id_order(db, make_api_key):
+    key_filter = ApiKeyFilter()
+    make_api_key()
+    key_filter.rebuild()
+    # Id 1000 commits first; a key with a lower id and an earlier created_at commits after the refresh
+    now = datetime.now()
+    later = make_api_key(id=1000, created_at=now)
+    assert key_filter.refresh() == 1
+    earlier = make_api_key(id=999, created_at=now - timedelta(seconds=2))
+    key_filter.refresh()
+    assert key_filter.might_contain(later.key)
+    assert key_filter.might_contain(earlier.key)
+
+def test_a_filter_miss_is_confirmed_against_the_database(db, make_api_key, monkeypatch):
+    key_filter = ApiKeyFilter()
+    key_filter.rebuild()
+    # Created by another worker since the last refresh
+    api_key = make_api_key()
+    assert not key_filter.might_contain(api_key.key)
+    monkeypatch.setattr(auth, "api_key_filter", key_filter)
+
+    record = auth.APIKeyAuth.validate_api_key(api_key.key, db, "/movies", _request())
+    assert record.id == api_key.id
+    assert key_filter.might_contain(api_key.key)
+    assert key_filter.missed_valid == 1
+
+def test_unknown_keys_are_remembered_as_invalid(db, monkeypatch):
+    key_filter = ApiKeyFilter()
+    key_filter.rebuild()
+    monkeypatch.setattr(auth, "api_key_filter", key_filter)
+    for _ in range(2):
+        with pytest.raises(HTTPException) as error:
+            auth.APIKeyAuth.validate_api_key("mapi_unknown", db, "/movies", _request())
+        assert error.value.status_code == 401
+    assert key_filter.known_invalid("mapi_unknown")
+
+    key_filter.add("mapi_unknown")
+    assert not key_filter.known_invalid("mapi_unknown")
+
+class NoQueries:
+    """A session that fails the test if it is used."""
+
+    def query(self, *entities):
+        raise AssertionError("unexpected database query")
+
+def test_filter_misses_past_the_budget_are_rejected_without_a_query(db, monkeypatch):
+    key_filter = ApiKeyFilter(confirm_budget=2)
+    key_filter.rebuild()
+    monkeypatch.setattr(auth, "api_key_filter", key_filter)
+    for i in range(2):
+        with pytest.raises(HTTPException):
+            auth.APIKeyAuth.validate_api_key(f"mapi_scan_{i}", db, "/movies", _request())
+    for i in range(2, 50):
+        with pytest.raises(HTTPException) as error:
+            auth.APIKeyAuth.validate_api_key(f"mapi_scan_{i}", NoQueries(), "/movies", _request())
+        assert error.value.status_code == 401
+    assert key_filter.confirmations == 2
+
+    # Each refresh allows a few more confirmations
+    key_filter.refresh()
+    assert key_filter.confirm_miss()
@@ -0,0 +1,69 @@
+import pytest
+
+from middleware.rate_limit import MemoryRateLimitBackend, RateLimiter, parse_rate_limits, refill, take
+
+def test_refill_adds_tokens_in_proportion_to_elapsed_time():
+    assert refill(0.0, 100.0, capacity=10, window=1.0, now=100.25) == pytest.approx(2.5)
+
+def test_refill_never_exceeds_capacity():
+    assert refill(3.0, 0.0, capacity=5, window=1.0, now=1000.0) == 5
+
+def test_take_allows_when_every_bucket_has_a_token():
+    retry_after, remaining = take([("a", 2.0, 0.0, 5, 1.0), ("b", 1.0, 0.0, 100, 60.0)], now=0.0)
+    assert retry_after == 0
+    assert remaining == [("a", 1.0), ("b", 0.0)]
+
+def test_retry_after_is_time_until_the_next_token():
+    # Half a token left in a 5 per second bucket: the next one arrives in 0.1 s
+    retry_after, _ = take([("a", 0.5, 0.0, 5, 1.0)], now=0.0)
+    assert retry_after == pytest.approx(0.1)
+
+def test_retry_after_takes_the_slowest_bucket():
+    retry_after, _ = take([("second", 0.0, 0.0, 5, 1.0), ("minute", 0.0, 0.0, 100, 60.0)], now=0.0)
+    assert retry_after == pytest.approx(0.6)
+
+def test_memory_backend_throttles_after_capacity_and_refills():
+    backend = MemoryRateLimitBackend()
+    limits = [("1:second", 3.0, 1.0)]
+    assert [backend.consume(limits, 10.0) for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert backend.consume(limits, 10.0) == pytest.approx(1 / 3)
+    # A throttled request takes nothing, so one token is back after a third of a second
+    assert backend.consume(limits, 10.0 + 1 / 3) == 0.0
+
+def test_rate_limiter_uses_plan_limits_and_counts_decisions():
+    limiter = RateLimiter(parse_rate_limits("free=2/0"))
+    decisions = [limiter.check(7, "free") for _ in range(3)]
+    assert decisions[:2] == [0.0, 0.0] and decisions[2] > 0
+    assert (limiter.allowed, limiter.throttled) == (2, 1)
+    # Keys have their own buckets
+    assert limiter.check(8, "free") == 0.0
+
+def test_zero_limits_disable_throttling():
+    limiter = RateLimiter(parse_rate_limits("free=0/0"))
+    assert all(limiter.check(1, "free") == 0.0 for _ in range(50))
+
+def test_parse_rate_limits_overrides_defaults():
+    limits = parse_rate_limits("free=1/10, gold=7/")
+    assert limits["free"] == (1, 10)
+    assert limits["gold"] == (7, 0)
+    assert limits["premium"] == (50, 1000)
+
+def test_memory_backend_drops_buckets_idle_for_their_window():
+    backend = MemoryRateLimitBackend(sweep_interval=60.0)
+    backend.consume([("new:second", 5.0, 1.0)], 0.0)
+    for key in range(100):
+        backend.consume([(f"{key}:second", 5.0, 1.0), (f"{key}:minute", 100.0, 60.0)], 30.0)
+    assert backend.stats()["buckets"] == 201
+    # Per-second buckets have refilled by the next sweep, per-minute ones by the one after
+    backend.consume([("new:second", 5.0, 1.0)], 60.0)
+    assert backend.stats()["buckets"] == 101
+    backend.consume([("new:second", 5.0, 1.0)], 120.0)
+    assert backend.stats() == {"buckets": 1, "evictions": 202}
+
+def test_dropped_bucket_starts_full_as_if_it_had_refilled():
+    backend = MemoryRateLimitBackend(sweep_interval=0.0)
+    limits = [("1:second", 2.0, 1.0)]
+    assert [backend.consume(limits, 0.0) for _ in range(2)] == [0.0, 0.0]
+    assert backend.consume(limits, 0.0) > 0
+    assert [backend.consume(limits, 1.0) for _ in range(2)] == [0.0, 0.0]
+    assert backend.consume(limits, 1.0) > 0
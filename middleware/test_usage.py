@@ -0,0 +1,90 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from middleware import usage
+from middleware.usage import AtomicUsageCounter, LeaseUsageCounter, UsageAccumulator, UsageCounter
+
+COUNTERS = {
+    "write_behind": UsageAccumulator,
+    "atomic": AtomicUsageCounter,
+    "lease": LeaseUsageCounter,
+}
+
+def last_month(now: datetime) -> datetime:
+    """A time in the month before ``now``."""
+    return now.replace(day=1) - timedelta(days=1)
+
+@pytest.mark.parametrize("mode", COUNTERS)
+def test_key_at_its_limit_is_refused_on_the_first_request(mode, db, make_api_key):
+    api_key = make_api_key(usage_count=5, monthly_limit=5)
+    counter = COUNTERS[mode]()
+    # As the auth middleware does on a cache miss
+    counter.observe(api_key.id, api_key.usage_count)
+    assert counter.record(db, api_key.id, api_key.monthly_limit) is False
+
+@pytest.mark.parametrize("mode", COUNTERS)
+def test_requests_stop_at_the_limit(mode, db, make_api_key):
+    api_key = make_api_key(usage_count=2, monthly_limit=5)
+    counter = COUNTERS[mode]()
+    counter.observe(api_key.id, api_key.usage_count)
+    decisions = [counter.record(db, api_key.id, api_key.monthly_limit) for _ in range(5)]
+    assert decisions == [True, True, True, False, False]
+    counter.flush(True) if mode == "lease" else counter.flush()
+    db.refresh(api_key)
+    assert api_key.usage_count == 5
+
+def test_write_behind_flushes_counts_to_the_database(db, make_api_key):
+    api_key = make_api_key(usage_count=1, monthly_limit=100)
+    counter = UsageAccumulator(batch_size=1000)
+    counter.observe(api_key.id, api_key.usage_count)
+    for _ in range(3):
+        assert counter.record(db, api_key.id, api_key.monthly_limit)
+    assert counter.usage(api_key.id) == 4
+    assert counter.flush() == 3
+    db.refresh(api_key)
+    assert api_key.usage_count == 4
+
+@pytest.mark.parametrize("mode", ["write_behind", "lease"])
+def test_month_rollover_keeps_keys_reset_this_month_at_their_limit(mode, db, make_api_key):
+    now = datetime.now()
+    api_key = make_api_key(usage_count=5, monthly_limit=5, last_reset=now)
+    counter = COUNTERS[mode]()
+    counter.observe(api_key.id, api_key.usage_count)
+    counter._period = counter._month(last_month(now))
+    assert counter.record(db, api_key.id, api_key.monthly_limit) is False
+
+def test_month_rollover_starts_keys_not_reset_yet_from_zero(db, make_api_key):
+    now = datetime.now()
+    api_key = make_api_key(usage_count=5, monthly_limit=5, last_reset=last_month(now))
+    counter = UsageAccumulator()
+    counter.observe(api_key.id, api_key.usage_count)
+    counter._period = counter._month(last_month(now))
+    assert counter.record(db, api_key.id, api_key.monthly_limit) is True
+    assert counter.usage(api_key.id) == 1
+
+def test_leases_from_last_month_are_not_spent_after_the_reset(db, make_api_key):
+    api_key = make_api_key(monthly_limit=1000)
+    counter = LeaseUsageCounter(lease_size=10)
+    assert counter.record(db, api_key.id, api_key.monthly_limit)
+
+    # The monthly reset runs, then this worker sees the new month
+    api_key.usage_count, api_key.last_reset = 0, datetime.now()
+    db.commit()
+    counter._period = counter._month(last_month(datetime.now()))
+
+    assert counter.record(db, api_key.id, api_key.monthly_limit)
+    counter.flush(True)
+    db.refresh(api_key)
+    assert api_key.usage_count == 1
+
+def test_base_counter_cannot_count_requests():
+    with pytest.raises(TypeError):
+        UsageCounter()
+
+def test_atomic_counting_is_the_default(monkeypatch):
+    for mode in ("atomic", "", "unknown"):
+        monkeypatch.setattr(usage, "QUOTA_MODE", mode)
+        assert isinstance(usage.create_usage_counter(), AtomicUsageCounter)
+    monkeypatch.setattr(usage, "QUOTA_MODE", "write_behind")
+    assert isinstance(usage.create_usage_counter(), UsageAccumulator)
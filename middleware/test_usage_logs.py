@@ -0,0 +1,27 @@
+import asyncio
+from datetime import datetime
+
+from db.models_v3 import UsageLog
+from middleware.usage_logs import UsageLogPipeline
+
+def test_every_queued_event_is_written_in_full_batches(db, make_api_key):
+    api_key = make_api_key()
+    pipeline = UsageLogPipeline(batch_size=10, flush_interval=0.05)
+    events = [
+        {"api_key_id": api_key.id, "endpoint": f"/movies/{i}", "method": "GET", "timestamp": datetime.now()}
+        for i in range(25)
+    ]
+
+    async def run():
+        await pipeline.start()
+        # Queued before the consumer runs, so it finds more than a batch waiting
+        for event in events:
+            pipeline.submit(event)
+        await asyncio.sleep(0.3)
+        await pipeline.stop()
+
+    asyncio.run(run())
+    assert pipeline.enqueued == 25
+    assert pipeline.written == pipeline.enqueued
+    assert pipeline.dropped == 0
+    assert db.query(UsageLog).filter(UsageLog.api_key_id == api_key.id).count() == 25
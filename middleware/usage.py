@@ -0,0 +1,399 @@
+import asyncio
+import os
+from abc import ABC, abstractmethod
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from db.database import SessionLocal
+from db.models_v3 import ApiKey
+from db.services import ApiKeyService
+
+# How requests are counted against monthly limits: "atomic" (never exceeds a limit),
+# "write_behind" or "lease" (fewer writes, bounded overshoot across workers)
+QUOTA_MODE = os.getenv("QUOTA_MODE", "atomic")
+
+# Write-behind settings (seconds between flushes, pending requests per flush)
+USAGE_FLUSH_INTERVAL = float(os.getenv("USAGE_FLUSH_INTERVAL", "5"))
+USAGE_FLUSH_BATCH_SIZE = int(os.getenv("USAGE_FLUSH_BATCH_SIZE", "100"))
+
+# Lease settings (requests taken per lease, idle seconds before unused quota is returned)
+QUOTA_LEASE_SIZE = int(os.getenv("QUOTA_LEASE_SIZE", "100"))
+QUOTA_LEASE_TTL = float(os.getenv("QUOTA_LEASE_TTL", "30"))
+
+class UsageCounter(ABC):
+    """Base class for API key usage accounting.
+
+    Keeps the last known ``usage_count`` of each key so quota checks and
+    usage stats do not have to read the ``api_keys`` row.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._usage: Dict[int, int] = {}
+        self._period = self._month(datetime.now())
+
+    @staticmethod
+    def _month(now: datetime) -> Tuple[int, int]:
+        """Usage period a time falls in."""
+        return (now.year, now.month)
+
+    def observe(self, api_key_id: int, usage_count: int) -> None:
+        """Set the last known database usage count for a key."""
+        with self._lock:
+            self._usage[api_key_id] = usage_count or 0
+
+    def usage(self, api_key_id: int) -> int:
+        """Current usage for a key."""
+        with self._lock:
+            return self._current_usage(api_key_id)
+
+    def _current_usage(self, api_key_id: int) -> int:
+        """Known usage for a key; caller must hold the lock."""
+        return self._usage.get(api_key_id, 0)
+
+    @abstractmethod
+    def record(self, db: Session, api_key_id: int, monthly_limit: int) -> bool:
+        """Count one request against a key; return False if it is over its limit."""
+
+    def _check_period(self, db: Session, now: datetime) -> None:
+        """Start a new period once the month rolls over."""
+        if self._period != self._month(now):
+            self._start_period(db, now)
+
+    def _start_period(self, db: Session, now: datetime) -> None:
+        """Re-read the usage of every known key for the new month.
+
+        Keys the monthly reset job has not reached yet still hold last
+        month's count, so they start again from zero.
+        """
+        with self._lock:
+            if self._period == self._month(now):
+                return
+            self._period = self._month(now)
+            key_ids = list(self._usage)
+        if not key_ids:
+            return
+        period_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        rows = db.query(ApiKey.id, ApiKey.usage_count, ApiKey.last_reset).filter(ApiKey.id.in_(key_ids)).all()
+        with self._lock:
+            for key_id, usage_count, last_reset in rows:
+                if last_reset is not None and last_reset.tzinfo is not None:
+                    last_reset = last_reset.astimezone().replace(tzinfo=None)
+                reset = last_reset is not None and last_reset >= period_start
+                self._usage[key_id] = (usage_count or 0) if reset else 0
+
+    def flush(self) -> int:
+        """Write buffered usage to the database; return the number of requests written."""
+        return 0
+
+    async def start(self) -> None:
+        """Start any background work."""
+
+    async def stop(self) -> None:
+        """Stop background work and write whatever is still buffered."""
+
+    def stats(self) -> dict:
+        """Counters for the admin metrics endpoint."""
+        return {"mode": QUOTA_MODE, "tracked_keys": len(self._usage)}
+
+class AtomicUsageCounter(UsageCounter):
+    """Strict accounting: one conditional UPDATE per request.
+
+    The check and the increment happen in the same statement (see
+    ``ApiKeyService.consume_quota``), so concurrent requests and workers
+    can never push a key past its limit. This is the default mode.
+    """
+
+    def record(self, db: Session, api_key_id: int, monthly_limit: int) -> bool:
+        """Count one request against a key; return False if it is over its limit."""
+        usage_count = ApiKeyService.consume_quota(db, api_key_id)
+        db.commit()
+        if usage_count is None:
+            return False
+        self.observe(api_key_id, usage_count)
+        return True
+
+class UsageAccumulator(UsageCounter):
+    """In-process write-behind buffer for API key usage counters.
+
+    Requests are counted in memory and added to ``api_keys.usage_count`` in
+    one batched transaction, either every ``flush_interval`` seconds or as
+    soon as ``batch_size`` requests are pending. A worker therefore never
+    holds more than ``batch_size`` unflushed requests, which bounds how far
+    other workers can overshoot a monthly limit. Usage log rows are written
+    separately by ``middleware.usage_logs``.
+    """
+
+    def __init__(self, flush_interval: float = USAGE_FLUSH_INTERVAL, batch_size: int = USAGE_FLUSH_BATCH_SIZE):
+        super().__init__()
+        self.flush_interval = flush_interval
+        self.batch_size = max(1, batch_size)
+        self._flush_lock = threading.Lock()
+        self._in_flight: Dict[int, int] = {}
+        self._pending_counts: Dict[int, int] = {}
+        self._last_used: Dict[int, datetime] = {}
+        self._pending_total = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def _current_usage(self, api_key_id: int) -> int:
+        """Known usage plus in-flight and pending counts; caller must hold the lock."""
+        return (
+            self._usage.get(api_key_id, 0)
+            + self._in_flight.get(api_key_id, 0)
+            + self._pending_counts.get(api_key_id, 0)
+        )
+
+    def record(self, db: Session, api_key_id: int, monthly_limit: int) -> bool:
+        """Count one request against a key; return False if it is over its limit."""
+        now = datetime.now()
+        self._check_period(db, now)
+        with self._lock:
+            if self._current_usage(api_key_id) >= monthly_limit:
+                return False
+            self._pending_counts[api_key_id] = self._pending_counts.get(api_key_id, 0) + 1
+            self._last_used[api_key_id] = now
+            self._pending_total += 1
+            should_flush = self._pending_total >= self.batch_size
+
+        if should_flush:
+            self.flush()
+        return True
+
+    def flush(self) -> int:
+        """Write all pending usage to the database; return the number of requests flushed."""
+        with self._flush_lock:
+            with self._lock:
+                counts, self._pending_counts = self._pending_counts, {}
+                self._in_flight = counts
+                last_used, self._last_used = self._last_used, {}
+                total, self._pending_total = self._pending_total, 0
+
+            if not total:
+                return 0
+
+            db = SessionLocal()
+            try:
+                # The returned count also picks up usage flushed by other workers
+                refreshed = {}
+                for key_id, delta in counts.items():
+                    usage_count = ApiKeyService.consume_quota(
+                        db, key_id, delta, now=last_used[key_id], enforce_limit=False
+                    )
+                    if usage_count is not None:
+                        refreshed[key_id] = usage_count
+                db.commit()
+
+                with self._lock:
+                    self._usage.update(refreshed)
+                    self._in_flight = {}
+                return total
+            except Exception as e:
+                db.rollback()
+                print(f"Failed to flush usage: {e}")
+                self._restore(counts, last_used)
+                return 0
+            finally:
+                db.close()
+
+    def _restore(self, counts: Dict[int, int], last_used: Dict[int, datetime]) -> None:
+        """Put back usage from a failed flush so it is retried on the next one."""
+        with self._lock:
+            self._in_flight = {}
+            for key_id, delta in counts.items():
+                self._pending_counts[key_id] = self._pending_counts.get(key_id, 0) + delta
+                self._last_used.setdefault(key_id, last_used[key_id])
+            self._pending_total += sum(counts.values())
+
+    def stats(self) -> dict:
+        """Counters for the admin metrics endpoint."""
+        stats = super().stats()
+        stats["pending_requests"] = self._pending_total
+        return stats
+
+    async def _run(self) -> None:
+        """Flush pending usage every ``flush_interval`` seconds."""
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await asyncio.to_thread(self.flush)
+
+    async def start(self) -> None:
+        """Start the periodic flush task."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the periodic flush task and flush whatever is still pending."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await asyncio.to_thread(self.flush)
+
+class QuotaLease:
+    """Block of quota taken from the database and spent locally."""
+
+    __slots__ = ("remaining", "granted_at", "expires_at")
+
+    def __init__(self, remaining: int, granted_at: datetime, expires_at: float):
+        self.remaining = remaining
+        self.granted_at = granted_at
+        self.expires_at = expires_at
+
+class LeaseUsageCounter(UsageCounter):
+    """Quota leasing for multi-worker deployments.
+
+    A worker takes ``lease_size`` requests from ``api_keys.usage_count`` in
+    one conditional UPDATE and spends them in memory, so the hot row is
+    written once per lease instead of once per request. Leases that sit
+    idle for ``lease_ttl`` seconds, and all leases at shutdown, hand their
+    unused quota back. Quota is taken before it is spent, so a key never
+    goes over its limit; at most ``lease_size`` requests per worker can be
+    held back unused. Near the limit leases shrink to a single request.
+    Leases never outlive the month they were granted in.
+    """
+
+    def __init__(self, lease_size: int = QUOTA_LEASE_SIZE, lease_ttl: float = QUOTA_LEASE_TTL):
+        super().__init__()
+        self.lease_size = max(1, lease_size)
+        self.lease_ttl = lease_ttl
+        self._leases: Dict[int, QuotaLease] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.grants = 0
+        self.releases = 0
+
+    def _current_usage(self, api_key_id: int) -> int:
+        """Database usage minus quota this worker has leased but not spent."""
+        lease = self._leases.get(api_key_id)
+        return self._usage.get(api_key_id, 0) - (lease.remaining if lease else 0)
+
+    def _start_period(self, db: Session, now: datetime) -> None:
+        """Drop last month's leases before re-reading usage.
+
+        Their quota was taken from last month's count, so spending it now
+        would go uncounted. It is handed back unless the key was reset since.
+        """
+        with self._lock:
+            if self._period == self._month(now):
+                return
+            leases, self._leases = self._leases, {}
+        for key_id, lease in leases.items():
+            if lease.remaining > 0:
+                ApiKeyService.release_quota(db, key_id, lease.remaining, lease.granted_at)
+                self.releases += 1
+        db.commit()
+        super()._start_period(db, now)
+
+    def record(self, db: Session, api_key_id: int, monthly_limit: int) -> bool:
+        """Count one request against a key; return False if it is over its limit."""
+        self._check_period(db, datetime.now())
+        with self._lock:
+            lease = self._leases.get(api_key_id)
+            if lease is not None and lease.remaining > 0:
+                lease.remaining -= 1
+                lease.expires_at = time.monotonic() + self.lease_ttl
+                return True
+
+        # Take a full lease, or a single request if the key is close to its limit
+        granted = self.lease_size
+        usage_count = ApiKeyService.consume_quota(db, api_key_id, granted)
+        if usage_count is None and granted > 1:
+            granted = 1
+            usage_count = ApiKeyService.consume_quota(db, api_key_id, granted)
+        db.commit()
+        if usage_count is None:
+            return False
+
+        with self._lock:
+            self.grants += 1
+            self._usage[api_key_id] = usage_count
+            lease = self._leases.get(api_key_id)
+            if lease is None:
+                lease = self._leases[api_key_id] = QuotaLease(0, datetime.now(), 0)
+            lease.remaining += granted - 1
+            lease.granted_at = datetime.now()
+            lease.expires_at = time.monotonic() + self.lease_ttl
+        return True
+
+    def flush(self, release_all: bool = False) -> int:
+        """Return unused quota from idle leases (or all leases); return the amount released."""
+        now = time.monotonic()
+        with self._lock:
+            expired: List[Tuple[int, QuotaLease]] = [
+                (key_id, lease) for key_id, lease in self._leases.items()
+                if release_all or lease.expires_at <= now
+            ]
+            for key_id, _ in expired:
+                del self._leases[key_id]
+
+        released = [(key_id, lease) for key_id, lease in expired if lease.remaining > 0]
+        if not released:
+            return 0
+
+        db = SessionLocal()
+        try:
+            for key_id, lease in released:
+                ApiKeyService.release_quota(db, key_id, lease.remaining, lease.granted_at)
+            db.commit()
+            with self._lock:
+                for key_id, lease in released:
+                    if key_id in self._usage:
+                        self._usage[key_id] -= lease.remaining
+                self.releases += len(released)
+            return sum(lease.remaining for _, lease in released)
+        except Exception as e:
+            db.rollback()
+            print(f"Failed to release quota leases: {e}")
+            return 0
+        finally:
+            db.close()
+
+    async def _run(self) -> None:
+        """Return quota from idle leases periodically."""
+        while True:
+            await asyncio.sleep(max(1.0, self.lease_ttl / 2))
+            await asyncio.to_thread(self.flush)
+
+    async def start(self) -> None:
+        """Start the lease expiry task."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the expiry task and return every unused lease."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await asyncio.to_thread(self.flush, True)
+
+    def stats(self) -> dict:
+        """Counters for the admin metrics endpoint."""
+        stats = super().stats()
+        stats.update({
+            "active_leases": len(self._leases),
+            "leased_remaining": sum(lease.remaining for lease in self._leases.values()),
+            "grants": self.grants,
+            "releases": self.releases
+        })
+        return stats
+
+def create_usage_counter() -> UsageCounter:
+    """Build the usage counter selected by QUOTA_MODE."""
+    if QUOTA_MODE == "write_behind":
+        return UsageAccumulator()
+    if QUOTA_MODE == "lease":
+        return LeaseUsageCounter()
+    return AtomicUsageCounter()
+
+# Shared usage counter used by the API key middleware
+usage_counter = create_usage_counter()
@@ -0,0 +1,201 @@
+import asyncio
+import csv
+import io
+import os
+import time
+from typing import List, Optional
+
+from sqlalchemy import insert
+from sqlalchemy.engine import Connection
+
+from db.database import engine
+from db.models_v3 import UsageLog
+from db.services import UsageService
+
+# Ingestion settings
+USAGE_LOG_QUEUE_SIZE = int(os.getenv("USAGE_LOG_QUEUE_SIZE", "10000"))
+USAGE_LOG_BATCH_SIZE = int(os.getenv("USAGE_LOG_BATCH_SIZE", "500"))
+USAGE_LOG_FLUSH_INTERVAL = float(os.getenv("USAGE_LOG_FLUSH_INTERVAL", "1"))
+USAGE_LOG_SYNC = os.getenv("USAGE_LOG_SYNC", "false").lower() == "true"
+
+USAGE_LOG_COLUMNS = ["api_key_id", "endpoint", "method", "timestamp", "ip_address", "user_agent"]
+
+class UsageLogPipeline:
+    """Bounded queue that moves usage log writes off the request path.
+
+    Request handlers call ``submit`` and return immediately; a background
+    consumer drains the queue and writes rows with one multi-row INSERT
+    (COPY on PostgreSQL) per batch, plus one upsert into the hourly
+    ``usage_rollups`` that stats are read from. When the queue is full new
+    events are dropped and counted rather than slowing requests down. Until
+    ``start`` is called, or when ``synchronous`` is set, events are written
+    inline.
+    """
+
+    def __init__(
+        self,
+        queue_size: int = USAGE_LOG_QUEUE_SIZE,
+        batch_size: int = USAGE_LOG_BATCH_SIZE,
+        flush_interval: float = USAGE_LOG_FLUSH_INTERVAL,
+        synchronous: bool = USAGE_LOG_SYNC
+    ):
+        self.queue_size = queue_size
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.synchronous = synchronous
+        self._queue: Optional[asyncio.Queue] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+
+        # Backpressure metrics
+        self.enqueued = 0
+        self.dropped = 0
+        self.written = 0
+        self.failed = 0
+        self.batches = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+
+    def submit(self, event: dict) -> None:
+        """Queue a usage log event; safe to call from any thread."""
+        if self.synchronous or self._loop is None:
+            self.write_batch([event])
+            return
+
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+
+        if running_loop is self._loop:
+            self._enqueue(event)
+            return
+        try:
+            self._loop.call_soon_threadsafe(self._enqueue, event)
+        except RuntimeError:
+            # Event loop already closed (worker shutting down)
+            self.write_batch([event])
+
+    def _enqueue(self, event: dict) -> None:
+        """Put an event on the queue, dropping it if the queue is full."""
+        try:
+            self._queue.put_nowait(event)
+            self.enqueued += 1
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+    def write_batch(self, events: List[dict]) -> None:
+        """Insert a batch of usage log rows and their rollups in one transaction."""
+        if not events:
+            return
+
+        started = time.perf_counter()
+        try:
+            # Raw rows and their hourly rollups commit together
+            with engine.begin() as conn:
+                if engine.dialect.name == "postgresql":
+                    self._copy_batch(conn, events)
+                else:
+                    conn.execute(insert(UsageLog.__table__).values(events))
+                UsageService.add_rollups(conn, events)
+            self.written += len(events)
+        except Exception as e:
+            self.failed += len(events)
+            print(f"Failed to write {len(events)} usage logs: {e}")
+        finally:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            self.batches += 1
+            self.last_flush_ms = elapsed_ms
+            self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+
+    def _copy_batch(self, conn: Connection, events: List[dict]) -> None:
+        """Stream a batch into usage_logs with PostgreSQL COPY on the caller's transaction."""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for event in events:
+            writer.writerow([event.get(column) for column in USAGE_LOG_COLUMNS])
+        buffer.seek(0)
+
+        cursor = conn.connection.cursor()
+        try:
+            cursor.copy_expert(
+                f"COPY usage_logs ({', '.join(USAGE_LOG_COLUMNS)}) FROM STDIN WITH (FORMAT csv)",
+                buffer
+            )
+        finally:
+            cursor.close()
+
+    def _drain(self, limit: Optional[int] = None) -> List[dict]:
+        """Take up to ``limit`` (default ``batch_size``) events that are already queued."""
+        limit = self.batch_size if limit is None else limit
+        batch = []
+        while len(batch) < limit:
+            try:
+                batch.append(self._queue.get_nowait())
+            except asyncio.QueueEmpty:
+                break
+        return batch
+
+    async def _consume(self) -> None:
+        """Collect events into batches and write them off the event loop."""
+        batch: List[dict] = []
+        try:
+            while True:
+                batch.append(await self._queue.get())
+                deadline = self._loop.time() + self.flush_interval
+                while len(batch) < self.batch_size:
+                    batch.extend(self._drain(self.batch_size - len(batch)))
+                    remaining = deadline - self._loop.time()
+                    if len(batch) >= self.batch_size or remaining <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                    except asyncio.TimeoutError:
+                        break
+                ready, batch = batch, []
+                await asyncio.to_thread(self.write_batch, ready)
+        except asyncio.CancelledError:
+            # Do not lose a partially collected batch on shutdown
+            self.write_batch(batch)
+            raise
+
+    def stats(self) -> dict:
+        """Backpressure metrics for the admin metrics endpoint."""
+        return {
+            "mode": "synchronous" if self.synchronous or self._loop is None else "queued",
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "queue_size": self.queue_size,
+            "enqueued": self.enqueued,
+            "dropped": self.dropped,
+            "written": self.written,
+            "failed": self.failed,
+            "batches": self.batches,
+            "last_flush_ms": round(self.last_flush_ms, 2),
+            "max_flush_ms": round(self.max_flush_ms, 2)
+        }
+
+    async def start(self) -> None:
+        """Start the background consumer on the running event loop."""
+        if self.synchronous or self._task is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._task = asyncio.create_task(self._consume())
+
+    async def stop(self) -> None:
+        """Stop the consumer and write out everything still queued."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+        while not self._queue.empty():
+            await asyncio.to_thread(self.write_batch, self._drain())
+        self._loop = None
+
+# Shared pipeline used by the API key middleware
+usage_log_pipeline = UsageLogPipeline()
@@ -30,12 +30,22 @@ class PaginatedMoviesResponse(BaseModel):
     per_page: int
     total_movies: int
     total_pages: int
+    next_cursor: Optional[str] = None
 
 class SearchResponse(BaseModel):
     """Response model for search results."""
     movies: List[MovieResponse]
     query: dict
     total_results: int
+    page: int
+    per_page: int
+    total_pages: int
+    total_exact: bool = True
+
+class BatchMoviesResponse(BaseModel):
+    """Response model for batch movie lookups."""
+    movies: List[Optional[MovieResponse]]
+    not_found: List[int]
 
 class ApiKeyResponse(BaseModel):
     """Response model for API key information."""
@@ -0,0 +1,21 @@
+import base64
+import json
+from typing import Tuple
+
+def encode_cursor(last_id: int, page: int) -> str:
+    """Opaque cursor for the page that starts after movie ``last_id``."""
+    payload = json.dumps({"id": last_id, "page": page}, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(payload).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[int, int]:
+    """Return ``(last_id, page)`` from a cursor; raise ValueError if it is malformed."""
+    try:
+        payload = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        data = json.loads(payload)
+        last_id, page = int(data["id"]), int(data["page"])
+    except (TypeError, KeyError, ValueError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+    # Cursors are only ever issued for page 2 onwards, after a real movie id
+    if last_id < 1 or page < 2:
+        raise ValueError(f"Invalid cursor: {cursor}")
+    return last_id, page
@@ -0,0 +1,49 @@
+from typing import Any, Dict, Iterable, Mapping, Optional, Sequence, Tuple
+
+from pydantic import BaseModel, TypeAdapter
+
+from models import MovieResponse
+
+# Every list response model starts with its movies, so they can be spliced in after this prefix
+MOVIES_PREFIX = b'{"movies":['
+
+# Movie fields in the order the API writes them
+MOVIE_FIELDS: Tuple[str, ...] = tuple(MovieResponse.model_fields)
+FIELD_POSITIONS: Dict[str, int] = {name: position for position, name in enumerate(MOVIE_FIELDS)}
+_FIELD_ADAPTERS = {name: TypeAdapter(info.annotation) for name, info in MovieResponse.model_fields.items()}
+
+def parse_fields(value: Optional[str]) -> Tuple[str, ...]:
+    """Movie fields named in a ``fields`` parameter, in API order and always with ``id``.
+
+    No value selects every field; unknown names raise ValueError.
+    """
+    if not value:
+        return MOVIE_FIELDS
+    requested = {name.strip() for name in value.split(",") if name.strip()}
+    unknown = requested - set(MOVIE_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}. Available: {', '.join(MOVIE_FIELDS)}")
+    requested.add("id")
+    return tuple(name for name in MOVIE_FIELDS if name in requested)
+
+def field_json(name: str, value: Any) -> bytes:
+    """One ``"name":value`` member, encoded as the API encodes it."""
+    return b'"' + name.encode("utf-8") + b'":' + _FIELD_ADAPTERS[name].dump_json(value)
+
+def encode_fields(values: Mapping[str, Any], fields: Sequence[str] = MOVIE_FIELDS) -> bytes:
+    """A movie object holding ``fields`` taken from ``values``."""
+    return b"{" + b",".join(field_json(name, values[name]) for name in fields) + b"}"
+
+def movie_json(movie: MovieResponse, fields: Sequence[str] = MOVIE_FIELDS) -> bytes:
+    """A movie's JSON exactly as the API encodes it, limited to ``fields``."""
+    return encode_fields(vars(movie), fields)
+
+def splice_movies(envelope: BaseModel, movies: Iterable[bytes]) -> bytes:
+    """Encode a list response built with ``movies=[]``, splicing in already-encoded movies.
+
+    The result is byte-for-byte what encoding the full model would produce.
+    """
+    body = envelope.model_dump_json().encode("utf-8")
+    if not body.startswith(MOVIES_PREFIX + b"]"):
+        raise ValueError(f"{type(envelope).__name__} must start with an empty movies list")
+    return MOVIES_PREFIX + b",".join(movies) + body[len(MOVIES_PREFIX):]
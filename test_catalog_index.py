@@ -0,0 +1,91 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from benchmark_search import QUERIES, load_database, synthetic_movies
+from data_loader import CatalogSnapshot
+from db.database import create_tables
+from db.models_v3 import Base, Movie
+from db.search import MovieSearchIndex, search_terms
+from models import MovieResponse
+
+SIZE = 3000
+
+def response(movie: dict) -> MovieResponse:
+    """The API response for a synthetic movie."""
+    return MovieResponse(
+        id=movie["id"], title=movie["title"], year=movie["year"], genre=movie["genres"],
+        director=movie["director"], actors=movie["actors"], plot="", poster_url=""
+    )
+
+@pytest.fixture(scope="module")
+def catalog(tmp_path_factory):
+    """A synthetic catalog in its own SQLite database, with its snapshot index."""
+    # The fuzzy title index follows the catalog version kept in the test database
+    create_tables()
+    movies = list(synthetic_movies(SIZE))
+    engine = create_engine(f"sqlite:///{tmp_path_factory.mktemp('catalog') / 'catalog.db'}")
+    Base.metadata.create_all(bind=engine)
+    load_database(engine, movies)
+    search_index = MovieSearchIndex(bind=engine)
+    search_index.setup()
+    snapshot = CatalogSnapshot(1, [response(movie) for movie in movies])
+    with Session(engine) as db:
+        yield db, search_index, snapshot
+    engine.dispose()
+
+def sql_ids(db, search_index, criteria) -> list:
+    return sorted(row.id for row in search_index.search_query(db, **criteria).with_entities(Movie.id))
+
+def index_ids(index, criteria) -> list:
+    filters = {field: value for field, value in criteria.items() if field not in ("title", "q")}
+    return index.match(search_terms(criteria.get("title", "")), search_terms(criteria.get("q", "")), **filters)
+
+@pytest.mark.parametrize("criteria", [criteria for _, criteria in QUERIES] + [
+    {"title": "word1 word2"},
+    {"q": "person 1"},
+    {"q": "dra", "year": 2000},
+    {"title": "nosuchword"},
+    {"genre": "no such genre"}
+])
+def test_match_returns_the_sql_results(catalog, criteria):
+    db, search_index, snapshot = catalog
+    assert search_index.available
+    assert index_ids(snapshot.index, criteria) == sql_ids(db, search_index, criteria)
+
+def test_updated_index_matches_a_rebuilt_one(catalog):
+    _, _, snapshot = catalog
+    movies = [movie.model_copy() for movie in snapshot.movies[:-10]]
+    movies[0] = movies[0].model_copy(update={"title": "word1 fresh", "genre": ["Western"]})
+    updated = CatalogSnapshot(2, movies, previous=snapshot)
+    rebuilt = CatalogSnapshot(2, movies)
+    for criteria in [criteria for _, criteria in QUERIES] + [{"title": "fresh"}, {"q": "western"}]:
+        assert index_ids(updated.index, criteria) == index_ids(rebuilt.index, criteria)
+
+@pytest.mark.parametrize("criteria", [
+    {"genre": "drama"},
+    {"q": "person"},
+    {"q": "word1", "genre": "comedy"},
+    {"title": "wordd1", "fuzzy": True, "similarity": 0.3}
+])
+def test_search_window_is_the_head_of_the_full_ranking(catalog, criteria):
+    _, _, snapshot = catalog
+    everything = snapshot.search(**criteria)
+    assert len(everything) > 50
+    assert snapshot.search(window=50, **criteria) == everything[:50]
+
+@pytest.mark.parametrize("criteria", [
+    {"genre": "drama"},
+    {"year": 1994},
+    {"q": "person 1"},
+    {"genre": "no such genre"}
+])
+def test_filtered_fuzzy_search_matches_the_snapshot(catalog, monkeypatch, criteria):
+    db, search_index, snapshot = catalog
+    # Small chunks and window so the candidates take several queries and stop early
+    monkeypatch.setattr("db.search.FUZZY_CANDIDATE_CHUNK", 7)
+    monkeypatch.setattr("db.search.SEARCH_RESULT_WINDOW", 20)
+    fuzzy = {"title": "wordd1", "fuzzy": True, "similarity": 0.3}
+    rows = search_index.search_query(db, **fuzzy, **criteria).with_entities(Movie.id).all()
+    expected = [movie.id for movie in snapshot.search(**fuzzy, **criteria)]
+    assert [row.id for row in rows] == expected[:21]
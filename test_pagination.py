@@ -0,0 +1,39 @@
+import base64
+import json
+
+import pytest
+
+from pagination import decode_cursor, encode_cursor
+
+def raw_cursor(value) -> str:
+    """A cursor built by hand, as a client tampering with one would."""
+    return base64.urlsafe_b64encode(json.dumps(value).encode("utf-8")).decode("ascii").rstrip("=")
+
+@pytest.mark.parametrize("last_id, page", [(1, 2), (10, 3), (987654321, 41)])
+def test_cursor_round_trip(last_id, page):
+    assert decode_cursor(encode_cursor(last_id, page)) == (last_id, page)
+
+def test_cursor_is_url_safe_and_unpadded():
+    cursor = encode_cursor(123456, 7)
+    assert "=" not in cursor
+    assert set(cursor) <= set("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-_")
+
+@pytest.mark.parametrize("cursor", [
+    "",
+    "not a cursor!",
+    "%%%%",
+    encode_cursor(5, 2)[:-3],
+    raw_cursor([5, 2]),
+    raw_cursor({"id": 5}),
+    raw_cursor({"page": 2}),
+    raw_cursor({"id": "five", "page": 2}),
+    raw_cursor({"id": None, "page": 2}),
+    raw_cursor({"id": 0, "page": 2}),
+    raw_cursor({"id": -3, "page": 2}),
+    raw_cursor({"id": 5, "page": 1}),
+    raw_cursor({"id": 5, "page": -1}),
+    base64.urlsafe_b64encode(b"\xff\xfe").decode("ascii"),
+])
+def test_malformed_or_tampered_cursors_are_rejected(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
@@ -0,0 +1,56 @@
+import math
+import random
+
+import pytest
+
+from benchmark_search import misspell, synthetic_titles
+from trigram_index import TrigramIndex, strict_word_similarity, trigrams, word_trigrams
+
+SIZE = 2000
+
+@pytest.fixture(scope="module")
+def titles():
+    return list(synthetic_titles(SIZE))
+
+def scan(titles, words, threshold):
+    """Every title scored one by one, as the index must reproduce."""
+    query = trigrams(words)
+    scored = ((movie_id, strict_word_similarity(query, title)) for movie_id, title in titles)
+    return sorted(((movie_id, score) for movie_id, score in scored if score >= threshold), key=lambda r: (-r[1], r[0]))
+
+def test_word_trigrams_are_padded_like_pg_trgm():
+    assert word_trigrams("cat") == {"  c", " ca", "cat", "at "}
+
+@pytest.mark.parametrize("threshold", [0.1, 0.25, 0.3, 0.5, 0.6, 0.75, 1.0])
+def test_search_finds_every_title_a_full_scan_finds(titles, threshold):
+    index = TrigramIndex.build(titles)
+    rng = random.Random(threshold)
+    for _, words in rng.sample(titles, 25):
+        query = [misspell(word, rng) if len(word) > 2 else word for word in words[:2]]
+        assert index.search(query, threshold) == scan(titles, query, threshold)
+
+@pytest.mark.parametrize("threshold", [0.3, 0.5, 0.7])
+def test_matches_share_the_required_trigrams(titles, threshold):
+    # The bound the index prunes with: a match shares ceil(threshold * |query|) trigrams
+    rng = random.Random(threshold)
+    for _, words in rng.sample(titles, 25):
+        query = [misspell(word, rng) if len(word) > 2 else word for word in words[:2]]
+        required = max(1, math.ceil(threshold * len(trigrams(query)) - 1e-9))
+        for movie_id, _ in scan(titles, query, threshold):
+            assert len(trigrams(query) & trigrams(dict(titles)[movie_id])) >= required
+
+def test_updated_index_matches_a_rebuilt_one(titles):
+    index = TrigramIndex.build(titles)
+    changed = [(1, ("kalomi", "ranmes")), (SIZE + 1, ("brigan",))]
+    removed = [2, 3]
+    expected = dict(titles)
+    expected.update(changed)
+    for movie_id in removed:
+        del expected[movie_id]
+    updated = index.updated(changed, removed)
+    rebuilt = TrigramIndex.build(expected.items())
+    assert updated.words == rebuilt.words
+    assert {trigram: posting.ids for trigram, posting in updated.postings.items()} == \
+        {trigram: posting.ids for trigram, posting in rebuilt.postings.items()}
+    # The original index is left as it was
+    assert index.words[2] == dict(titles)[2]
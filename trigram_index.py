@@ -0,0 +1,134 @@
+import bisect
+import math
+from typing import Dict, Iterable, List, Sequence, Set, Tuple
+
+from catalog_index import PostingList
+
+def word_trigrams(word: str) -> Set[str]:
+    """Trigrams of one word, padded as pg_trgm pads it (two spaces before, one after)."""
+    padded = f"  {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def trigrams(words: Iterable[str]) -> Set[str]:
+    """Trigrams of every word."""
+    result: Set[str] = set()
+    for word in words:
+        result |= word_trigrams(word)
+    return result
+
+def strict_word_similarity(query: Set[str], words: Sequence[str]) -> float:
+    """Best similarity between ``query`` trigrams and a run of whole consecutive ``words``.
+
+    Similarity is shared trigrams over all trigrams of the two sets, the
+    measure of pg_trgm's strict_word_similarity, so a short query can match
+    part of a long title.
+    """
+    word_sets = [word_trigrams(word) for word in words]
+    best = 0.0
+    for start in range(len(word_sets)):
+        extent: Set[str] = set()
+        for word_set in word_sets[start:]:
+            extent |= word_set
+            shared = len(query & extent)
+            best = max(best, shared / (len(query) + len(extent) - shared))
+    return best
+
+class TrigramIndex:
+    """Trigram posting lists over movie titles for typo-tolerant title search.
+
+    Candidates are found without scoring every title: a title whose
+    similarity to the query reaches the threshold shares at least
+    ``threshold * len(query trigrams)`` trigrams with it, so it appears in
+    one of the rarest ``len(query trigrams) - required + 1`` posting lists.
+    Titles from those lists are looked up in the remaining lists by binary
+    search, and only those sharing enough trigrams are scored.
+
+    Like ``CatalogIndex`` the index is immutable, and ``updated`` shares
+    every posting list the change did not touch.
+    """
+
+    def __init__(self):
+        self.postings: Dict[str, PostingList] = {}
+        self.words: Dict[int, Tuple[str, ...]] = {}
+
+    @classmethod
+    def build(cls, documents: Iterable[Tuple[int, Tuple[str, ...]]]) -> "TrigramIndex":
+        """Index ``(movie_id, title words)`` pairs from scratch."""
+        index = cls()
+        collected: Dict[str, List[int]] = {}
+        for movie_id, words in sorted(documents, key=lambda document: document[0]):
+            index.words[movie_id] = words
+            for trigram in trigrams(words):
+                collected.setdefault(trigram, []).append(movie_id)
+        index.postings = {trigram: PostingList(ids) for trigram, ids in collected.items()}
+        return index
+
+    def __len__(self) -> int:
+        return len(self.words)
+
+    def updated(
+        self,
+        changed: Iterable[Tuple[int, Tuple[str, ...]]] = (),
+        removed: Iterable[int] = ()
+    ) -> "TrigramIndex":
+        """A new index with ``changed`` titles (re)indexed and ``removed`` ids dropped."""
+        deltas: Dict[str, Tuple[List[int], List[int]]] = {}
+        words = dict(self.words)
+        for movie_id in removed:
+            for trigram in trigrams(words.pop(movie_id, ())):
+                deltas.setdefault(trigram, ([], []))[0].append(movie_id)
+        for movie_id, new_words in changed:
+            old_trigrams, new_trigrams = trigrams(words.get(movie_id, ())), trigrams(new_words)
+            for trigram in old_trigrams - new_trigrams:
+                deltas.setdefault(trigram, ([], []))[0].append(movie_id)
+            for trigram in new_trigrams - old_trigrams:
+                deltas.setdefault(trigram, ([], []))[1].append(movie_id)
+            words[movie_id] = new_words
+
+        index = TrigramIndex()
+        index.words = words
+        index.postings = dict(self.postings) if deltas else self.postings
+        for trigram, (dropped, added) in deltas.items():
+            posting = index.postings.get(trigram, PostingList([])).changed(sorted(dropped), sorted(added))
+            if posting is None:
+                index.postings.pop(trigram, None)
+            else:
+                index.postings[trigram] = posting
+        return index
+
+    def search(self, words: Sequence[str], threshold: float) -> List[Tuple[int, float]]:
+        """``(movie_id, similarity)`` of titles at least ``threshold`` similar, best first."""
+        query = trigrams(words)
+        if not query:
+            return []
+        required = max(1, math.ceil(threshold * len(query) - 1e-9))
+        lists = sorted((self.postings.get(trigram, PostingList([])) for trigram in query), key=len)
+        scanned, probed = lists[:len(query) - required + 1], [posting.ids for posting in lists[len(query) - required + 1:]]
+        shared: Dict[int, int] = {}
+        for posting in scanned:
+            for movie_id in posting.ids:
+                shared[movie_id] = shared.get(movie_id, 0) + 1
+
+        results = []
+        for movie_id, count in shared.items():
+            # Look the candidate up in the common lists until it has enough shared trigrams
+            for remaining, ids in enumerate(probed):
+                if count >= required or count + len(probed) - remaining < required:
+                    break
+                position = bisect.bisect_left(ids, movie_id)
+                if position < len(ids) and ids[position] == movie_id:
+                    count += 1
+            if count < required:
+                continue
+            similarity = strict_word_similarity(query, self.words[movie_id])
+            if similarity >= threshold:
+                results.append((movie_id, similarity))
+        results.sort(key=lambda result: (-result[1], result[0]))
+        return results
+
+    def stats(self) -> dict:
+        """Index size for the admin metrics endpoint."""
+        return {
+            "titles": len(self.words),
+            "trigrams": len(self.postings)
+        }